@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark for columnar query results against per-row dicts.
+
+Builds a synthetic result set (integer id, float amount, low-cardinality status,
+nullable note) and compares the memory held and the time to compute per-column
+summaries (null ratio, distinct count, min/max, top values) for each layout.
+
+Usage: python benchmarks/bench_columnar.py [--rows 200000]
+"""
+
+import sys
+import os
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database_agent.columnar import ColumnarResult
+
+COLUMNS = ["id", "amount", "status", "note"]
+
+def build_rows(count):
+    rng = random.Random(7)
+    statuses = ["paid", "open", "refunded", "void"]
+    return [(i, round(rng.uniform(1, 500), 2), rng.choice(statuses), None if i % 5 else f"note {i % 97}")
+            for i in range(count)]
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return value, size
+
+def summarize_dicts(records, top_k=5):
+    summary = {}
+    for name in COLUMNS:
+        values = [record[name] for record in records]
+        present = [value for value in values if value is not None]
+        counter = Counter(present)
+        summary[name] = {
+            "nulls": len(values) - len(present),
+            "distinct": len(counter),
+            "min": min(present) if present else None,
+            "max": max(present) if present else None,
+            "top": counter.most_common(top_k)
+        }
+    return summary
+
+def timed(func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar result benchmark")
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    records, dict_bytes = measure(lambda: [dict(zip(COLUMNS, row)) for row in rows])
+    result, columnar_bytes = measure(lambda: ColumnarResult.from_rows(COLUMNS, rows))
+
+    print(f"Result: {args.rows:,} rows x {len(COLUMNS)} columns")
+    print(f"{'':22}{'per-row dicts':>16}{'ColumnarResult':>16}")
+    print(f"{'Memory':22}{dict_bytes / 1024:13.0f} KB{columnar_bytes / 1024:13.0f} KB")
+    print(f"{'Column summaries':22}{timed(lambda: summarize_dicts(records)):13.1f} ms"
+          f"{timed(result.summarize):13.1f} ms")
+
+if __name__ == "__main__":
+    main()
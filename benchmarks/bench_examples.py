@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark for few-shot example retrieval.
+
+Fills an ExampleStore with synthetic prompt -> SQL pairs and measures the time to
+retrieve the top-k examples for a request (embedding plus search), and the time to
+save and reload the store.
+
+Usage: python benchmarks/bench_examples.py [--examples 10000] [--queries 1000]
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database_agent.example_store import ExampleStore
+
+METRICS = ["revenue", "orders", "customers", "refunds", "sessions", "signups", "tickets", "shipments"]
+DIMENSIONS = ["country", "month", "product", "channel", "plan", "region", "week", "warehouse"]
+FILTERS = ["last week", "this year", "for enterprise accounts", "over 100 dollars", "in europe", "since launch"]
+
+def make_prompt(rng):
+    return f"{rng.choice(['total', 'average', 'count of', 'top 10'])} {rng.choice(METRICS)} " \
+           f"by {rng.choice(DIMENSIONS)} {rng.choice(FILTERS)} #{rng.randrange(100000)}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--examples", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "examples.npz")
+        store = ExampleStore({"examples": {"path": path, "save_every": 10 ** 9, "max_examples": args.examples}})
+        start = time.perf_counter()
+        for i in range(args.examples):
+            store.add(make_prompt(rng), f"SELECT {i}")
+        build = time.perf_counter() - start
+
+        queries = [make_prompt(rng) for _ in range(args.queries)]
+        start = time.perf_counter()
+        for query in queries:
+            store.search(query, k=args.top_k)
+        search = (time.perf_counter() - start) / len(queries)
+
+        start = time.perf_counter()
+        store.save()
+        save = time.perf_counter() - start
+        start = time.perf_counter()
+        reloaded = ExampleStore({"examples": {"path": path}})
+        load = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+    print(f"Examples:       {len(store)} (reloaded {len(reloaded)})")
+    print(f"Build:          {build * 1000:.0f} ms ({build / args.examples * 1e6:.1f} us per example)")
+    print(f"Top-{args.top_k} search:   {search * 1e6:.0f} us per request (embedding + search)")
+    print(f"Save / load:    {save * 1000:.0f} ms / {load * 1000:.0f} ms, {size / 1024 / 1024:.1f} MB on disk")
+
+if __name__ == "__main__":
+    main()
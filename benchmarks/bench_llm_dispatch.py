@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark for LLM dispatch: concurrent generate_sql throughput vs. thread-pool size.
+
+Uses a fake provider whose synchronous chat() sleeps for a fixed latency, so the
+numbers reflect dispatch behaviour rather than network variance. Also measures
+how late a 10ms heartbeat task fires while requests are in flight, which shows
+whether the event loop stays responsive.
+
+Usage: python benchmarks/bench_llm_dispatch.py [--requests 64] [--latency 0.1]
+"""
+
+import sys
+import os
+import time
+import asyncio
+import argparse
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database_agent.llm_integration import LLMIntegration
+
+class FakeLLM:
+    """Blocking provider with a fixed per-call latency."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def chat(self, messages):
+        time.sleep(self.latency)
+        return "SELECT 1;"
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+async def run(pool_size: int, requests: int, latency: float):
+    config = {"llm": {"provider": "fake", "timeout": 600, "max_workers": pool_size}}
+    with patch("src.database_agent.llm_integration.get_llm", return_value=FakeLLM(latency)):
+        integration = LLMIntegration(config)
+
+    stop, lags = asyncio.Event(), []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(integration.generate_sql(f"prompt {i}") for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    integration.close()
+    return elapsed, max(lags) if lags else 0.0
+
+async def main():
+    parser = argparse.ArgumentParser(description="LLM dispatch benchmark")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.1, help="Fake LLM latency in seconds")
+    parser.add_argument("--pool-sizes", default="1,2,4,8,16,32")
+    args = parser.parse_args()
+
+    print(f"{args.requests} concurrent requests, {args.latency * 1000:.0f}ms simulated LLM latency")
+    print(f"{'pool':>6} {'elapsed (s)':>12} {'req/s':>10} {'speedup':>9} {'max loop lag (ms)':>18}")
+    baseline = None
+    for pool_size in [int(p) for p in args.pool_sizes.split(",")]:
+        elapsed, lag = await run(pool_size, args.requests, args.latency)
+        baseline = baseline or elapsed
+        print(f"{pool_size:>6} {elapsed:>12.3f} {args.requests / elapsed:>10.1f} "
+              f"{baseline / elapsed:>8.1f}x {lag * 1000:>18.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark for persistent agent memory.
+
+Records interactions for many users through a MemoryStore backed by SQLite and
+measures the request-side cost of recording one (the write-behind queue), the
+time for the writer to drain everything, and the time to start a new store and
+load one user's recent window from the full database.
+
+Usage: python benchmarks/bench_memory.py [--interactions 200000] [--users 1000]
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database_agent.agent_memory import MemoryStore
+
+METRICS = ["revenue", "orders", "customers", "refunds", "sessions", "signups", "tickets", "shipments"]
+DIMENSIONS = ["country", "month", "product", "channel", "plan", "region", "week", "warehouse"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--interactions", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--window", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        memory_config = {"backend": "sqlite", "path": os.path.join(directory, "memory.db"),
+                         "max_users": args.users, "max_interactions": args.window,
+                         # The burst below is far faster than real traffic; queue all of it
+                         "max_pending": args.interactions * 2}
+        store = MemoryStore({"memory": memory_config})
+        memories = [store.get(f"user{i}") for i in range(args.users)]
+        start = time.perf_counter()
+        for i in range(args.interactions):
+            metric, dimension = rng.choice(METRICS), rng.choice(DIMENSIONS)
+            interaction = memories[i % args.users].add_interaction({"content": f"{metric} by {dimension} #{i}"})
+            memories[i % args.users].update_interaction(interaction, sql=f"SELECT {i}")
+        record = (time.perf_counter() - start) / args.interactions
+        start = time.perf_counter()
+        store.flush()
+        drain = time.perf_counter() - start
+        writer_stats = store.writer.get_stats()
+        store.close()
+        size = os.path.getsize(memory_config["path"])
+
+        start = time.perf_counter()
+        reopened = MemoryStore({"memory": memory_config})
+        startup = time.perf_counter() - start
+        start = time.perf_counter()
+        memory = reopened.get("user0")
+        load = time.perf_counter() - start
+        reopened.close()
+
+    print(f"Interactions:   {args.interactions} across {args.users} users ({size / 1024 / 1024:.1f} MB on disk)")
+    print(f"Record:         {record * 1e6:.1f} us per interaction (add + update, request side)")
+    print(f"Drain:          {drain * 1000:.0f} ms after the last record, {writer_stats['batches']} batches, "
+          f"{writer_stats['dropped']} dropped")
+    print(f"Startup:        {startup * 1000:.1f} ms")
+    print(f"First access:   {load * 1000:.1f} ms ({len(memory.conversation_history)} interactions loaded)")
+
+if __name__ == "__main__":
+    main()
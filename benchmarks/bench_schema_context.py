@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark for relevance-ranked schema context on a large synthetic warehouse.
+
+Builds a schema of N tables (default 1,800) with realistic snake_case names and
+foreign-key chains, then measures index build time, per-prompt lookup latency
+and how much of the schema ends up in the context.
+
+Usage: python benchmarks/bench_schema_context.py [--tables 1800] [--lookups 2000]
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database_agent.schema_index import SchemaIndex, estimate_tokens
+
+DOMAINS = ["sales", "billing", "inventory", "shipping", "marketing", "support", "finance", "hr", "crm"]
+ENTITIES = ["customer", "order", "invoice", "product", "warehouse", "shipment", "campaign", "ticket",
+            "payment", "employee", "account", "contract", "supplier", "region", "lead", "refund"]
+COLUMNS = ["status", "created_at", "updated_at", "amount", "currency", "name", "email", "quantity",
+           "price", "description", "code", "country", "segment", "priority", "score", "notes"]
+
+def build_schema(table_count: int, seed: int = 7):
+    rng = random.Random(seed)
+    tables, relationships = [], []
+    for i in range(table_count):
+        name = f"{rng.choice(DOMAINS)}_{rng.choice(ENTITIES)}_{i}"
+        columns = ["id"] + rng.sample(COLUMNS, 12)
+        if tables:
+            parent = rng.choice(tables[-50:])
+            fk = f"{parent['name']}_id"
+            columns.append(fk)
+            relationships.append({"from_table": name, "to_table": parent["name"], "from_column": fk,
+                                  "to_column": "id", "type": "foreign_key", "confidence": 1.0})
+        tables.append({"name": name, "columns": columns, "primary_key": "id", "indexes": [],
+                       "row_count": rng.randint(0, 10_000_000)})
+    return tables, relationships
+
+def main():
+    parser = argparse.ArgumentParser(description="Schema context benchmark")
+    parser.add_argument("--tables", type=int, default=1800)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    tables, relationships = build_schema(args.tables)
+    full_tokens = sum(estimate_tokens(t) for t in tables)
+
+    start = time.perf_counter()
+    index = SchemaIndex(tables, relationships)
+    build = time.perf_counter() - start
+
+    rng = random.Random(11)
+    prompts = [
+        f"{rng.choice(['show', 'count', 'total'])} {rng.choice(ENTITIES)}s by {rng.choice(COLUMNS)} "
+        f"for each {rng.choice(ENTITIES)} in {rng.choice(DOMAINS)}"
+        for _ in range(args.lookups)
+    ]
+    timings, sizes = [], []
+    for prompt in prompts:
+        start = time.perf_counter()
+        context = index.search(prompt)
+        timings.append(time.perf_counter() - start)
+        sizes.append(context["estimated_tokens"])
+
+    timings.sort()
+    print(f"Schema: {args.tables} tables, {len(relationships)} relationships, ~{full_tokens:,} tokens in full")
+    print(f"Index build:        {build * 1000:8.1f} ms")
+    print(f"Lookup median:      {statistics.median(timings) * 1000:8.3f} ms")
+    print(f"Lookup p99:         {timings[int(len(timings) * 0.99)] * 1000:8.3f} ms")
+    print(f"Context size (avg): {statistics.mean(sizes):8.0f} tokens "
+          f"({statistics.mean(sizes) / full_tokens:.2%} of full schema)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the slot-based schema model against the previous dict-of-lists layout.
+
+Builds the synthetic warehouse from bench_schema_context.py with freshly allocated
+name strings (as a database driver returns them), then compares the memory held by
+each representation and the time to look up tables, columns and join neighbours.
+
+Usage: python benchmarks/bench_schema_model.py [--tables 1800] [--lookups 20000]
+"""
+
+import sys
+import os
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database_agent.schema_model import SchemaModel
+from bench_schema_context import build_schema
+
+def fresh(name: str) -> str:
+    """A new string object with the same value, defeating literal sharing."""
+    return (name + ".")[:-1]
+
+def driver_output(tables, relationships):
+    tables = [{**table, "name": fresh(table["name"]), "columns": [fresh(c) for c in table["columns"]]}
+              for table in tables]
+    relationships = [{key: fresh(value) if isinstance(value, str) else value for key, value in rel.items()}
+                     for rel in relationships]
+    return tables, relationships
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return value, size
+
+def timed(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(*item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Schema model benchmark")
+    parser.add_argument("--tables", type=int, default=1800)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    raw_tables, raw_relationships = build_schema(args.tables)
+    legacy, legacy_bytes = measure(lambda: driver_output(raw_tables, raw_relationships))
+    # The driver output is discarded once the model is built, so only the model's strings survive
+    model, model_bytes = measure(lambda: SchemaModel.from_dicts(*driver_output(raw_tables, raw_relationships)))
+    legacy_tables, legacy_relationships = legacy
+
+    rng = random.Random(3)
+    names = [table["name"] for table in raw_tables]
+    table_lookups = [(rng.choice(names),) for _ in range(args.lookups)]
+    column_lookups = [(rng.choice(names), rng.choice(["id", "status", "missing"])) for _ in range(args.lookups)]
+
+    def legacy_table(name):
+        return next((t for t in legacy_tables if t["name"] == name), None)
+
+    def legacy_column(name, column):
+        table = legacy_table(name)
+        return table is not None and column in table["columns"]
+
+    def legacy_neighbours(name):
+        return [r["to_table"] if r["from_table"] == name else r["from_table"]
+                for r in legacy_relationships if name in (r["from_table"], r["to_table"])]
+
+    columns = sum(len(table["columns"]) for table in raw_tables)
+    print(f"Schema: {args.tables} tables, {columns:,} columns, {len(raw_relationships)} relationships")
+    print(f"{'':22}{'dict-of-lists':>16}{'SchemaModel':>16}")
+    print(f"{'Memory':22}{legacy_bytes / 1024:13.0f} KB{model_bytes / 1024:13.0f} KB")
+    print(f"{'Table lookup':22}{timed(legacy_table, table_lookups):13.2f} us"
+          f"{timed(model.get_table, table_lookups):13.2f} us")
+    print(f"{'Column lookup':22}{timed(legacy_column, column_lookups):13.2f} us"
+          f"{timed(model.has_column, column_lookups):13.2f} us")
+    print(f"{'Join neighbours':22}{timed(legacy_neighbours, table_lookups[:2000]):13.2f} us"
+          f"{timed(model.neighbours, table_lookups):13.2f} us")
+
+if __name__ == "__main__":
+    main()
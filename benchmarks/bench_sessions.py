@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress benchmark for agent sessions.
+
+Runs requests through one shared TrueDatabaseAgent from a growing number of
+concurrent sessions. Each session makes its requests one after another; the LLM
+is simulated with a fixed latency, and every generated query runs against a
+SQLite database through the shared connection pool. Every result and every
+session's final goal is checked against the request that produced it, so any
+cross-talk between sessions fails the run.
+
+Throughput should grow linearly with the number of sessions while the simulated
+LLM latency dominates; the efficiency column is throughput relative to
+sessions x single-session throughput. It falls off once the per-request CPU work
+(SQL parsing and validation, about 1 ms) saturates the available cores; with one
+core and 20 ms of LLM latency that happens at around 32 sessions.
+
+Usage: python benchmarks/bench_sessions.py [--sessions 1,2,4,8,16,32,64] [--requests 20] [--latency-ms 20]
+"""
+
+import sys
+import os
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database_agent.cache import SQLCache
+from src.database_agent.example_store import ExampleStore
+from src.database_agent.sessions import SessionManager
+from src.database_agent.true_agent import TrueDatabaseAgent
+
+class SimulatedLLM:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.example_store = ExampleStore({"examples": {"enabled": False}})
+        self.cache = SQLCache({"cache": {"enabled": False}})
+
+    async def generate_sql(self, prompt, schema_context=None, memory=None, cache=True, examples=None):
+        await asyncio.sleep(self.latency)
+        return f"SELECT '{prompt.split()[-1]}' AS tag FROM users LIMIT 1"
+
+async def run_level(manager: SessionManager, sessions: int, requests: int, level: int) -> float:
+    async def conversation(index: int):
+        session_id = f"level{level}-session{index}"
+        for request in range(requests):
+            tag = f"s{level}x{index}x{request}"
+            result = await manager.process_request(session_id, f"show me {tag}", user_id=session_id)
+            if result.get("error") or result["data"]["data"]["tag"] != [tag]:
+                raise AssertionError(f"Session {session_id} got a result for another request: {result}")
+        goal = manager.get(session_id).current_goal
+        if goal.description != f"show me s{level}x{index}x{requests - 1}":
+            raise AssertionError(f"Session {session_id} ended on another session's goal: {goal.description}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*[conversation(i) for i in range(sessions)])
+    return sessions * requests / (time.perf_counter() - start)
+
+async def run(args):
+    levels = [int(level) for level in args.sessions.split(",")]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE users (id INTEGER)")
+        connection.execute("INSERT INTO users VALUES (1)")
+        connection.commit()
+        connection.close()
+        config = {"schema": {"database_url": f"sqlite:///{path}"}, "sessions": {"max_sessions": sum(levels)}}
+        agent = TrueDatabaseAgent(config, llm_integration=SimulatedLLM(args.latency_ms / 1000))
+        manager = SessionManager(config, agent)
+        print(f"{'sessions':>8} {'requests/s':>11} {'efficiency':>10}")
+        base = None
+        for level in levels:
+            throughput = await run_level(manager, level, args.requests, level)
+            base = base or throughput / level
+            print(f"{level:>8} {throughput:>11.1f} {throughput / (base * level):>10.0%}")
+        stats = manager.get_stats()
+        print(f"Sessions opened: {stats['opened']}, requests: {stats['requests']}, no cross-talk detected")
+        await agent.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", default="1,2,4,8,16,32,64")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
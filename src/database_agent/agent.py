@@ -1,7 +1,14 @@
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 from datetime import datetime
 from .llm_integration import LLMIntegration
+from .schema_manager import SchemaManager
+from .coalescing import SingleFlight
+from .query_executor import QueryExecutor
+from .query_guard import QueryGuard
+from .sql_validator import SQLValidator
+from .columnar import ColumnarResult
 from .tools.query_tool import QueryTool
 
 class DatabaseAgent:
@@ -10,7 +17,19 @@ class DatabaseAgent:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.llm_integration = LLMIntegration(config)
+        self.schema_manager = SchemaManager(config)
+        # Cached SQL is only valid for the schema it was generated against
+        self.llm_integration.cache.invalidate(self.schema_manager.schema_version)
+        self.schema_manager.add_diff_listener(self.llm_integration.cache.apply_schema_diff)
         self.query_tool = QueryTool(self.llm_integration)
+        self.single_flight = SingleFlight()
+        self.query_executor = QueryExecutor(config)
+        self.query_guard = QueryGuard(config, self.query_executor, self.schema_manager)
+        self.sql_validator = SQLValidator(self.schema_manager, dialect=self.llm_integration.dialect)
+        batch_config = config.get("batch", {})
+        self.batch_max_concurrency = batch_config.get("max_concurrency", 8)
+        self.batch_pack_size = batch_config.get("pack_size", 1)
+        self.batch_pack_max_chars = batch_config.get("pack_max_chars", 200)
         self.logger = logging.getLogger(__name__)
         self.logger.info("Database Agent initialized successfully")
     
@@ -18,9 +37,13 @@ class DatabaseAgent:
         """Generate SQL query from natural language prompt."""
         try:
             self.logger.info(f"Generating SQL for prompt: {prompt[:50]}...")
-            result = await self.query_tool.generate_query(prompt)
+            result = await self.single_flight.do(
+                self._request_key(prompt),
+                lambda: self._generate_with_estimate(prompt)
+            )
             self.logger.info("SQL generation completed successfully")
-            return result
+            # Coalesced callers share one result; give each its own copy
+            return {**result, "prompt": prompt}
         except Exception as e:
             self.logger.error(f"Error generating SQL: {e}")
             return {
@@ -30,6 +53,101 @@ class DatabaseAgent:
                 "timestamp": datetime.now().isoformat()
             }
     
+    async def _schema_context(self, prompt: str) -> Dict[str, Any]:
+        """Relevant tables for the prompt; generation goes ahead without them if the schema is unavailable."""
+        try:
+            return await self.schema_manager.get_schema_context(prompt)
+        except Exception as e:
+            self.logger.warning(f"Could not load schema context: {e}")
+            return {}
+    
+    async def _generate_with_estimate(self, prompt: str) -> Dict[str, Any]:
+        result = await self.query_tool.generate_query(prompt, await self._schema_context(prompt))
+        return await self._check_generated(prompt, result)
+    
+    async def _check_generated(self, prompt: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate generated SQL, keep it as an example or drop it from the cache, and attach its cost estimate."""
+        validation = self.sql_validator.validate(result["sql_query"]) if result.get("sql_query") else None
+        if validation is not None and not validation.valid:
+            # Generation caches its answer before validation; never serve rejected SQL again
+            self.llm_integration.cache.discard(prompt)
+        elif validation is not None and validation.schema_checked:
+            # SQL that checks out against the schema becomes a few-shot example for similar prompts
+            self.llm_integration.example_store.add(prompt, result["sql_query"])
+        if result.get("sql_query") and self.query_guard.enabled:
+            try:
+                result["estimate"] = (await self.query_guard.check(result["sql_query"])).to_dict()
+            except Exception as e:
+                self.logger.warning(f"Could not estimate query cost: {e}")
+        return result
+    
+    async def stream_sql_query(self, prompt: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream SQL generation as token events followed by a result or error event."""
+        self.logger.info(f"Streaming SQL for prompt: {prompt[:50]}...")
+        async for event in self.query_tool.stream_query(prompt, await self._schema_context(prompt)):
+            if event["event"] == "result":
+                # The final SQL gets the same checks as /generate-sql before it is sent
+                event["data"] = await self._check_generated(prompt, event["data"])
+            yield event
+    
+    async def execute_query(self, sql: str, max_rows: Optional[int] = None) -> ColumnarResult:
+        """Execute SQL and return its result in columnar form."""
+        self.logger.info(f"Executing SQL: {sql[:50]}...")
+        estimate = await self.query_guard.guard(sql)
+        return await self.query_executor.execute_columnar(estimate.sql, max_rows=max_rows)
+    
+    async def stream_query_results(self, sql: str, batch_size: Optional[int] = None, max_rows: Optional[int] = None,
+                                   sample: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Execute SQL and stream its result as batches of row tuples (see QueryExecutor.stream)."""
+        self.logger.info(f"Streaming results for SQL: {sql[:50]}...")
+        estimate = await self.query_guard.guard(sql)
+        batches = self.query_executor.stream(estimate.sql, batch_size=batch_size, max_rows=max_rows, sample=sample)
+        try:
+            async for batch in batches:
+                yield batch
+        finally:
+            await batches.aclose()
+    
+    async def generate_sql_queries(self, prompts: List[str], max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Generate SQL for many prompts, returning per-item results in input order."""
+        self.logger.info(f"Generating SQL for batch of {len(prompts)} prompts")
+        semaphore = asyncio.Semaphore(max_concurrency or self.batch_max_concurrency)
+        if self.batch_pack_size > 1 and self.llm_integration.cache.enabled:
+            await self._generate_packed(prompts, semaphore)
+        
+        async def generate(prompt: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.generate_sql_query(prompt)
+        
+        return await asyncio.gather(*(generate(prompt) for prompt in prompts))
+    
+    async def _generate_packed(self, prompts: List[str], semaphore: asyncio.Semaphore):
+        """Warm the cache by packing short uncached prompts into multi-answer LLM requests."""
+        cache = self.llm_integration.cache
+        pending: Dict[str, str] = {}
+        for prompt in prompts:
+            if len(prompt) <= self.batch_pack_max_chars and not await cache.contains_async(prompt):
+                pending.setdefault(cache.make_key(prompt), prompt)
+        
+        unique = list(pending.values())
+        chunks = [unique[i:i + self.batch_pack_size] for i in range(0, len(unique), self.batch_pack_size)]
+        chunks = [chunk for chunk in chunks if len(chunk) > 1]
+        
+        async def pack(chunk: List[str]):
+            try:
+                async with semaphore:
+                    contexts = await asyncio.gather(*(self._schema_context(prompt) for prompt in chunk))
+                    await self.llm_integration.generate_sql_many(chunk, list(contexts))
+            except Exception as e:
+                # Anything not cached here is generated individually afterwards
+                self.logger.warning(f"Packed generation of {len(chunk)} prompts failed: {e}")
+        
+        await asyncio.gather(*(pack(chunk) for chunk in chunks))
+    
+    def _request_key(self, prompt: str) -> str:
+        """Key under which identical in-flight requests are coalesced."""
+        return f"{self.schema_manager.schema_version}:{self.llm_integration.cache.make_key(prompt)}"
+    
     async def health_check(self) -> Dict[str, Any]:
         """Health check for the agent."""
         try:
@@ -37,6 +155,12 @@ class DatabaseAgent:
             return {
                 "status": "healthy",
                 "llm_status": llm_status,
+                "cache": self.llm_integration.cache.get_stats(),
+                "coalescing": self.single_flight.get_stats(),
+                "execution": self.query_executor.get_stats(),
+                "guard": self.query_guard.get_stats(),
+                "prompt": self.llm_integration.prompt_builder.get_stats(),
+                "examples": self.llm_integration.example_store.get_stats(),
                 "timestamp": datetime.now().isoformat(),
                 "version": "1.0.0"
             }
@@ -49,6 +173,17 @@ class DatabaseAgent:
                 "version": "1.0.0"
             }
     
+    async def startup(self):
+        """Start background work tied to the server lifecycle."""
+        await self.schema_manager.start_background_refresh()
+    
+    async def shutdown(self):
+        """Release resources held by the agent."""
+        await self.schema_manager.stop_background_refresh()
+        self.llm_integration.close()
+        await self.query_executor.close()
+        self.logger.info("Database Agent shut down")
+    
     def get_available_tools(self) -> Dict[str, Any]:
         """Get list of available MCP tools."""
         return {
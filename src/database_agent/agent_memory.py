@@ -0,0 +1,300 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+from .schema_index import tokenize
+from .memory_backend import MemoryOp, MemoryWriter, create_memory_backend
+
+DEFAULT_USER = "default"
+
+def extract_keywords(text: str) -> List[str]:
+    """Distinct normalized terms of a request, in order (stopwords dropped, plurals folded)."""
+    return list(dict.fromkeys(term for term in tokenize(text) if len(term) > 2))
+
+class AgentMemory:
+    """Bounded memory of one user's interactions with the agent.
+
+    Interactions and executed queries are ring buffers: once full, the oldest entry is dropped.
+    An inverted keyword index over the buffered interactions makes relevance lookups proportional
+    to the request's keywords and their matches, not the history length. Learned patterns are
+    kept in LRU order and the least recently used one is evicted first.
+
+    With a writer, every change is also handed to it for persistence under user_id. Sequence
+    numbers are derived from the clock, so entries written by several workers stay unique and
+    ordered by time.
+    """
+    def __init__(self, max_interactions: int = 200, max_queries: int = 200, max_patterns: int = 500,
+                 user_id: str = DEFAULT_USER, writer: Optional[MemoryWriter] = None):
+        self.user_id = user_id
+        self.writer = writer
+        self.max_interactions = max_interactions
+        self.max_patterns = max_patterns
+        self.conversation_history: "deque[Dict[str, Any]]" = deque()
+        self.executed_queries: "deque[Dict[str, Any]]" = deque(maxlen=max_queries)
+        self.learned_patterns: "OrderedDict[str, Any]" = OrderedDict()
+        self.user_preferences: Dict[str, Any] = {}
+        self._index: Dict[str, Set[int]] = {}
+        self._by_seq: Dict[int, Dict[str, Any]] = {}
+        self._next_seq = 0
+        self._lock = threading.Lock()
+
+    def add_interaction(self, interaction: Dict[str, Any]) -> Dict[str, Any]:
+        """Add an interaction to memory; the stored dict is returned so callers can add its outcome."""
+        interaction["timestamp"] = datetime.now().isoformat()
+        keywords = interaction.get("keywords")
+        if keywords is None:
+            keywords = interaction["keywords"] = extract_keywords(interaction.get("content", ""))
+        with self._lock:
+            interaction["_seq"] = self._take_seq()
+            self._remember(interaction)
+        self._persist("interaction", interaction)
+        return interaction
+
+    def update_interaction(self, interaction: Dict[str, Any], **fields):
+        """Set fields on a stored interaction, e.g. the SQL it produced, and persist the change."""
+        interaction.update(fields)
+        self._persist("interaction", interaction)
+
+    def _take_seq(self) -> int:
+        seq = max(self._next_seq, time.time_ns())
+        self._next_seq = seq + 1
+        return seq
+
+    def _remember(self, interaction: Dict[str, Any]):
+        if len(self.conversation_history) >= self.max_interactions:
+            self._forget(self.conversation_history.popleft())
+        seq = interaction["_seq"]
+        self.conversation_history.append(interaction)
+        self._by_seq[seq] = interaction
+        for keyword in set(interaction.get("keywords", [])):
+            self._index.setdefault(keyword, set()).add(seq)
+
+    def _forget(self, interaction: Dict[str, Any]):
+        seq = interaction["_seq"]
+        self._by_seq.pop(seq, None)
+        for keyword in set(interaction.get("keywords", [])):
+            postings = self._index.get(keyword)
+            if postings is not None:
+                postings.discard(seq)
+                if not postings:
+                    del self._index[keyword]
+
+    def get_relevant_context(self, current_prompt: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Earlier interactions sharing keywords with the prompt: most shared keywords first, then most recent."""
+        matches: Dict[int, int] = {}
+        with self._lock:
+            for keyword in extract_keywords(current_prompt):
+                for seq in self._index.get(keyword, ()):
+                    matches[seq] = matches.get(seq, 0) + 1
+            ranked = sorted(matches, key=lambda seq: (matches[seq], seq), reverse=True)
+            relevant = []
+            for seq in ranked:
+                interaction = self._by_seq[seq]
+                # The request being answered is already in memory; it is not context for itself
+                if interaction.get("content") == current_prompt:
+                    continue
+                relevant.append(interaction)
+                if len(relevant) >= limit:
+                    break
+        return relevant
+
+    def add_executed_query(self, query: Dict[str, Any]):
+        query["timestamp"] = datetime.now().isoformat()
+        with self._lock:
+            query["_seq"] = self._take_seq()
+            self.executed_queries.append(query)
+        self._persist("query", query)
+
+    def remember_pattern(self, key: str, value: Any):
+        with self._lock:
+            self._set_pattern(key, value)
+        if self.writer is not None:
+            self.writer.submit("pattern", self.user_id, key, value)
+
+    def _set_pattern(self, key: str, value: Any):
+        self.learned_patterns[key] = value
+        self.learned_patterns.move_to_end(key)
+        while len(self.learned_patterns) > self.max_patterns:
+            self.learned_patterns.popitem(last=False)
+
+    def _persist(self, kind: str, entry: Dict[str, Any]):
+        if self.writer is not None:
+            payload = {key: value for key, value in entry.items() if key != "_seq"}
+            self.writer.submit(kind, self.user_id, entry["_seq"], payload)
+
+    def restore(self, loaded: Dict[str, List[Any]]):
+        """Fill memory from MemoryBackend.load_recent output without writing it back."""
+        with self._lock:
+            for interaction in loaded.get("interactions", []):
+                interaction.setdefault("keywords", extract_keywords(interaction.get("content", "")))
+                self._remember(interaction)
+                self._next_seq = max(self._next_seq, interaction["_seq"] + 1)
+            for query in loaded.get("queries", []):
+                self.executed_queries.append(query)
+                self._next_seq = max(self._next_seq, query["_seq"] + 1)
+            for key, value in loaded.get("patterns", []):
+                self._set_pattern(key, value)
+
+    def get_pattern(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self.learned_patterns:
+                return default
+            self.learned_patterns.move_to_end(key)
+            return self.learned_patterns[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "interactions": len(self.conversation_history),
+            "executed_queries": len(self.executed_queries),
+            "learned_patterns": len(self.learned_patterns),
+            "indexed_keywords": len(self._index)
+        }
+
+class MemoryStore:
+    """Per-user AgentMemory instances, shareable between agents and sessions.
+
+    At most max_users memories are kept; the least recently used user's memory is dropped first.
+    With memory.backend set, changes are written behind to that backend and a user's memory is
+    loaded lazily on first access, recent window only, so startup cost does not grow with the
+    amount of stored history. A dropped user is simply reloaded from the backend when needed;
+    changes still queued for writing are taken from the writer, so loading never waits for it.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        memory_config = config.get("memory", {})
+        self.max_users = memory_config.get("max_users", 1000)
+        self.max_interactions = memory_config.get("max_interactions", 200)
+        self.max_queries = memory_config.get("max_queries", 200)
+        self.max_patterns = memory_config.get("max_patterns", 500)
+        self.context_limit = memory_config.get("context_limit", 5)
+        self.backend = create_memory_backend(config)
+        self.writer: Optional[MemoryWriter] = None
+        if self.backend is not None:
+            self.writer = MemoryWriter(
+                self.backend,
+                batch_size=memory_config.get("batch_size", 500),
+                flush_interval=memory_config.get("flush_interval", 0.5),
+                max_pending=memory_config.get("max_pending", 100000)
+            )
+        self._memories: "OrderedDict[str, AgentMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evicted = 0
+        self._loaded = 0
+
+    def get(self, user_id: Optional[str] = None) -> AgentMemory:
+        """The user's memory; with a backend, a first access reads it in the calling thread."""
+        user_id = user_id or DEFAULT_USER
+        memory = self._existing(user_id)
+        if memory is None:
+            memory = self._add(user_id, self._read(user_id))
+        return memory
+
+    async def get_async(self, user_id: Optional[str] = None) -> AgentMemory:
+        """Like get, but a first access reads the backend in an executor, off the event loop."""
+        user_id = user_id or DEFAULT_USER
+        memory = self._existing(user_id)
+        if memory is None:
+            loaded = None
+            if self.backend is not None:
+                loaded = await asyncio.get_running_loop().run_in_executor(None, self._read, user_id)
+            memory = self._add(user_id, loaded)
+        return memory
+
+    def _existing(self, user_id: str) -> Optional[AgentMemory]:
+        with self._lock:
+            memory = self._memories.get(user_id)
+            if memory is not None:
+                self._memories.move_to_end(user_id)
+            return memory
+
+    def _add(self, user_id: str, loaded: Optional[Dict[str, List[Any]]]) -> AgentMemory:
+        with self._lock:
+            # Another caller may have loaded the same user meanwhile
+            memory = self._memories.get(user_id)
+            if memory is not None:
+                self._memories.move_to_end(user_id)
+                return memory
+            memory = AgentMemory(self.max_interactions, self.max_queries, self.max_patterns,
+                                 user_id=user_id, writer=self.writer)
+            if loaded is not None:
+                memory.restore(loaded)
+                self._loaded += 1
+            self._memories[user_id] = memory
+            while len(self._memories) > self.max_users:
+                evicted, _ = self._memories.popitem(last=False)
+                self._evicted += 1
+                self.logger.debug(f"Evicted memory of user {evicted}")
+            return memory
+
+    def _read(self, user_id: str) -> Optional[Dict[str, List[Any]]]:
+        """The user's recent window: stored entries overlaid with those still queued in the writer."""
+        if self.backend is None:
+            return None
+        try:
+            # Queued entries are read before and after the backend, so one written in between is not missed
+            pending = self.writer.pending(user_id)
+            loaded = self.backend.load_recent(user_id, self.max_interactions, self.max_queries, self.max_patterns)
+            pending.extend(self.writer.pending(user_id))
+        except Exception as e:
+            self.logger.warning(f"Failed to load memory of user {user_id}: {e}")
+            return None
+        return self._overlay(loaded, pending)
+
+    def _overlay(self, loaded: Dict[str, List[Any]], pending: List[MemoryOp]) -> Dict[str, List[Any]]:
+        entries = {
+            kind: {entry["_seq"]: entry for entry in loaded[name]}
+            for kind, name in (("interaction", "interactions"), ("query", "queries"))
+        }
+        patterns = OrderedDict(loaded["patterns"])
+        for kind, _, key, data, _ in sorted(pending, key=lambda op: op[4]):
+            if kind == "pattern":
+                patterns.pop(key, None)
+                patterns[key] = json.loads(data)
+            else:
+                entries[kind][key] = {**json.loads(data), "_seq": key}
+        interactions = [entries["interaction"][seq] for seq in sorted(entries["interaction"])]
+        queries = [entries["query"][seq] for seq in sorted(entries["query"])]
+        return {
+            "interactions": interactions[-self.max_interactions:],
+            "queries": queries[-self.max_queries:],
+            "patterns": list(patterns.items())[-self.max_patterns:]
+        }
+
+    def drop(self, user_id: str):
+        with self._lock:
+            self._memories.pop(user_id, None)
+
+    def flush(self):
+        """Block until every pending change has reached the backend."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __len__(self) -> int:
+        return len(self._memories)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            memories = list(self._memories.values())
+        stats = {
+            "users": len(memories),
+            "max_users": self.max_users,
+            "evicted_users": self._evicted,
+            "interactions": sum(len(memory.conversation_history) for memory in memories),
+            "learned_patterns": sum(len(memory.learned_patterns) for memory in memories)
+        }
+        if self.backend is not None:
+            stats["backend"] = type(self.backend).__name__
+            stats["loaded_users"] = self._loaded
+        if self.writer is not None:
+            stats["writer"] = self.writer.get_stats()
+        return stats
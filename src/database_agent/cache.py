@@ -0,0 +1,378 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+from .dialects import detect_dialect
+from .sql_utils import referenced_tables
+
+FILLER_PATTERN = re.compile(r"^(please|can you|could you|would you|kindly)\s+|\s+please$")
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a prompt so trivially different phrasings share a cache key."""
+    text = " ".join(prompt.lower().split())
+    text = text.rstrip(" .?!;")
+    previous = None
+    while previous != text:
+        previous = text
+        text = FILLER_PATTERN.sub("", text).strip()
+    return text
+
+class SQLCache:
+    """Two-tier cache for generated SQL: in-process LRU backed by an optional SQLite store.
+
+    Writes to the SQLite store happen behind put() on a single background thread, so callers only
+    pay for the in-process tier. get_async() also reads the store on that thread, which keeps reads
+    ordered after earlier writes and SQLite I/O off the event loop.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        cache_config = config.get("cache", {})
+        llm_config = config.get("llm", {})
+        self.enabled = cache_config.get("enabled", True)
+        self.memory_size = cache_config.get("memory_size", 1024)
+        self.ttl = cache_config.get("ttl", 86400)
+        self.max_entries = cache_config.get("max_entries", 100000)
+        self.persistent_path = cache_config.get("persistent_path")
+        # Different models answer differently, so they never share entries
+        self.namespace = f"{llm_config.get('provider', 'openai')}:{llm_config.get('model', '')}"
+        # ...and SQL written for one dialect is not reused against another
+        dialect = detect_dialect(config)
+        if dialect:
+            self.namespace += f":{dialect}"
+        self.schema_version = ""
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._persistent_count = 0
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sql-cache")
+        self._closing = False
+        self._stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "latency_saved": 0.0}
+        if self.enabled and self.persistent_path:
+            self._open_store()
+
+    def _open_store(self):
+        try:
+            directory = os.path.dirname(self.persistent_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.persistent_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sql_cache ("
+                "key TEXT PRIMARY KEY, schema_version TEXT NOT NULL, sql TEXT NOT NULL, "
+                "latency REAL NOT NULL, created_at REAL NOT NULL)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(sql_cache)")}
+            if "tables" not in columns:
+                self._db.execute("ALTER TABLE sql_cache ADD COLUMN tables TEXT NOT NULL DEFAULT ''")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_sql_cache_created ON sql_cache (created_at)")
+            self._db.commit()
+            self._persistent_count = self._db.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+            self.logger.info(f"Persistent SQL cache opened at {self.persistent_path} ({self._persistent_count} entries)")
+        except Exception as e:
+            self.logger.error(f"Failed to open persistent SQL cache: {e}")
+            self._db = None
+
+    def make_key(self, prompt: str) -> str:
+        payload = f"{self.namespace}\x00{normalize_prompt(prompt)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def contains(self, prompt: str) -> bool:
+        """Check for a live entry without touching LRU order or hit statistics."""
+        if not self.enabled:
+            return False
+        key = self.make_key(prompt)
+        now = time.time()
+        return self._contains_memory(key, now) or self._run_io(self._contains_stored, key, now)
+
+    async def contains_async(self, prompt: str) -> bool:
+        """Like contains(), but a check that reaches the SQLite store runs on the cache's I/O thread."""
+        if not self.enabled:
+            return False
+        key = self.make_key(prompt)
+        now = time.time()
+        if self._contains_memory(key, now):
+            return True
+        if self._db is None:
+            return False
+        return await asyncio.get_running_loop().run_in_executor(self._io, self._contains_stored, key, now)
+
+    def _contains_memory(self, key: str, now: float) -> bool:
+        with self._lock:
+            entry = self._memory.get(key)
+            return entry is not None and entry["schema_version"] == self.schema_version and now - entry["created_at"] <= self.ttl
+
+    def _contains_stored(self, key: str, now: float) -> bool:
+        with self._lock:
+            if self._db is None:
+                return False
+            row = self._db.execute(
+                "SELECT created_at FROM sql_cache WHERE key = ? AND schema_version = ?",
+                (key, self.schema_version)
+            ).fetchone()
+            return row is not None and now - row[0] <= self.ttl
+
+    def get(self, prompt: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        key = self.make_key(prompt)
+        now = time.time()
+        with self._lock:
+            sql = self._get_memory(key, now)
+        return sql if sql is not None else self._run_io(self._get_stored, key, now)
+
+    async def get_async(self, prompt: str) -> Optional[str]:
+        """Like get(), but a lookup that reaches the SQLite store runs on the cache's I/O thread."""
+        if not self.enabled:
+            return None
+        key = self.make_key(prompt)
+        now = time.time()
+        with self._lock:
+            sql = self._get_memory(key, now)
+            if sql is not None:
+                return sql
+            if self._db is None:
+                self._stats["misses"] += 1
+                return None
+        return await asyncio.get_running_loop().run_in_executor(self._io, self._get_stored, key, now)
+
+    def _get_memory(self, key: str, now: float) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry["schema_version"] == self.schema_version and now - entry["created_at"] <= self.ttl:
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            self._stats["latency_saved"] += entry["latency"]
+            return entry["sql"]
+        del self._memory[key]
+        return None
+
+    def _get_stored(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._get_persistent(key, now)
+            if entry is not None:
+                self._remember(key, entry)
+                self._stats["persistent_hits"] += 1
+                self._stats["latency_saved"] += entry["latency"]
+                return entry["sql"]
+            self._stats["misses"] += 1
+            return None
+
+    def _get_persistent(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT sql, latency, created_at FROM sql_cache WHERE key = ? AND schema_version = ?",
+                (key, self.schema_version)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[2] > self.ttl:
+                self._db.execute("DELETE FROM sql_cache WHERE key = ?", (key,))
+                self._db.commit()
+                self._persistent_count -= 1
+                return None
+            return {
+                "sql": row[0], "latency": row[1], "created_at": row[2],
+                "schema_version": self.schema_version, "tables": referenced_tables(row[0])
+            }
+        except Exception as e:
+            self.logger.error(f"Persistent SQL cache lookup failed: {e}")
+            return None
+
+    def put(self, prompt: str, sql: str, latency: float = 0.0):
+        if not self.enabled:
+            return
+        key = self.make_key(prompt)
+        entry = {
+            "sql": sql, "latency": latency, "created_at": time.time(),
+            "schema_version": self.schema_version, "tables": referenced_tables(sql)
+        }
+        with self._lock:
+            self._remember(key, entry)
+            self._submit(self._put_persistent, key, entry)
+
+    def discard(self, prompt: str):
+        """Drop the entry for a prompt, e.g. when its SQL failed validation."""
+        if not self.enabled:
+            return
+        key = self.make_key(prompt)
+        with self._lock:
+            self._memory.pop(key, None)
+            self._submit(self._discard_persistent, key)
+
+    def _discard_persistent(self, key: str):
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                cursor = self._db.execute("DELETE FROM sql_cache WHERE key = ?", (key,))
+                self._db.commit()
+                self._persistent_count -= cursor.rowcount
+            except Exception as e:
+                self.logger.error(f"Persistent SQL cache delete failed: {e}")
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _put_persistent(self, key: str, entry: Dict[str, Any]):
+        # Runs on the I/O thread; an invalidation queued after this write cleans up after it
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                exists = self._db.execute("SELECT 1 FROM sql_cache WHERE key = ?", (key,)).fetchone() is not None
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sql_cache (key, schema_version, sql, latency, created_at, tables) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, entry["schema_version"], entry["sql"], entry["latency"], entry["created_at"],
+                     ",".join(sorted(entry["tables"])))
+                )
+                if not exists:
+                    self._persistent_count += 1
+                if self._persistent_count > self.max_entries:
+                    self._evict_persistent()
+                self._db.commit()
+            except Exception as e:
+                self.logger.error(f"Persistent SQL cache write failed: {e}")
+
+    def flush(self):
+        """Block until every put() so far has reached the SQLite store."""
+        self._io.submit(lambda: None).result()
+
+    def _evict_persistent(self):
+        # Drop expired rows first, then the oldest rows down to 90% of capacity
+        self._db.execute("DELETE FROM sql_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        keep = int(self.max_entries * 0.9)
+        self._db.execute(
+            "DELETE FROM sql_cache WHERE key NOT IN (SELECT key FROM sql_cache ORDER BY created_at DESC LIMIT ?)",
+            (keep,)
+        )
+        self._persistent_count = self._db.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+        self.logger.info(f"Persistent SQL cache evicted down to {self._persistent_count} entries")
+
+    def invalidate(self, schema_version: str):
+        """Switch to a new schema version, dropping entries generated against any other."""
+        with self._lock:
+            self.schema_version = schema_version
+            stale = [key for key, entry in self._memory.items() if entry["schema_version"] != schema_version]
+            for key in stale:
+                del self._memory[key]
+            # Queued behind pending writes, so rows they add for the old version are dropped too
+            self._submit(self._invalidate_persistent, schema_version)
+        if stale:
+            self.logger.info(f"SQL cache invalidated {len(stale)} entries for schema version {schema_version}")
+
+    def _invalidate_persistent(self, schema_version: str):
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                cursor = self._db.execute("DELETE FROM sql_cache WHERE schema_version != ?", (schema_version,))
+                self._db.commit()
+                self._persistent_count = self._db.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+                if cursor.rowcount:
+                    self.logger.info(f"Persistent SQL cache invalidated {cursor.rowcount} entries")
+            except Exception as e:
+                self.logger.error(f"Persistent SQL cache invalidation failed: {e}")
+
+    def apply_schema_diff(self, diff):
+        """Move entries to the new schema version, dropping only those that touch affected tables."""
+        if diff.version == diff.previous_version:
+            return
+        if diff.previous_version != self.schema_version:
+            self.invalidate(diff.version)
+            return
+        affected = {name.lower() for name in diff.affected_tables}
+        with self._lock:
+            self.schema_version = diff.version
+            removed = 0
+            for key in list(self._memory):
+                entry = self._memory[key]
+                if entry["schema_version"] != diff.previous_version or entry["tables"] & affected:
+                    del self._memory[key]
+                    removed += 1
+                else:
+                    entry["schema_version"] = diff.version
+            self._submit(self._apply_persistent_diff, diff, affected)
+        self.logger.info(f"SQL cache dropped {removed} entries touching {len(affected)} changed tables")
+
+    def _apply_persistent_diff(self, diff, affected):
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                rows = self._db.execute(
+                    "SELECT key, tables FROM sql_cache WHERE schema_version = ?", (diff.previous_version,)
+                ).fetchall()
+                stale = [(key,) for key, tables in rows if set(filter(None, tables.split(","))) & affected]
+                self._db.executemany("DELETE FROM sql_cache WHERE key = ?", stale)
+                self._db.execute(
+                    "UPDATE sql_cache SET schema_version = ? WHERE schema_version = ?",
+                    (diff.version, diff.previous_version)
+                )
+                self._db.execute("DELETE FROM sql_cache WHERE schema_version != ?", (diff.version,))
+                self._db.commit()
+                self._persistent_count = self._db.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+            except Exception as e:
+                self.logger.error(f"Persistent SQL cache diff invalidation failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._submit(self._clear_persistent)
+
+    def _clear_persistent(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM sql_cache")
+                self._db.commit()
+                self._persistent_count = 0
+
+    def _run_io(self, func, *args):
+        """Run SQLite work on the I/O thread and wait for it, so it sees every write queued before it."""
+        if self._db is None or self._closing:
+            return func(*args)
+        return self._io.submit(func, *args).result()
+
+    def _submit(self, func, *args):
+        """Queue SQLite work on the I/O thread, after everything queued before it. Call with _lock held."""
+        if self._db is not None and not self._closing:
+            self._io.submit(func, *args)
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self._stats["memory_hits"] + self._stats["persistent_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            "enabled": self.enabled,
+            "schema_version": self.schema_version,
+            "memory_entries": len(self._memory),
+            "persistent_entries": self._persistent_count if self._db is not None else None,
+            "hits": hits,
+            "memory_hits": self._stats["memory_hits"],
+            "persistent_hits": self._stats["persistent_hits"],
+            "misses": self._stats["misses"],
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "latency_saved_seconds": round(self._stats["latency_saved"], 3)
+        }
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+        self._io.shutdown(wait=True)
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
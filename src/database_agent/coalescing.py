@@ -0,0 +1,42 @@
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into a single in-flight task."""
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run func for key, or join the call already running for it."""
+        self._stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._stats["executions"] += 1
+        else:
+            self._stats["coalesced"] += 1
+            self.logger.debug(f"Coalesced call onto in-flight request {key[:12]}")
+        # Shield so one caller cancelling does not cancel the shared call for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every waiter was cancelled
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls = self._stats["calls"]
+        return {
+            "calls": calls,
+            "executions": self._stats["executions"],
+            "coalesced": self._stats["coalesced"],
+            "in_flight": len(self._inflight),
+            "coalesced_ratio": round(self._stats["coalesced"] / calls, 4) if calls else 0.0
+        }
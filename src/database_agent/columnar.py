@@ -0,0 +1,156 @@
+from collections import Counter
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+def _column_array(values: Sequence[Any]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Pack one column of Python values into a typed NumPy array plus a null mask (None if no nulls)."""
+    mask = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+    has_nulls = bool(mask.any())
+    present = {type(value) for value in values if value is not None} if has_nulls else set(map(type, values))
+    if present and present <= {bool}:
+        dtype, fill = np.bool_, False
+    elif present and present <= {int, bool}:
+        dtype, fill = np.int64, 0
+    elif present and present <= {int, float, bool}:
+        dtype, fill = np.float64, 0.0
+    else:
+        dtype, fill = object, None
+    if has_nulls and dtype is not object:
+        values = [fill if value is None else value for value in values]
+    try:
+        array = np.array(values, dtype=dtype)
+    except OverflowError:
+        # Integers beyond int64
+        array = np.array(values, dtype=object)
+    if array.ndim != 1:
+        # Sequence-valued cells (e.g. lists) must stay one object per row
+        array = np.empty(len(values), dtype=object)
+        array[:] = list(values)
+    return array, (mask if has_nulls else None)
+
+def _python(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+class ColumnarResult:
+    """Query result held column by column as NumPy arrays, with optional null masks.
+
+    Summaries are computed with array operations instead of per-row dicts, and numeric columns
+    convert to Arrow without copying their data.
+    """
+    __slots__ = ("columns", "arrays", "masks", "row_count", "truncated")
+
+    def __init__(self, columns: List[str], arrays: List[np.ndarray], masks: List[Optional[np.ndarray]],
+                 truncated: bool = False):
+        self.columns = columns
+        self.arrays = arrays
+        self.masks = masks
+        self.row_count = len(arrays[0]) if arrays else 0
+        self.truncated = truncated
+
+    @classmethod
+    def from_rows(cls, columns: List[str], rows: Sequence[Sequence[Any]], truncated: bool = False) -> "ColumnarResult":
+        if rows:
+            packed = [_column_array(values) for values in zip(*rows)]
+        else:
+            packed = [(np.array([], dtype=object), None) for _ in columns]
+        return cls(list(columns), [array for array, _ in packed], [mask for _, mask in packed], truncated)
+
+    @classmethod
+    def from_arrow(cls, table, truncated: bool = False) -> "ColumnarResult":
+        arrays, masks = [], []
+        for column in table.columns:
+            column = column.combine_chunks() if hasattr(column, "combine_chunks") else column
+            mask = column.is_null().to_numpy(zero_copy_only=False) if column.null_count else None
+            arrays.append(column.to_numpy(zero_copy_only=False))
+            masks.append(mask)
+        return cls(list(table.column_names), arrays, masks, truncated)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the result (object columns count 8 bytes per reference)."""
+        return sum(array.nbytes for array in self.arrays) + sum(mask.nbytes for mask in self.masks if mask is not None)
+
+    def column(self, name: str) -> List[Any]:
+        index = self.columns.index(name)
+        return self._values(index)
+
+    def _values(self, index: int) -> List[Any]:
+        values = self.arrays[index].tolist()
+        mask = self.masks[index]
+        if mask is not None:
+            values = [None if null else value for value, null in zip(values, mask.tolist())]
+        return values
+
+    def to_rows(self) -> List[tuple]:
+        return list(zip(*(self._values(index) for index in range(len(self.columns)))))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [dict(zip(self.columns, row)) for row in self.to_rows()]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Column-oriented JSON-friendly form: {"columns", "data": {name: values}, "row_count", "truncated"}."""
+        return {
+            "columns": self.columns,
+            "data": {name: self._values(index) for index, name in enumerate(self.columns)},
+            "row_count": self.row_count,
+            "truncated": self.truncated
+        }
+
+    def to_arrow(self):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for Arrow output; install it with: pip install pyarrow")
+        arrays = []
+        for array, mask in zip(self.arrays, self.masks):
+            if array.dtype == object:
+                arrays.append(pa.array(array.tolist() if mask is None else self._masked_list(array, mask)))
+            else:
+                arrays.append(pa.array(array, mask=mask))
+        return pa.Table.from_arrays(arrays, names=self.columns)
+
+    @staticmethod
+    def _masked_list(array: np.ndarray, mask: np.ndarray) -> List[Any]:
+        return [None if null else value for value, null in zip(array.tolist(), mask.tolist())]
+
+    def summarize(self, top_k: int = 5) -> Dict[str, Dict[str, Any]]:
+        """Per-column count, nulls, null ratio, distinct count, min/max (and mean for numbers) and top-k values."""
+        return {name: self._summarize_column(index, top_k) for index, name in enumerate(self.columns)}
+
+    def _summarize_column(self, index: int, top_k: int) -> Dict[str, Any]:
+        array, mask = self.arrays[index], self.masks[index]
+        nulls = int(mask.sum()) if mask is not None else 0
+        valid = array[~mask] if mask is not None else array
+        summary = {
+            "count": self.row_count,
+            "nulls": nulls,
+            "null_ratio": round(nulls / self.row_count, 4) if self.row_count else 0.0,
+            "distinct": 0,
+            "min": None,
+            "max": None,
+            "top": []
+        }
+        if not len(valid):
+            return summary
+        if valid.dtype.kind in "biuf":
+            summary["min"], summary["max"] = _python(valid.min()), _python(valid.max())
+            summary["mean"] = round(float(valid.mean()), 6)
+            values, counts = np.unique(valid, return_counts=True)
+            summary["distinct"] = len(values)
+            top = np.argsort(-counts, kind="stable")[:top_k]
+            summary["top"] = [{"value": _python(values[i]), "count": int(counts[i])} for i in top]
+            return summary
+        # Object columns: hashing beats np.unique, which sorts with Python comparisons
+        counter = Counter(valid.tolist())
+        summary["distinct"] = len(counter)
+        try:
+            summary["min"], summary["max"] = min(counter), max(counter)
+        except TypeError:
+            # Mixed, unorderable types have no min or max
+            pass
+        summary["top"] = [{"value": value, "count": count} for value, count in counter.most_common(top_k)]
+        return summary
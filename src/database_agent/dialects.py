@@ -0,0 +1,245 @@
+import logging
+from typing import Dict, Any, List, Optional
+
+try:
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import SqlglotError
+except ImportError:  # pragma: no cover - sqlglot is optional
+    sqlglot = None
+
+logger = logging.getLogger(__name__)
+
+# database_url scheme -> sqlglot dialect name
+DIALECT_ALIASES = {
+    "sqlite": "sqlite",
+    "duckdb": "duckdb",
+    "postgres": "postgres",
+    "postgresql": "postgres",
+    "redshift": "redshift",
+    "mysql": "mysql",
+    "mariadb": "mysql",
+    "mssql": "tsql",
+    "sqlserver": "tsql",
+    "oracle": "oracle",
+    "snowflake": "snowflake",
+    "bigquery": "bigquery",
+    "trino": "trino",
+    "presto": "presto",
+    "clickhouse": "clickhouse"
+}
+
+# Dialects models most often drift into; tried when the output does not parse as the target
+FALLBACK_READ_DIALECTS = ("mysql", "postgres")
+
+DIALECT_GUIDES: Dict[str, Dict[str, Any]] = {
+    "sqlite": {
+        "name": "SQLite",
+        "rules": [
+            "Dates are TEXT: use DATE('now'), DATETIME('now', '-1 month') and STRFTIME('%Y', col); there is no NOW(), DATE_SUB or INTERVAL",
+            "Use || to concatenate strings and COALESCE instead of IFNULL/NVL",
+            "Quote identifiers with double quotes"
+        ],
+        "examples": [
+            ("Get orders from last month", "SELECT * FROM orders WHERE order_date >= DATE('now', '-1 month');"),
+            ("Orders per year", "SELECT STRFTIME('%Y', order_date) AS year, COUNT(*) FROM orders GROUP BY year;")
+        ]
+    },
+    "postgres": {
+        "name": "PostgreSQL",
+        "rules": [
+            "Use NOW() - INTERVAL '1 month', DATE_TRUNC and EXTRACT(YEAR FROM col) for dates",
+            "Use ILIKE for case-insensitive matching and || to concatenate strings",
+            "Quote identifiers with double quotes, never backticks"
+        ],
+        "examples": [
+            ("Get orders from last month", "SELECT * FROM orders WHERE order_date >= NOW() - INTERVAL '1 month';"),
+            ("Orders per year", "SELECT EXTRACT(YEAR FROM order_date) AS year, COUNT(*) FROM orders GROUP BY year;")
+        ]
+    },
+    "duckdb": {
+        "name": "DuckDB",
+        "rules": [
+            "Use CURRENT_DATE - INTERVAL 1 MONTH, DATE_TRUNC and YEAR(col) for dates",
+            "Use ILIKE for case-insensitive matching and || to concatenate strings",
+            "Quote identifiers with double quotes"
+        ],
+        "examples": [
+            ("Get orders from last month", "SELECT * FROM orders WHERE order_date >= CURRENT_DATE - INTERVAL 1 MONTH;"),
+            ("Orders per year", "SELECT YEAR(order_date) AS year, COUNT(*) FROM orders GROUP BY year;")
+        ]
+    },
+    "mysql": {
+        "name": "MySQL",
+        "rules": [
+            "Use DATE_SUB(NOW(), INTERVAL 1 MONTH), YEAR(col) and DATE_FORMAT for dates",
+            "Use CONCAT to join strings and backticks to quote identifiers"
+        ],
+        "examples": [
+            ("Get orders from last month", "SELECT * FROM orders WHERE order_date >= DATE_SUB(NOW(), INTERVAL 1 MONTH);"),
+            ("Orders per year", "SELECT YEAR(order_date) AS year, COUNT(*) FROM orders GROUP BY year;")
+        ]
+    }
+}
+
+def detect_dialect(config: Dict[str, Any]) -> Optional[str]:
+    """Target SQL dialect: schema.dialect if set, otherwise the scheme of schema.database_url (None if unknown)."""
+    schema_config = config.get("schema", {})
+    explicit = schema_config.get("dialect")
+    if explicit:
+        return DIALECT_ALIASES.get(explicit.lower(), explicit.lower())
+    database_url = schema_config.get("database_url") or ""
+    if "://" not in database_url:
+        return None
+    scheme = database_url.split("://", 1)[0].split("+", 1)[0].lower()
+    return DIALECT_ALIASES.get(scheme)
+
+def dialect_name(dialect: Optional[str]) -> str:
+    if dialect is None:
+        return "standard SQL"
+    return DIALECT_GUIDES.get(dialect, {}).get("name", dialect)
+
+def sql_system_prompt(dialect: Optional[str]) -> str:
+    """System prompt for SQL generation, with date, string and quoting rules of the target dialect."""
+    guide = DIALECT_GUIDES.get(dialect, {})
+    rules = [
+        "Generate only SQL queries, no explanations in the response",
+        f"Write {dialect_name(dialect)}" + (" syntax only" if dialect else " syntax"),
+        *guide.get("rules", ["Use appropriate date functions for time-based queries"]),
+        "Use only the tables and columns listed under Schema when it is given",
+        "Use proper JOINs when multiple tables are needed",
+        "Include appropriate WHERE clauses for filtering"
+    ]
+    # Schema-specific examples are retrieved per request; these only show the dialect's idioms
+    examples = guide.get("examples", [])
+    lines = ["You are a SQL expert. Your task is to generate SQL queries based on user requests.", "", "Guidelines:"]
+    lines.extend(f"{number}. {rule}" for number, rule in enumerate(rules, 1))
+    if examples:
+        lines.append("")
+        lines.append("Dialect examples:")
+        lines.extend(f'- "{request}" → "{sql}"' for request, sql in examples)
+    return "\n".join(lines)
+
+SQLITE_UNITS = {
+    "SECOND": ("seconds", 1), "MINUTE": ("minutes", 1), "HOUR": ("hours", 1), "DAY": ("days", 1),
+    "WEEK": ("days", 7), "MONTH": ("months", 1), "QUARTER": ("months", 3), "YEAR": ("years", 1)
+}
+SQLITE_PARTS = {"Year": "%Y", "Month": "%m", "Day": "%d"}
+
+def _sqlite_modifier(amount, unit, sign: int) -> Optional[str]:
+    """'-1 months' style modifier for SQLite date functions, or None if the interval is not a plain literal."""
+    text = amount.name if isinstance(amount, exp.Literal) else None
+    unit_name = unit.name.upper() if unit is not None else ""
+    if text and " " in text.strip() and not unit_name:
+        # INTERVAL '3 days'
+        text, unit_name = text.strip().split(None, 1)
+        unit_name = unit_name.upper()
+    unit_name = unit_name.rstrip("S")
+    if unit_name not in SQLITE_UNITS or text is None:
+        return None
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    name, factor = SQLITE_UNITS[unit_name]
+    value = value * factor * sign
+    return f"{'+' if value >= 0 else '-'}{abs(value):g} {name}"
+
+def _sqlite_base(node):
+    """Function and leading arguments for SQLite date arithmetic on node."""
+    if isinstance(node, exp.CurrentDate):
+        return "DATE", [exp.Literal.string("now")]
+    if isinstance(node, exp.CurrentTimestamp) or (isinstance(node, exp.Anonymous) and node.name.upper() == "NOW"):
+        return "DATETIME", [exp.Literal.string("now")]
+    return "DATETIME", [node]
+
+def _normalize(node):
+    """Unwrap DATE_SUB(x, INTERVAL n unit) read by a non-MySQL parser into the amount and unit MySQL's yields."""
+    if isinstance(node, (exp.DateSub, exp.DateAdd)) and isinstance(node.expression, exp.Interval) \
+            and node.args.get("unit") is None:
+        interval = node.expression
+        return node.__class__(this=node.this, expression=interval.this, unit=interval.args.get("unit"))
+    return node
+
+def _to_postgres(node):
+    part = SQLITE_PARTS.get(type(node).__name__)
+    if part is not None:
+        value = node.this.this if isinstance(node.this, exp.TsOrDsToDate) else node.this
+        return exp.Extract(this=exp.var(type(node).__name__.upper()), expression=value)
+    return node
+
+def _to_sqlite(node):
+    if isinstance(node, exp.Anonymous) and node.name.upper() == "NOW":
+        return exp.Anonymous(this="DATETIME", expressions=[exp.Literal.string("now")])
+    if isinstance(node, (exp.DateSub, exp.DateAdd)):
+        interval, unit = node.expression, node.args.get("unit")
+        if isinstance(interval, exp.Interval):
+            interval, unit = interval.this, interval.args.get("unit")
+        modifier = _sqlite_modifier(interval, unit, -1 if isinstance(node, exp.DateSub) else 1)
+        if modifier is not None:
+            function, args = _sqlite_base(node.this)
+            return exp.Anonymous(this=function, expressions=[*args, exp.Literal.string(modifier)])
+    if isinstance(node, (exp.Sub, exp.Add)) and isinstance(node.expression, exp.Interval):
+        interval = node.expression
+        modifier = _sqlite_modifier(interval.this, interval.args.get("unit"), -1 if isinstance(node, exp.Sub) else 1)
+        if modifier is not None:
+            function, args = _sqlite_base(node.this)
+            return exp.Anonymous(this=function, expressions=[*args, exp.Literal.string(modifier)])
+    part = SQLITE_PARTS.get(type(node).__name__)
+    if part is not None:
+        value = node.this.this if isinstance(node.this, exp.TsOrDsToDate) else node.this
+        strftime = exp.Anonymous(this="STRFTIME", expressions=[exp.Literal.string(part), value])
+        return exp.Cast(this=strftime, to=exp.DataType.build("INTEGER"))
+    return node
+
+# Rewrites sqlglot's generators do not do for a target dialect
+TARGET_TRANSFORMS = {"sqlite": _to_sqlite, "postgres": _to_postgres}
+
+def _parse(sql: str, dialects: List[str]):
+    """Parse with each candidate dialect and keep the reading that leaves the fewest unknown functions.
+
+    A MySQL-only call such as DATE_SUB still parses as Postgres, but as an opaque function sqlglot
+    cannot translate; reading it as MySQL gives a node the target generator knows. Ties go to the
+    earlier candidate, so SQL already in the target dialect is read as such.
+    """
+    best = (None, None, None)
+    for read in dialects:
+        try:
+            statements = [statement for statement in sqlglot.parse(sql, read=read) if statement is not None]
+        except SqlglotError:
+            continue
+        if len(statements) != 1:
+            continue
+        unknown = sum(1 for _ in statements[0].find_all(exp.Anonymous))
+        if best[2] is None or unknown < best[2]:
+            best = (read, statements[0], unknown)
+        if unknown == 0:
+            break
+    return best[0], best[1]
+
+def transpile_sql(sql: str, dialect: Optional[str]) -> str:
+    """Rewrite generated SQL into the target dialect, deterministically and without an LLM call.
+
+    SQL that already fits the dialect is returned unchanged; SQL that cannot be parsed is returned as is
+    for validation to report.
+    """
+    if sqlglot is None or not dialect or not sql or not sql.strip():
+        return sql
+    candidates = [dialect, *(read for read in FALLBACK_READ_DIALECTS if read != dialect)]
+    read, tree = _parse(sql, candidates)
+    if tree is None:
+        return sql
+    try:
+        rewritten = tree.transform(_normalize)
+        transform = TARGET_TRANSFORMS.get(dialect)
+        if transform is not None:
+            rewritten = rewritten.transform(transform)
+        output = rewritten.sql(dialect=dialect)
+        # Keep the model's own formatting when the output reads back as the statement it already was
+        if read == dialect and sqlglot.parse_one(output, read=dialect) == tree:
+            return sql
+    except SqlglotError as e:
+        logger.debug(f"Could not transpile SQL to {dialect}: {e}")
+        return sql
+    logger.info(f"Transpiled generated SQL from {read} to {dialect}")
+    return output + (";" if sql.rstrip().endswith(";") else "")
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+import numpy as np
+from .cache import normalize_prompt
+from .schema_index import tokenize
+
+EXAMPLE_FORMAT_VERSION = 1
+
+def embed(text: str, dim: int) -> np.ndarray:
+    """Hashed bag-of-features embedding: words, word pairs and character trigrams, L2-normalized.
+
+    Deterministic across processes (crc32, not hash()), so persisted vectors stay comparable.
+    """
+    words = tokenize(text)
+    features = list(words)
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"#{word}#"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    if not features:
+        return np.zeros(dim, dtype=np.float32)
+    codes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint32,
+                        count=len(features))
+    # One hash bit picks the sign so collisions tend to cancel out
+    signs = np.where(codes & 0x80000000, 1.0, -1.0)
+    vector = np.bincount(codes % dim, weights=signs, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class ExampleStore:
+    """Validated prompt -> SQL pairs, retrieved by similarity as few-shot examples.
+
+    Vectors live in one contiguous float32 matrix, so a search is a single matrix-vector product
+    plus a partial sort. The store is saved atomically to an .npz file every save_every additions
+    and on close. Periodic saves run on a background thread, so add() never waits on the disk.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        examples_config = config.get("examples", {})
+        self.enabled = examples_config.get("enabled", True)
+        self.path = examples_config.get("path")
+        self.dim = examples_config.get("dim", 256)
+        self.top_k = examples_config.get("top_k", 3)
+        self.min_similarity = examples_config.get("min_similarity", 0.2)
+        self.max_examples = examples_config.get("max_examples", 10000)
+        self.save_every = examples_config.get("save_every", 20)
+        self._vectors = np.zeros((64, self.dim), dtype=np.float32)
+        self._prompts: List[str] = []
+        self._sqls: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self._saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="example-save")
+        self._saving: Optional[Future] = None
+        self._stats = {"searches": 0, "hits": 0, "added": 0, "updated": 0}
+        if self.enabled and self.path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                vectors = data["vectors"]
+            if meta.get("format_version") != EXAMPLE_FORMAT_VERSION or vectors.shape[1] != self.dim:
+                self.logger.info(f"Ignoring example store at {self.path} built with different settings")
+                return
+            self._vectors = np.zeros((max(64, len(vectors) * 2), self.dim), dtype=np.float32)
+            self._vectors[:len(vectors)] = vectors
+            self._prompts, self._sqls = list(meta["prompts"]), list(meta["sqls"])
+            self._positions = {normalize_prompt(prompt): i for i, prompt in enumerate(self._prompts)}
+            self.logger.info(f"Loaded {len(self)} few-shot examples from {self.path}")
+        except Exception as e:
+            self.logger.warning(f"Failed to load example store from {self.path}: {e}")
+
+    def _append(self, prompt: str, sql: str, vector: np.ndarray):
+        count = len(self._prompts)
+        if count == len(self._vectors):
+            grown = np.zeros((count * 2, self.dim), dtype=np.float32)
+            grown[:count] = self._vectors
+            self._vectors = grown
+        self._vectors[count] = vector
+        self._prompts.append(prompt)
+        self._sqls.append(sql)
+        self._positions[normalize_prompt(prompt)] = count
+
+    def add(self, prompt: str, sql: str) -> bool:
+        """Record SQL that passed validation for a prompt; a repeated prompt keeps its latest SQL."""
+        if not self.enabled or not prompt or not sql:
+            return False
+        key = normalize_prompt(prompt)
+        with self._lock:
+            position = self._positions.get(key)
+            if position is not None:
+                if self._sqls[position] == sql:
+                    return False
+                self._sqls[position] = sql
+                self._stats["updated"] += 1
+            elif len(self._prompts) >= self.max_examples:
+                return False
+            else:
+                self._append(prompt, sql, embed(prompt, self.dim))
+                self._stats["added"] += 1
+            self._unsaved += 1
+            due = self.path is not None and self._unsaved >= self.save_every
+        # One worker, so saves land in order; a save still queued will pick up this addition too
+        if due and (self._saving is None or self._saving.running() or self._saving.done()):
+            self._saving = self._saver.submit(self.save)
+        return True
+
+    def search(self, prompt: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most similar stored examples, best first, skipping those below min_similarity."""
+        k = self.top_k if k is None else k
+        if not self.enabled or k <= 0 or not self._prompts:
+            return []
+        query = embed(prompt, self.dim)
+        with self._lock:
+            count = len(self._prompts)
+            scores = self._vectors[:count] @ query
+            if count > k:
+                candidates = np.argpartition(scores, -k)[-k:]
+            else:
+                candidates = np.arange(count)
+            ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+            examples = [
+                {"prompt": self._prompts[i], "sql": self._sqls[i], "score": round(float(scores[i]), 4)}
+                for i in ranked if scores[i] >= self.min_similarity
+            ]
+        self._stats["searches"] += 1
+        if examples:
+            self._stats["hits"] += 1
+        return examples
+
+    def save(self):
+        """Atomically write the store so a crash never leaves a truncated file behind."""
+        if not self.path:
+            return
+        with self._lock:
+            count = len(self._prompts)
+            meta = {"format_version": EXAMPLE_FORMAT_VERSION, "prompts": self._prompts[:], "sqls": self._sqls[:]}
+            vectors = self._vectors[:count].copy()
+            self._unsaved = 0
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".examples-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                np.savez(handle, vectors=vectors, meta=np.array(json.dumps(meta)))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            self.logger.warning(f"Failed to save example store to {self.path}: {e}")
+
+    def flush(self):
+        """Block until a background save in progress has finished."""
+        saving = self._saving
+        if saving is not None:
+            saving.result()
+
+    def close(self):
+        self._saver.shutdown(wait=True)
+        if self._unsaved:
+            self.save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "examples": len(self),
+            "searches": self._stats["searches"],
+            "hits": self._stats["hits"],
+            "added": self._stats["added"],
+            "updated": self._stats["updated"]
+        }
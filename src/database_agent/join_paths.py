@@ -0,0 +1,113 @@
+import math
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from .schema_model import SchemaModel, Relationship
+
+# Every hop costs 1, plus a penalty growing as the relationship's confidence drops
+MIN_CONFIDENCE = 0.01
+
+def edge_weight(confidence: float) -> float:
+    try:
+        confidence = float(confidence)
+    except (TypeError, ValueError):
+        confidence = 1.0
+    return 1.0 - math.log(min(1.0, max(MIN_CONFIDENCE, confidence)))
+
+class JoinPathIndex:
+    """Cheapest join chain between every pair of tables up to max_depth hops apart.
+
+    Built once per schema load, so a lookup is a dict access instead of a graph search.
+    Passing the index of the previous snapshot only recomputes tables near changed joins.
+    """
+    def __init__(self, model: SchemaModel, max_depth: int = 3, previous: Optional["JoinPathIndex"] = None):
+        start = time.perf_counter()
+        self.max_depth = max_depth
+        self.best_edges: Dict[Tuple[str, str], Relationship] = {}
+        self.weights: Dict[Tuple[str, str], float] = {}
+        for rel in model.relationships:
+            if rel.from_table not in model.tables or rel.to_table not in model.tables or rel.from_table == rel.to_table:
+                continue
+            weight = edge_weight(rel.confidence)
+            for pair in ((rel.from_table, rel.to_table), (rel.to_table, rel.from_table)):
+                if weight < self.weights.get(pair, math.inf):
+                    self.weights[pair] = weight
+                    self.best_edges[pair] = rel
+        self.neighbours: Dict[str, List[Tuple[str, float]]] = {}
+        for (source, target), weight in self.weights.items():
+            self.neighbours.setdefault(source, []).append((target, weight))
+
+        self.paths: Dict[str, Dict[str, Tuple[float, Tuple[str, ...]]]] = {}
+        if previous is not None and previous.max_depth == max_depth:
+            stale = self._stale_sources(previous)
+            for source, paths in previous.paths.items():
+                if source in model.tables and source not in stale:
+                    self.paths[source] = paths
+            self.recomputed = len(stale & set(self.neighbours))
+        else:
+            stale = set(self.neighbours)
+            self.recomputed = len(stale)
+        for source in stale:
+            if source in self.neighbours and source not in self.paths:
+                self.paths[source] = self._shortest_from(source)
+        self.build_seconds = time.perf_counter() - start
+
+    def _stale_sources(self, previous: "JoinPathIndex") -> Set[str]:
+        """Tables within max_depth hops of a join that was added, removed or re-weighted."""
+        changed = set()
+        for pair in set(self.weights) | set(previous.weights):
+            if self.weights.get(pair) != previous.weights.get(pair):
+                changed.update(pair)
+        stale = set(changed)
+        for table in changed:
+            stale.update(previous.paths.get(table, ()))
+            if table in self.neighbours:
+                self.paths[table] = self._shortest_from(table)
+                stale.update(self.paths[table])
+        return stale
+
+    def _shortest_from(self, source: str) -> Dict[str, Tuple[float, Tuple[str, ...]]]:
+        # Hop-bounded relaxation: layer k holds the paths improved using exactly k hops
+        best = {source: (0.0, (source,))}
+        frontier = best
+        for _ in range(self.max_depth):
+            improved = {}
+            for node, (cost, path) in frontier.items():
+                for neighbour, weight in self.neighbours.get(node, ()):
+                    if neighbour in path:
+                        continue
+                    candidate = cost + weight
+                    if candidate < best.get(neighbour, (math.inf,))[0] and candidate < improved.get(neighbour, (math.inf,))[0]:
+                        improved[neighbour] = (candidate, path + (neighbour,))
+            if not improved:
+                break
+            best = {**best, **improved}
+            frontier = improved
+        del best[source]
+        return best
+
+    def path(self, source: str, target: str) -> Optional[Tuple[str, ...]]:
+        """Tables on the cheapest join chain from source to target (inclusive), or None."""
+        if source == target:
+            return (source,)
+        found = self.paths.get(source, {}).get(target)
+        return found[1] if found else None
+
+    def cost(self, source: str, target: str) -> Optional[float]:
+        found = self.paths.get(source, {}).get(target)
+        return found[0] if found else None
+
+    def relationships(self, source: str, target: str) -> Optional[List[Relationship]]:
+        """The relationship used for each hop of the cheapest join chain."""
+        tables = self.path(source, target)
+        if tables is None:
+            return None
+        return [self.best_edges[(a, b)] for a, b in zip(tables, tables[1:])]
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "sources": len(self.paths),
+            "pairs": sum(len(paths) for paths in self.paths.values()),
+            "max_depth": self.max_depth,
+            "recomputed_sources": self.recomputed,
+            "build_ms": round(self.build_seconds * 1000, 2)
+        }
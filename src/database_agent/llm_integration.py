@@ -1,6 +1,22 @@
+import asyncio
+import inspect
+import json
 import logging
-from typing import Dict, Any, List
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, AsyncIterator
 from llmwrapper import get_llm
+from .cache import SQLCache
+from .dialects import detect_dialect, transpile_sql
+from .prompt_builder import PromptBuilder
+from .example_store import ExampleStore
+
+# Method names llmwrapper providers use for their native async client
+ASYNC_CHAT_METHODS = ("achat", "chat_async", "async_chat")
+ASYNC_STREAM_METHODS = ("astream", "achat_stream", "stream_async")
+SYNC_STREAM_METHODS = ("stream", "chat_stream")
 
 class LLMIntegration:
     """Integration with your existing llmwrapper."""
@@ -8,7 +24,20 @@ class LLMIntegration:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        llm_config = config.get("llm", {})
+        self.timeout = llm_config.get("timeout", 30)
+        self.max_workers = llm_config.get("max_workers", 8)
+        self.dialect = detect_dialect(config)
+        self.prompt_builder = PromptBuilder(config, self.dialect)
+        self.example_store = ExampleStore(config)
         self.llm = self._initialize_llm()
+        self._async_chat = self._resolve_async_chat()
+        self._async_stream, self._sync_stream = self._resolve_stream()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="llm-dispatch"
+        )
+        self.cache = SQLCache(config)
     
     def _initialize_llm(self):
         """Initialize LLM using your existing llmwrapper."""
@@ -27,58 +56,249 @@ class LLMIntegration:
             self.logger.error(f"Failed to initialize LLM: {e}")
             raise
     
-    async def generate_sql(self, prompt: str) -> str:
-        """Generate SQL using LLM."""
+    def _resolve_async_chat(self) -> Optional[Callable]:
+        """Find the provider's native async chat method, if it has one."""
+        for name in ASYNC_CHAT_METHODS:
+            method = getattr(self.llm, name, None)
+            if method is not None and inspect.iscoroutinefunction(method):
+                self.logger.info(f"Using native async LLM client: {name}")
+                return method
+        self.logger.info(f"Using thread-pool LLM dispatch with {self.max_workers} workers")
+        return None
+    
+    def _resolve_stream(self):
+        """Find the provider's token streaming methods, if it has any."""
+        for name in ASYNC_STREAM_METHODS:
+            method = getattr(self.llm, name, None)
+            if method is not None and inspect.isasyncgenfunction(method):
+                return method, None
+        for name in SYNC_STREAM_METHODS:
+            method = getattr(self.llm, name, None)
+            if inspect.ismethod(method) or inspect.isfunction(method):
+                return None, method
+        return None, None
+    
+    async def _dispatch(self, messages: List[Dict[str, str]]) -> str:
+        """Send messages to the LLM without blocking the event loop."""
+        if self._async_chat is not None:
+            call = self._async_chat(messages)
+        elif hasattr(self.llm, 'chat') and callable(getattr(self.llm, 'chat')):
+            loop = asyncio.get_running_loop()
+            call = loop.run_in_executor(self._executor, self.llm.chat, messages)
+        else:
+            raise Exception("LLM chat method not available")
+        
+        try:
+            return await asyncio.wait_for(call, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            # A timed-out worker thread cannot be interrupted; it finishes in
+            # the background and its result is discarded.
+            raise TimeoutError(f"LLM request timed out after {self.timeout}s")
+    
+    async def generate_sql(self, prompt: str, schema_context: Optional[Dict[str, Any]] = None,
+                           memory: Optional[List[Dict[str, Any]]] = None, cache: bool = True,
+                           examples: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Generate SQL using LLM, with optional schema context and session memory in the prompt.
+        
+        cache=False neither reads nor writes the SQL cache, for one-off prompts such as repairs.
+        examples, when given, replace the example store search for the prompt.
+        """
         try:
-            system_prompt = self._get_sql_system_prompt()
+            # Schema context follows from the prompt and schema version; session memory does not
+            cacheable = cache and not memory
+            cached_sql = await self.cache.get_async(prompt) if cacheable else None
+            if cached_sql is not None:
+                self.logger.info("SQL served from cache")
+                return cached_sql
             
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ]
+            messages = self._build_messages(prompt, schema_context, memory, examples)
+            
+            start = time.perf_counter()
+            response = self.transpile(await self._dispatch(messages))
+            if cacheable:
+                self.cache.put(prompt, response, time.perf_counter() - start)
             
-            # Handle both sync and async LLM calls
-            if hasattr(self.llm, 'chat') and callable(getattr(self.llm, 'chat')):
-                response = self.llm.chat(messages)
-            else:
-                raise Exception("LLM chat method not available")
-                
             self.logger.info("SQL generated successfully")
             return response
         except Exception as e:
             self.logger.error(f"Error generating SQL with LLM: {e}")
             raise
     
-    def _get_sql_system_prompt(self) -> str:
-        """Get the system prompt for SQL generation."""
-        return """
-        You are a SQL expert. Your task is to generate SQL queries based on user requests.
+    async def stream_sql(self, prompt: str, schema_context: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Generate SQL, yielding text chunks as the LLM produces them."""
+        cached_sql = await self.cache.get_async(prompt)
+        if cached_sql is not None:
+            self.logger.info("SQL served from cache")
+            yield cached_sql
+            return
+        
+        messages = self._build_messages(prompt, schema_context)
+        if self._async_stream is not None:
+            chunks = self._stream_native(messages)
+        elif self._sync_stream is not None:
+            chunks = self._stream_from_thread(messages)
+        else:
+            # Provider cannot stream: deliver the whole completion as one chunk
+            chunks = self._stream_single(messages)
+        
+        start = time.perf_counter()
+        parts = []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        finally:
+            await chunks.aclose()
+        self.cache.put(prompt, self.transpile("".join(parts)), time.perf_counter() - start)
+        self.logger.info("SQL streamed successfully")
+    
+    async def _stream_native(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        iterator = self._async_stream(messages).__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"LLM stream stalled for more than {self.timeout}s")
+                yield chunk
+        finally:
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+    
+    async def _stream_from_thread(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Drive a blocking stream on the dispatch pool and relay its chunks."""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        finished = object()
+        
+        def relay(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                stop.set()  # event loop already closed
         
-        Guidelines:
-        1. Generate only SQL queries, no explanations in the response
-        2. Use standard SQL syntax
-        3. Assume common table names like users, orders, products, etc.
-        4. Use proper JOINs when multiple tables are needed
-        5. Include appropriate WHERE clauses for filtering
-        6. Use appropriate date functions for time-based queries
+        def produce():
+            try:
+                for chunk in self._sync_stream(messages):
+                    if stop.is_set():
+                        break
+                    relay(chunk)
+            except Exception as e:
+                relay(e)
+            finally:
+                relay(finished)
+        
+        loop.run_in_executor(self._executor, produce)
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"LLM stream stalled for more than {self.timeout}s")
+                if item is finished:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Lets the worker thread stop early when the client goes away
+            stop.set()
+    
+    async def _stream_single(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        yield await self._dispatch(messages)
+    
+    async def generate_sql_many(self, prompts: List[str],
+                                schema_contexts: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[str]:
+        """Answer several prompts with one LLM request and cache each answer.
         
-        Examples:
-        - "Show me all users" → "SELECT * FROM users;"
-        - "Get orders from last month" → "SELECT * FROM orders WHERE order_date >= DATE_SUB(NOW(), INTERVAL 1 MONTH);"
-        - "Users who made orders" → "SELECT u.* FROM users u JOIN orders o ON u.user_id = o.user_id;"
-        - "Count of orders per user" → "SELECT u.user_id, u.name, COUNT(o.order_id) as order_count FROM users u LEFT JOIN orders o ON u.user_id = o.user_id GROUP BY u.user_id, u.name;"
+        Each request is built by the PromptBuilder with its own schema context and examples, exactly
+        as generate_sql would build it, so a packed answer is as good as an individual one for its
+        cache key.
         """
+        contexts = schema_contexts or [None] * len(prompts)
+        requests = "\n\n".join(
+            f"### Request {i}\n{self._build_messages(prompt, context)[-1]['content']}"
+            for i, (prompt, context) in enumerate(zip(prompts, contexts), 1)
+        )
+        messages = [
+            {"role": "system", "content": self._get_sql_system_prompt()},
+            {"role": "user", "content": (
+                f"Answer each of the following {len(prompts)} requests independently, using only the "
+                f"schema and examples given with it.\n"
+                f"Respond with only a JSON array of {len(prompts)} SQL strings, in the same order.\n\n"
+                f"{requests}"
+            )}
+        ]
+        
+        start = time.perf_counter()
+        response = await self._dispatch(messages)
+        elapsed = time.perf_counter() - start
+        
+        answers = [self.transpile(sql) for sql in self._parse_sql_array(response)]
+        if len(answers) != len(prompts):
+            raise ValueError(f"Expected {len(prompts)} SQL answers, got {len(answers)}")
+        for prompt, sql in zip(prompts, answers):
+            self.cache.put(prompt, sql, elapsed / len(prompts))
+        self.logger.info(f"Generated {len(prompts)} SQL queries in one packed request")
+        return answers
+    
+    async def plan_steps(self, prompt: str, steps: Dict[str, str]) -> List[str]:
+        """Ask the LLM which of the available steps, in order, fulfil a request."""
+        available = "\n".join(f"- {name}: {description}" for name, description in steps.items())
+        messages = [
+            {"role": "system", "content": (
+                "You plan how a database agent fulfils a request. Available steps:\n"
+                f"{available}\n"
+                "Respond with only a JSON array of step names, in the order they should run."
+            )},
+            {"role": "user", "content": prompt}
+        ]
+        plan = self._parse_sql_array(await self._dispatch(messages))
+        self.logger.info(f"Planned {len(plan)} steps with the LLM")
+        return plan
+    
+    def _parse_sql_array(self, response: str) -> List[str]:
+        """Extract the JSON array of SQL strings from a packed response."""
+        text = re.sub(r"^```(?:json)?\s*|\s*```$", "", str(response).strip())
+        answers = json.loads(text)
+        if not isinstance(answers, list) or not all(isinstance(sql, str) for sql in answers):
+            raise ValueError("Packed response is not a JSON array of strings")
+        return answers
+    
+    def _build_messages(self, prompt: str, schema_context: Optional[Dict[str, Any]] = None,
+                        memory: Optional[List[Dict[str, Any]]] = None,
+                        examples: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, str]]:
+        return self.prompt_builder.build(
+            prompt,
+            schema_context=schema_context,
+            examples=self.example_store.search(prompt) if examples is None else examples,
+            memory=memory
+        )
+    
+    def _get_sql_system_prompt(self) -> str:
+        """Get the system prompt for SQL generation; built once, so it is byte-identical across requests."""
+        return self.prompt_builder.system_prompt
+    
+    def transpile(self, sql: str) -> str:
+        """Rewrite generated SQL into the target dialect (see dialects.transpile_sql)."""
+        return transpile_sql(sql, self.dialect)
     
     async def health_check(self) -> Dict[str, Any]:
         """Check LLM health."""
         try:
             # Simple test query
-            if hasattr(self.llm, 'chat') and callable(getattr(self.llm, 'chat')):
-                test_response = self.llm.chat([
-                    {"role": "user", "content": "Generate: SELECT 1;"}
-                ])
-                return {"status": "healthy", "test_response": test_response}
-            else:
-                return {"status": "unhealthy", "error": "LLM chat method not available"}
+            test_response = await self._dispatch([
+                {"role": "user", "content": "Generate: SELECT 1;"}
+            ])
+            return {"status": "healthy", "test_response": test_response}
         except Exception as e:
-            return {"status": "unhealthy", "error": str(e)} 
\ No newline at end of file
+            return {"status": "unhealthy", "error": str(e)}
+    
+    def close(self):
+        """Release the dispatch thread pool and cache store."""
+        self._executor.shutdown(wait=False)
+        self.cache.close()
+        self.example_store.close()
@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+# Write operations: (kind, user_id, key, data, updated_at). kind is "interaction", "query" or "pattern";
+# key is the sequence number for interactions and queries and the pattern name for patterns.
+MemoryOp = Tuple[str, str, Any, str, int]
+
+class MemoryBackend:
+    """Durable storage for AgentMemory. Writes arrive in batches from MemoryWriter's thread."""
+    def write_batch(self, ops: List[MemoryOp]):
+        raise NotImplementedError
+
+    def load_recent(self, user_id: str, max_interactions: int, max_queries: int,
+                    max_patterns: int) -> Dict[str, List[Any]]:
+        """The newest entries of one user, oldest first: {"interactions", "queries", "patterns"}."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class SQLiteMemoryBackend(MemoryBackend):
+    """Memory in a local SQLite file. Every table is keyed by (user_id, ...), so loading a user's
+    recent window is an index range scan however many rows other users have stored."""
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS memory_interactions ("
+                "user_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (user_id, seq)) WITHOUT ROWID"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS memory_queries ("
+                "user_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (user_id, seq)) WITHOUT ROWID"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS memory_patterns ("
+                "user_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at INTEGER NOT NULL, "
+                "PRIMARY KEY (user_id, key)) WITHOUT ROWID"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_memory_patterns_recent ON memory_patterns (user_id, updated_at)"
+            )
+            self._db.commit()
+
+    def write_batch(self, ops: List[MemoryOp]):
+        interactions, queries, patterns = [], [], []
+        for kind, user_id, key, data, updated_at in ops:
+            if kind == "interaction":
+                interactions.append((user_id, key, data))
+            elif kind == "query":
+                queries.append((user_id, key, data))
+            else:
+                patterns.append((user_id, key, data, updated_at))
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO memory_interactions (user_id, seq, data) VALUES (?, ?, ?)", interactions
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO memory_queries (user_id, seq, data) VALUES (?, ?, ?)", queries
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO memory_patterns (user_id, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                    patterns
+                )
+
+    def load_recent(self, user_id: str, max_interactions: int, max_queries: int,
+                    max_patterns: int) -> Dict[str, List[Any]]:
+        with self._lock:
+            interactions = self._db.execute(
+                "SELECT seq, data FROM memory_interactions WHERE user_id = ? ORDER BY seq DESC LIMIT ?",
+                (user_id, max_interactions)
+            ).fetchall()
+            queries = self._db.execute(
+                "SELECT seq, data FROM memory_queries WHERE user_id = ? ORDER BY seq DESC LIMIT ?",
+                (user_id, max_queries)
+            ).fetchall()
+            patterns = self._db.execute(
+                "SELECT key, value FROM memory_patterns WHERE user_id = ? ORDER BY updated_at DESC LIMIT ?",
+                (user_id, max_patterns)
+            ).fetchall()
+        return {
+            "interactions": [{**json.loads(data), "_seq": seq} for seq, data in reversed(interactions)],
+            "queries": [{**json.loads(data), "_seq": seq} for seq, data in reversed(queries)],
+            "patterns": [(key, json.loads(value)) for key, value in reversed(patterns)]
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+MEMORY_BACKENDS = {"sqlite": SQLiteMemoryBackend}
+
+def create_memory_backend(config: Dict[str, Any]) -> Optional[MemoryBackend]:
+    """Backend named by memory.backend, or None to keep memory in process only."""
+    memory_config = config.get("memory", {})
+    name = memory_config.get("backend")
+    if not name:
+        return None
+    if name not in MEMORY_BACKENDS:
+        raise ValueError(f"Unknown memory backend '{name}'; available: {', '.join(MEMORY_BACKENDS)}")
+    return MEMORY_BACKENDS[name](memory_config.get("path", "cache/memory.db"))
+
+class MemoryWriter:
+    """Write-behind queue in front of a MemoryBackend.
+
+    submit() only enqueues, so requests never wait on storage. A background thread drains the
+    queue in batches of up to batch_size, waiting at most flush_interval seconds to fill one, and
+    writes each batch in one transaction. Repeated writes of the same entry within a batch collapse
+    to the last one. If storage falls behind by max_pending operations, new ones are dropped.
+    Operations not yet written are available per user from pending(), so readers never need to
+    wait for a flush.
+    """
+    def __init__(self, backend: MemoryBackend, batch_size: int = 500, flush_interval: float = 0.5,
+                 max_pending: int = 100000):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._stop = object()
+        self._closed = False
+        self._stats = {"submitted": 0, "written": 0, "batches": 0, "dropped": 0, "failed": 0}
+        self._pending: Dict[str, Dict[Tuple[str, Any], MemoryOp]] = {}
+        self._pending_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, user_id: str, key: Any, payload: Any) -> bool:
+        if self._closed:
+            return False
+        op = (kind, user_id, key, json.dumps(payload, default=str), time.time_ns())
+        with self._pending_lock:
+            try:
+                self._queue.put_nowait(op)
+            except queue.Full:
+                self._stats["dropped"] += 1
+                return False
+            self._pending.setdefault(user_id, {})[(kind, key)] = op
+        self._stats["submitted"] += 1
+        return True
+
+    def pending(self, user_id: str) -> List[MemoryOp]:
+        """Latest not yet written operation of each of the user's entries, oldest first."""
+        with self._pending_lock:
+            return sorted(self._pending.get(user_id, {}).values(), key=lambda op: op[4])
+
+    def _run(self):
+        while True:
+            op = self._queue.get()
+            if op is self._stop:
+                self._queue.task_done()
+                return
+            batch = [op]
+            stopping = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    op = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if op is self._stop:
+                    stopping = True
+                    break
+                batch.append(op)
+            self._write(batch)
+            for _ in range(len(batch) + stopping):
+                self._queue.task_done()
+            if stopping:
+                return
+
+    def _write(self, batch: List[MemoryOp]):
+        latest = {}
+        for op in batch:
+            latest[(op[0], op[1], op[2])] = op
+        try:
+            self.backend.write_batch(list(latest.values()))
+            self._stats["written"] += len(latest)
+            self._stats["batches"] += 1
+        except Exception as e:
+            self._stats["failed"] += len(latest)
+            self.logger.error(f"Failed to persist {len(latest)} memory entries: {e}")
+        with self._pending_lock:
+            for (kind, user_id, key), op in latest.items():
+                entries = self._pending.get(user_id)
+                # A newer operation on the same entry is still queued; keep it
+                if entries is not None and entries.get((kind, key)) is op:
+                    del entries[(kind, key)]
+                    if not entries:
+                        del self._pending[user_id]
+
+    def flush(self):
+        """Block until everything submitted so far has been written."""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._stop)
+        self._thread.join()
+        self.backend.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "pending": self._queue.qsize()}
@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional, Tuple
+from .coalescing import SingleFlight
+from .schema_index import WORD_PATTERN, singularize
+from .step_graph import StepGraph
+
+PLAN_CACHE_FORMAT_VERSION = 1
+
+# What each step does, as told to the LLM when it plans a request
+STEP_DESCRIPTIONS = {
+    "analyze_schema": "find the tables and joins relevant to the request",
+    "retrieve_examples": "find earlier validated queries similar to the request",
+    "generate_sql": "write the SQL query for the request (needs analyze_schema and retrieve_examples)",
+    "execute_query": "run the generated SQL against the database",
+    "format_results": "summarize the query results for the user",
+    "explain_query": "explain in words what the generated SQL does"
+}
+
+# Steps whose results each step needs, which a plan must list earlier; steps not listed here
+# run after the step before them. Steps that need nothing from each other run concurrently.
+STEP_DEPENDENCIES = {
+    "analyze_schema": [],
+    "retrieve_examples": [],
+    "generate_sql": ["analyze_schema", "retrieve_examples"],
+    "execute_query": ["generate_sql"],
+    "format_results": ["execute_query"],
+    "explain_query": ["generate_sql"]
+}
+
+# Schema lookup and example retrieval do not depend on each other and run side by side
+CONTEXT_STEPS = ["analyze_schema", "retrieve_examples"]
+
+PLAN_TEMPLATES = {
+    "query": [*CONTEXT_STEPS, "generate_sql", "execute_query", "format_results"],
+    "explain": [*CONTEXT_STEPS, "generate_sql", "explain_query"],
+    "direct": [*CONTEXT_STEPS, "generate_sql", "execute_query"]
+}
+
+# Cue words and their weight for each template, normalized like terms() below
+TEMPLATE_CUES = {name: {singularize(cue): weight for cue, weight in cues.items()} for name, cues in {
+    "query": {
+        "show": 2, "get": 2, "list": 2, "find": 2, "display": 2, "fetch": 2, "count": 2, "top": 2,
+        "total": 2, "average": 2, "sum": 2, "how": 1, "many": 1, "much": 1, "what": 1, "which": 1,
+        "who": 1, "number": 1, "give": 1
+    },
+    "explain": {"explain": 4, "describe": 3, "why": 2, "understand": 2, "mean": 1, "does": 1},
+    "direct": {"run": 2, "execute": 2, "sql": 1, "query": 1}
+}.items()}
+
+# Words that carry the shape of a request rather than what it is about
+INTENT_TERMS = frozenset(
+    {cue for cues in TEMPLATE_CUES.values() for cue in cues} | {singularize(term) for term in (
+        "compare", "comparison", "versus", "vs", "between", "trend", "over", "growth", "change",
+        "forecast", "predict", "projection", "rank", "percent", "percentage", "ratio", "share",
+        "distribution", "breakdown", "per", "correlate", "correlation", "anomaly", "outlier",
+        "cohort", "retention", "funnel", "summarize", "summary", "first", "last", "latest",
+        "earliest", "min", "max", "minimum", "maximum", "median", "duplicates", "missing", "without"
+    )}
+)
+
+def terms(text: str) -> List[str]:
+    """Lowercased, singularized words of a request; unlike schema_index.tokenize, no stopwords are dropped."""
+    return [singularize(word.lower()) for word in WORD_PATTERN.findall(text or "")]
+
+def intent_signature(text: str) -> str:
+    """Key shared by requests of the same shape: their intent words, sorted.
+
+    "compare revenue between regions" and "compare signups between plans" share a signature.
+    A request without intent words is keyed by its first word.
+    """
+    words = terms(text)
+    intents = sorted({word for word in words if word in INTENT_TERMS})
+    return " ".join(intents or words[:1])
+
+def classify(text: str) -> Tuple[Optional[str], int, int]:
+    """Best template by summed cue weight: (template, score, runner-up score)."""
+    words = set(terms(text))
+    scores = sorted(
+        ((sum(weight for cue, weight in cues.items() if cue in words), name) for name, cues in TEMPLATE_CUES.items()),
+        reverse=True
+    )
+    (best, template), (runner_up, _) = scores[0], scores[1]
+    return (template if best else None), best, runner_up
+
+@dataclass
+class PlanDecision:
+    """The steps chosen for a request and where they came from: template, cache, llm or default."""
+    steps: List[str]
+    source: str
+    signature: str
+    template: Optional[str] = None
+    score: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class Planner:
+    """Chooses the steps for a request, calling the LLM only for request shapes it has not seen.
+
+    A request whose cue words clearly point at one template (score at least min_score and ahead
+    of every other template) gets that template without any LLM call. Otherwise the plan cache is
+    consulted by intent signature; on a miss the LLM plans the request, and a valid plan is cached
+    under its signature so later requests of the same shape reuse it. Concurrent misses for one
+    signature share a single LLM call. Without an LLM, or if it fails or returns an unusable plan,
+    the default template is used. New plans are written to cache_path on a background thread.
+    """
+    def __init__(self, config: Dict[str, Any], llm_integration: Any = None):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        planner_config = config.get("planner", {})
+        self.min_score = planner_config.get("min_score", 2)
+        self.llm_fallback = planner_config.get("llm_fallback", True)
+        self.default_template = planner_config.get("default_template", "direct")
+        self.max_cached_plans = planner_config.get("max_cached_plans", 1000)
+        self.cache_path = planner_config.get("cache_path")
+        self.llm_integration = llm_integration
+        self._plans: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._single_flight = SingleFlight()
+        self._saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plan-save")
+        self._saving: Optional[Future] = None
+        self._stats = {
+            "requests": 0, "template": 0, "cache": 0, "llm": 0, "default": 0, "llm_errors": 0, "invalid_plans": 0
+        }
+        if self.cache_path:
+            self._load()
+
+    async def plan(self, prompt: str) -> PlanDecision:
+        self._stats["requests"] += 1
+        signature = intent_signature(prompt)
+        template, score, runner_up = classify(prompt)
+        if template is not None and score >= self.min_score and score > runner_up:
+            self._stats["template"] += 1
+            return PlanDecision(list(PLAN_TEMPLATES[template]), "template", signature, template, score)
+
+        cached = self._cached(signature)
+        if cached is not None:
+            self._stats["cache"] += 1
+            return PlanDecision(cached, "cache", signature, score=score)
+
+        if self.llm_fallback and self.llm_integration is not None:
+            steps = await self._single_flight.do(signature, lambda: self._plan_with_llm(prompt, signature))
+            if steps is not None:
+                self._stats["llm"] += 1
+                return PlanDecision(list(steps), "llm", signature, score=score)
+
+        self._stats["default"] += 1
+        return PlanDecision(list(PLAN_TEMPLATES[self.default_template]), "default", signature,
+                            self.default_template, score)
+
+    async def _plan_with_llm(self, prompt: str, signature: str) -> Optional[List[str]]:
+        try:
+            steps = await self.llm_integration.plan_steps(prompt, STEP_DESCRIPTIONS)
+        except Exception as e:
+            self._stats["llm_errors"] += 1
+            self.logger.warning(f"LLM planning failed, using the default plan: {e}")
+            return None
+        if not self._valid(steps):
+            self._stats["invalid_plans"] += 1
+            self.logger.warning(f"Ignoring unusable LLM plan {steps}")
+            return None
+        self._plans[signature] = steps
+        while len(self._plans) > self.max_cached_plans:
+            self._plans.popitem(last=False)
+        # One worker, so saves land in order; a save still queued will pick up this plan too
+        if self.cache_path and (self._saving is None or self._saving.running() or self._saving.done()):
+            self._saving = self._saver.submit(self.save)
+        return steps
+
+    @staticmethod
+    def _valid(steps: Any) -> bool:
+        # Known steps, each once and after the steps it needs, and a query to run them on
+        if not (isinstance(steps, list) and all(step in STEP_DESCRIPTIONS for step in steps)
+                and "generate_sql" in steps):
+            return False
+        try:
+            StepGraph.from_names(steps, STEP_DEPENDENCIES)
+        except ValueError:
+            return False
+        return True
+
+    def _cached(self, signature: str) -> Optional[List[str]]:
+        steps = self._plans.get(signature)
+        if steps is None:
+            return None
+        self._plans.move_to_end(signature)
+        return list(steps)
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r") as handle:
+                data = json.load(handle)
+            if data.get("format_version") != PLAN_CACHE_FORMAT_VERSION:
+                return
+            for signature, steps in data.get("plans", {}).items():
+                if self._valid(steps):
+                    self._plans[signature] = steps
+            self.logger.info(f"Loaded {len(self._plans)} cached plans from {self.cache_path}")
+        except Exception as e:
+            self.logger.warning(f"Failed to load plan cache from {self.cache_path}: {e}")
+
+    def save(self):
+        """Atomically write the cached plans so a crash never leaves a truncated file behind."""
+        data = json.dumps({"format_version": PLAN_CACHE_FORMAT_VERSION, "plans": self._plans.copy()})
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".plans-")
+        try:
+            with os.fdopen(fd, "w") as handle:
+                handle.write(data)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            self.logger.warning(f"Failed to save plan cache to {self.cache_path}: {e}")
+
+    def flush(self):
+        """Block until a background save in progress has finished."""
+        saving = self._saving
+        if saving is not None:
+            saving.result()
+
+    def close(self):
+        self._saver.shutdown(wait=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self._stats["requests"]
+        coalescing = self._single_flight.get_stats()
+        return {
+            **self._stats,
+            "cached_plans": len(self._plans),
+            "llm_calls": coalescing["executions"],
+            "llm_call_ratio": round(coalescing["executions"] / requests, 4) if requests else 0.0,
+            "coalescing": coalescing
+        }
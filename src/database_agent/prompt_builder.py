@@ -0,0 +1,140 @@
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional
+from .dialects import sql_system_prompt
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken is optional
+    tiktoken = None
+
+# Fallback when tiktoken is not installed; matches schema_index.estimate_tokens
+CHARS_PER_TOKEN = 4
+# Per-message framing tokens added by chat APIs
+MESSAGE_OVERHEAD_TOKENS = 4
+
+class TokenCounter:
+    """Counts tokens locally: exact with tiktoken, otherwise ~4 characters per token."""
+    def __init__(self, model: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                self.logger.warning(f"tiktoken encoding unavailable, estimating tokens from length: {e}")
+        self.exact = self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+def format_table(table: Dict[str, Any]) -> str:
+    """One compact line per table: name(columns) plus key and size hints."""
+    line = f"{table['name']}({', '.join(table.get('columns', []))})"
+    hints = []
+    primary_key = table.get("primary_key")
+    if primary_key:
+        hints.append(f"pk {', '.join(primary_key) if isinstance(primary_key, list) else primary_key}")
+    if table.get("row_count"):
+        hints.append(f"~{table['row_count']} rows")
+    if table.get("comment"):
+        hints.append(str(table["comment"]))
+    return f"{line} -- {'; '.join(hints)}" if hints else line
+
+def format_relationship(rel: Dict[str, Any]) -> str:
+    return f"{rel['from_table']}.{rel.get('from_column') or '?'} = {rel['to_table']}.{rel.get('to_column') or '?'}"
+
+def format_example(example: Dict[str, Any]) -> str:
+    return f"Q: {example.get('prompt', '')}\nSQL: {example.get('sql', '')}"
+
+def format_memory(item: Dict[str, Any]) -> str:
+    text = item.get("prompt") or item.get("content") or item.get("description") or ""
+    sql = item.get("sql")
+    return f"- {text} -> {sql}" if sql else f"- {text}"
+
+class PromptBuilder:
+    """Assembles SQL generation messages within a token budget.
+
+    The system message is built once per dialect and never changes between requests, so providers
+    that cache prompt prefixes can reuse it. Everything request-specific goes into the user message,
+    filled in priority order -- schema context, few-shot examples, session memory -- until the budget
+    is spent. Items are included whole or not at all, and the request itself is always included.
+    """
+    def __init__(self, config: Dict[str, Any], dialect: Optional[str] = None):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        prompt_config = config.get("prompt", {})
+        self.max_tokens = prompt_config.get("max_tokens", 6000)
+        self.max_examples = prompt_config.get("max_examples", 3)
+        self.max_memory = prompt_config.get("max_memory", 5)
+        self.counter = TokenCounter(config.get("llm", {}).get("model"))
+        self.system_prompt = sql_system_prompt(dialect)
+        self.system_message = {"role": "system", "content": self.system_prompt}
+        self.prefix_tokens = self.counter.count(self.system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        self.prefix_hash = hashlib.sha256(self.system_prompt.encode("utf-8")).hexdigest()[:16]
+        self.last_stats: Dict[str, Any] = {}
+        self._stats = {"builds": 0, "tokens": 0, "dropped": 0, "over_budget": 0}
+
+    def build(self, request: str, schema_context: Optional[Dict[str, Any]] = None,
+              examples: Optional[List[Dict[str, Any]]] = None,
+              memory: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, str]]:
+        request_text = f"Request: {request}" if (schema_context or examples or memory) else request
+        used = self.prefix_tokens + MESSAGE_OVERHEAD_TOKENS + self.counter.count(request_text)
+        budget = self.max_tokens
+        stats = {"prefix_tokens": self.prefix_tokens, "sections": {}, "dropped": 0}
+
+        def fill(name: str, title: str, lines: List[str]) -> List[str]:
+            nonlocal used
+            kept = []
+            # The title and the blank line after the section cost tokens too
+            header = self.counter.count(title) + 1
+            for line in lines:
+                cost = self.counter.count(line) + (header if not kept else 0)
+                if used + cost > budget:
+                    stats["dropped"] += 1
+                    continue
+                kept.append(line)
+                used += cost
+            stats["sections"][name] = len(kept)
+            return [title, *kept, ""] if kept else []
+
+        parts: List[str] = []
+        if schema_context and schema_context.get("tables"):
+            parts.extend(fill("schema", "Schema:", [format_table(table) for table in schema_context["tables"]]))
+            joins = [format_relationship(rel) for rel in schema_context.get("relationships", [])]
+            if joins:
+                parts.extend(fill("joins", "Joins:", joins))
+        if examples:
+            parts.extend(fill("examples", "Examples:", [format_example(example) for example in examples[:self.max_examples]]))
+        if memory:
+            parts.extend(fill("memory", "Earlier in this session:", [format_memory(item) for item in memory[-self.max_memory:]]))
+        parts.append(request_text)
+
+        stats["tokens"] = used
+        self.last_stats = stats
+        self._stats["builds"] += 1
+        self._stats["tokens"] += used
+        self._stats["dropped"] += stats["dropped"]
+        if used > budget:
+            self._stats["over_budget"] += 1
+            self.logger.warning(f"Prompt of {used} tokens exceeds the {budget} token budget")
+        return [self.system_message.copy(), {"role": "user", "content": "\n".join(parts)}]
+
+    def get_stats(self) -> Dict[str, Any]:
+        builds = self._stats["builds"]
+        return {
+            "max_tokens": self.max_tokens,
+            "prefix_tokens": self.prefix_tokens,
+            "prefix_hash": self.prefix_hash,
+            "exact_token_counts": self.counter.exact,
+            "builds": builds,
+            "avg_tokens": round(self._stats["tokens"] / builds, 1) if builds else 0.0,
+            "dropped_items": self._stats["dropped"],
+            "over_budget": self._stats["over_budget"]
+        }
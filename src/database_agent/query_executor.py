@@ -0,0 +1,423 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, List, Optional, Sequence, Tuple
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - duckdb is optional
+    duckdb = None
+
+from .columnar import ColumnarResult, pa
+from .sql_utils import is_read_only
+
+class QueryExecutionError(Exception):
+    """A query could not be executed."""
+
+class QueryTimeoutError(QueryExecutionError):
+    """A query ran longer than the statement timeout and was interrupted."""
+
+class ReadOnlyViolationError(QueryExecutionError):
+    """A statement that could modify the database was sent to a read-only executor."""
+
+def parse_database_url(database_url: str) -> Tuple[str, str]:
+    """Split a SQLAlchemy-style URL into (dialect, path), e.g. sqlite:///data/app.db -> ("sqlite", "data/app.db")."""
+    if not database_url or "://" not in database_url:
+        raise QueryExecutionError(f"Unsupported database_url: {database_url!r}")
+    scheme, rest = database_url.split("://", 1)
+    dialect = scheme.split("+", 1)[0].lower()
+    path = rest[1:] if rest.startswith("/") else rest
+    return dialect, path or ":memory:"
+
+# Dialects QueryExecutor has a driver for; others can still be targeted for SQL generation
+EXECUTOR_DIALECTS = ("sqlite", "duckdb")
+
+# Statement prefix that asks each dialect for its plan without running the query
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN ", "duckdb": "EXPLAIN "}
+
+class LatencyStats:
+    """Running count/mean/max plus percentiles over the most recent samples."""
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        ordered = sorted(self.recent)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000 if ordered else 0.0
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(percentile(0.5), 3),
+            "p95_ms": round(percentile(0.95), 3),
+            "max_ms": round(self.max * 1000, 3)
+        }
+
+class PooledConnection:
+    """A driver connection plus the statements it has already prepared."""
+    def __init__(self, connection, statement_cache_size: int):
+        self.connection = connection
+        self.statement_cache_size = statement_cache_size
+        self.statements: "OrderedDict[str, None]" = OrderedDict()
+        # Driver call currently running for this connection, if any
+        self.pending: Optional[asyncio.Future] = None
+
+    def note_statement(self, sql: str) -> bool:
+        """Track sql in this connection's LRU of prepared statements; True if it was already prepared."""
+        if sql in self.statements:
+            self.statements.move_to_end(sql)
+            return True
+        self.statements[sql] = None
+        if len(self.statements) > self.statement_cache_size:
+            self.statements.popitem(last=False)
+        return False
+
+class QueryExecutor:
+    """Runs SQL against schema.database_url on a bounded pool of connections.
+
+    Driver calls block, so they run on a thread pool sized to the connection pool;
+    the event loop only waits for a free connection and for the result. Only sqlite and duckdb
+    have drivers: any other database_url is rejected here unless execution.enabled is false.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        execution_config = config.get("execution", {})
+        self.database_url = config.get("schema", {}).get("database_url")
+        self.enabled = execution_config.get("enabled", True)
+        self.pool_size = max(1, execution_config.get("pool_size", 4))
+        self.statement_timeout = execution_config.get("statement_timeout", 30)
+        self.read_only = execution_config.get("read_only", True)
+        self.statement_cache_size = execution_config.get("statement_cache_size", 128)
+        self.max_rows = execution_config.get("max_rows", 1000)
+        self.batch_size = execution_config.get("batch_size", 1000)
+        self._pool: Optional[asyncio.Queue] = None
+        self._connections: List[PooledConnection] = []
+        self._shared = None
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="query-exec")
+        self._memory_name = f"database_agent_{uuid.uuid4().hex}"
+        self.pool_wait = LatencyStats()
+        self.query_time = LatencyStats()
+        self._stats = {
+            "queries": 0, "errors": 0, "timeouts": 0, "rejected": 0, "rows_streamed": 0, "explains": 0,
+            "statement_cache_hits": 0, "statement_cache_misses": 0
+        }
+        if self.enabled and self.database_url:
+            dialect, _ = parse_database_url(self.database_url)
+            if dialect not in EXECUTOR_DIALECTS:
+                raise QueryExecutionError(
+                    f"No executor for dialect {dialect!r}; supported: {', '.join(EXECUTOR_DIALECTS)}. "
+                    f"Set execution.enabled: false to only generate SQL for this database"
+                )
+
+    def _connect(self) -> PooledConnection:
+        dialect, path = parse_database_url(self.database_url)
+        if dialect == "sqlite":
+            if path == ":memory:":
+                # Pooled connections must share one in-memory database
+                target = f"file:{self._memory_name}?mode=memory&cache=shared"
+            else:
+                target = f"file:{os.path.abspath(path)}" + ("?mode=ro" if self.read_only else "")
+            connection = sqlite3.connect(
+                target, uri=True, check_same_thread=False,
+                cached_statements=self.statement_cache_size, isolation_level=None
+            )
+            if self.read_only:
+                connection.execute("PRAGMA query_only = ON")
+        elif dialect == "duckdb":
+            if duckdb is None:
+                raise QueryExecutionError("duckdb is not installed; install it with: pip install duckdb")
+            if self._shared is None:
+                read_only = self.read_only and path != ":memory:"
+                self._shared = duckdb.connect(path, read_only=read_only)
+            # Cursors are independent connections to the same database
+            connection = self._shared.cursor()
+        else:
+            raise QueryExecutionError(f"No executor for dialect {dialect!r}; supported: {', '.join(EXECUTOR_DIALECTS)}")
+        pooled = PooledConnection(connection, self.statement_cache_size)
+        self._connections.append(pooled)
+        return pooled
+
+    async def _acquire(self) -> PooledConnection:
+        if not self.enabled:
+            raise QueryExecutionError("Query execution is disabled (execution.enabled: false)")
+        if self._pool is None:
+            self._pool = asyncio.Queue()
+            for _ in range(self.pool_size):
+                # Placeholders: connections are opened on first use
+                self._pool.put_nowait(None)
+        start = time.perf_counter()
+        pooled = await self._pool.get()
+        self.pool_wait.record(time.perf_counter() - start)
+        if pooled is None:
+            try:
+                loop = asyncio.get_running_loop()
+                pooled = await loop.run_in_executor(self._executor, self._connect)
+            except QueryExecutionError:
+                self._pool.put_nowait(None)
+                raise
+            except Exception as e:
+                self._pool.put_nowait(None)
+                raise QueryExecutionError(f"Failed to connect to database: {e}") from e
+            except BaseException:
+                self._pool.put_nowait(None)
+                raise
+        return pooled
+
+    def _release(self, pooled: PooledConnection):
+        pending = pooled.pending
+        if pending is not None and not pending.done():
+            # Interrupted but still unwinding on a worker thread: hand it back once the driver call returns
+            pending.add_done_callback(lambda done: self._release_after(pooled, done))
+            return
+        pooled.pending = None
+        if self._pool is not None:
+            self._pool.put_nowait(pooled)
+
+    def _release_after(self, pooled: PooledConnection, done: asyncio.Future):
+        if not done.cancelled():
+            # Retrieve the interruption error so it is not reported as unhandled
+            done.exception()
+        self._release(pooled)
+
+    async def _call(self, pooled: PooledConnection, func, *args):
+        """Run a blocking driver call on the worker pool, interrupting it after statement_timeout."""
+        loop = asyncio.get_running_loop()
+        future = pooled.pending = loop.run_in_executor(self._executor, func, *args)
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.statement_timeout)
+        except asyncio.CancelledError:
+            # The caller went away: stop the statement; the connection is released once it unwinds
+            pooled.connection.interrupt()
+            raise
+        if not done:
+            pooled.connection.interrupt()
+            self._stats["timeouts"] += 1
+            raise QueryTimeoutError(f"Query exceeded the {self.statement_timeout}s statement timeout")
+        return future.result()
+
+    def _check_statement(self, sql: str):
+        if not self.database_url:
+            raise QueryExecutionError("No database_url configured in the schema section")
+        if self.read_only and not is_read_only(sql):
+            self._stats["rejected"] += 1
+            raise ReadOnlyViolationError("Only single read-only statements may be executed")
+
+    def _note_statement(self, pooled: PooledConnection, sql: str):
+        # sqlite3 reuses the prepared statement from its per-connection cache of the same size
+        if pooled.note_statement(sql):
+            self._stats["statement_cache_hits"] += 1
+        else:
+            self._stats["statement_cache_misses"] += 1
+
+    def _run(self, pooled: PooledConnection, sql: str, params: Optional[Sequence[Any]], max_rows: int) -> Dict[str, Any]:
+        cursor = pooled.connection.execute(sql, params or ())
+        columns = [column[0] for column in cursor.description or ()]
+        rows = cursor.fetchmany(max_rows + 1) if columns else []
+        truncated = len(rows) > max_rows
+        return {
+            "columns": columns,
+            "rows": [dict(zip(columns, row)) for row in rows[:max_rows]],
+            "row_count": min(len(rows), max_rows),
+            "truncated": truncated
+        }
+
+    def _run_columnar(self, pooled: PooledConnection, sql: str, params: Optional[Sequence[Any]],
+                      max_rows: int) -> ColumnarResult:
+        cursor = pooled.connection.execute(sql, params or ())
+        columns = [column[0] for column in cursor.description or ()]
+        arrow_reader = getattr(cursor, "to_arrow_reader", None) or getattr(cursor, "fetch_record_batch", None)
+        if columns and pa is not None and arrow_reader is not None:
+            # duckdb hands over Arrow record batches without building Python rows
+            reader = arrow_reader(self.batch_size)
+            batches, count = [], 0
+            for batch in reader:
+                batches.append(batch)
+                count += batch.num_rows
+                if count > max_rows:
+                    break
+            table = pa.Table.from_batches(batches, schema=reader.schema).slice(0, max_rows)
+            return ColumnarResult.from_arrow(table, truncated=count > max_rows)
+        rows = cursor.fetchmany(max_rows + 1) if columns else []
+        return ColumnarResult.from_rows(columns, rows[:max_rows], truncated=len(rows) > max_rows)
+
+    async def _execute(self, run, sql: str, params: Optional[Sequence[Any]], max_rows: Optional[int]):
+        self._check_statement(sql)
+        pooled = await self._acquire()
+        self._note_statement(pooled, sql)
+        start = time.perf_counter()
+        try:
+            result = await self._call(pooled, run, pooled, sql, params, max_rows or self.max_rows)
+        except QueryExecutionError:
+            self._stats["errors"] += 1
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            raise QueryExecutionError(str(e)) from e
+        finally:
+            self._release(pooled)
+        elapsed = time.perf_counter() - start
+        self.query_time.record(elapsed)
+        self._stats["queries"] += 1
+        return result, elapsed
+
+    async def execute(self, sql: str, params: Optional[Sequence[Any]] = None,
+                      max_rows: Optional[int] = None) -> Dict[str, Any]:
+        """Execute one statement and return its columns and up to max_rows rows (as dicts)."""
+        result, elapsed = await self._execute(self._run, sql, params, max_rows)
+        result["elapsed_ms"] = round(elapsed * 1000, 3)
+        return result
+
+    async def execute_columnar(self, sql: str, params: Optional[Sequence[Any]] = None,
+                               max_rows: Optional[int] = None) -> ColumnarResult:
+        """Execute one statement and return up to max_rows rows as a ColumnarResult."""
+        result, _ = await self._execute(self._run_columnar, sql, params, max_rows)
+        return result
+
+    async def explain(self, sql: str) -> Tuple[str, List[tuple]]:
+        """Ask the database for the plan of a statement without running it. Returns (dialect, plan rows)."""
+        self._check_statement(sql)
+        dialect, _ = parse_database_url(self.database_url)
+        prefix = EXPLAIN_PREFIXES.get(dialect)
+        if prefix is None:
+            raise QueryExecutionError(f"EXPLAIN is not supported for {dialect}")
+        pooled = await self._acquire()
+        try:
+            rows = await self._call(pooled, self._fetch_plan, pooled, prefix + sql.strip().rstrip(";"))
+        except QueryExecutionError:
+            raise
+        except Exception as e:
+            raise QueryExecutionError(str(e)) from e
+        finally:
+            self._release(pooled)
+        self._stats["explains"] += 1
+        return dialect, rows
+
+    @staticmethod
+    def _fetch_plan(pooled: PooledConnection, sql: str) -> List[tuple]:
+        return pooled.connection.execute(sql).fetchall()
+
+    @staticmethod
+    def _open_cursor(pooled: PooledConnection, sql: str, params: Optional[Sequence[Any]]):
+        cursor = pooled.connection.execute(sql, params or ())
+        return cursor, [column[0] for column in cursor.description or ()]
+
+    @staticmethod
+    def _sample(cursor, size: int, batch_size: int) -> List[tuple]:
+        """Uniform sample of size rows from the rest of the cursor, holding at most size rows (algorithm R)."""
+        rng = random.Random()
+        reservoir: List[tuple] = []
+        seen = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return reservoir
+            for row in rows:
+                seen += 1
+                if len(reservoir) < size:
+                    reservoir.append(row)
+                else:
+                    slot = rng.randrange(seen)
+                    if slot < size:
+                        reservoir[slot] = row
+
+    async def stream(self, sql: str, params: Optional[Sequence[Any]] = None, batch_size: Optional[int] = None,
+                     max_rows: Optional[int] = None, sample: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield {"columns", "rows"} batches of at most batch_size row tuples straight from the cursor.
+
+        One batch is held at a time and the next is fetched only when the consumer asks for it, so
+        memory stays flat however large the result is. max_rows ends the stream early; sample instead
+        returns a uniform random sample of that many rows drawn from the whole result. A statement
+        returning columns always yields at least one (possibly empty) batch, so encoders see the columns.
+        """
+        self._check_statement(sql)
+        batch_size = batch_size or self.batch_size
+        pooled = await self._acquire()
+        self._note_statement(pooled, sql)
+        cursor = None
+        busy = 0.0
+        sent = False
+        try:
+            start = time.perf_counter()
+            cursor, columns = await self._call(pooled, self._open_cursor, pooled, sql, params)
+            busy += time.perf_counter() - start
+            if columns and sample:
+                start = time.perf_counter()
+                rows = await self._call(pooled, self._sample, cursor, sample, batch_size)
+                busy += time.perf_counter() - start
+                for offset in range(0, len(rows), batch_size):
+                    self._stats["rows_streamed"] += len(rows[offset:offset + batch_size])
+                    sent = True
+                    yield {"columns": columns, "rows": rows[offset:offset + batch_size]}
+            elif columns:
+                remaining = max_rows
+                while remaining is None or remaining > 0:
+                    size = batch_size if remaining is None else min(batch_size, remaining)
+                    start = time.perf_counter()
+                    rows = await self._call(pooled, cursor.fetchmany, size)
+                    busy += time.perf_counter() - start
+                    if not rows:
+                        break
+                    if remaining is not None:
+                        remaining -= len(rows)
+                    self._stats["rows_streamed"] += len(rows)
+                    sent = True
+                    yield {"columns": columns, "rows": rows}
+            if columns and not sent:
+                yield {"columns": columns, "rows": []}
+            self._stats["queries"] += 1
+            self.query_time.record(busy)
+        except QueryExecutionError:
+            self._stats["errors"] += 1
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            raise QueryExecutionError(str(e)) from e
+        finally:
+            # Finalize an abandoned sqlite statement; duckdb's execute() returns the connection itself
+            if cursor is not None and cursor is not pooled.connection and pooled.pending.done():
+                cursor.close()
+            self._release(pooled)
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits, misses = self._stats["statement_cache_hits"], self._stats["statement_cache_misses"]
+        idle = self._pool.qsize() if self._pool is not None else self.pool_size
+        return {
+            **self._stats,
+            "statement_cache_hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "enabled": self.enabled,
+            "pool_size": self.pool_size,
+            "connections_open": len(self._connections),
+            "in_use": self.pool_size - idle,
+            "pool_wait": self.pool_wait.snapshot(),
+            "query_time": self.query_time.snapshot()
+        }
+
+    async def close(self):
+        for pooled in self._connections:
+            try:
+                pooled.connection.close()
+            except Exception as e:
+                self.logger.warning(f"Failed to close database connection: {e}")
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+        self._connections.clear()
+        self._pool = None
+        self._executor.shutdown(wait=False)
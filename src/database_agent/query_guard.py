@@ -0,0 +1,265 @@
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+from .query_executor import QueryExecutionError
+from .sql_utils import add_limit, referenced_tables, strip_literals_and_comments, table_aliases, top_level_limit
+
+# Share of a table an index lookup is assumed to return when the plan has no statistics
+EQUALITY_SELECTIVITY = 0.01
+RANGE_SELECTIVITY = 0.25
+
+SQLITE_ACCESS_PATTERN = re.compile(r"^(SCAN|SEARCH)\s+(?:TABLE\s+)?([\w$]+)(?:\s+AS\s+([\w$]+))?(.*)$", re.IGNORECASE)
+DUCKDB_ROWS_PATTERN = re.compile(r"(?:~|EC:\s*)([\d,]+)(?:\s+rows)?", re.IGNORECASE)
+CTE_NAME_PATTERN = re.compile(r"(?:\bWITH(?:\s+RECURSIVE)?|,)\s*([\w$]+)\s+AS\s*\(", re.IGNORECASE)
+# Without these a LIMIT stops the scan early; with them every input row is read first
+BLOCKING_CLAUSE_PATTERN = re.compile(r"\b(?:ORDER\s+BY|GROUP\s+BY|DISTINCT|UNION|EXCEPT|INTERSECT)\b", re.IGNORECASE)
+# A plain aggregate returns one row however many it reads
+AGGREGATE_ONLY_PATTERN = re.compile(r"^\s*SELECT\s+(?:COUNT|SUM|AVG|MIN|MAX)\s*\([^()]*\)\s*(?:AS\s+[\w$]+\s*)?FROM\b", re.IGNORECASE)
+DUCKDB_CARTESIAN_PATTERN = re.compile(r"CROSS_PRODUCT|NESTED_LOOP_JOIN|BLOCKWISE_NL_JOIN")
+
+class QueryBlockedError(QueryExecutionError):
+    """The estimated cost of a statement is above the guard thresholds."""
+    def __init__(self, estimate: "QueryEstimate"):
+        super().__init__(f"Query blocked: {estimate.reason}")
+        self.estimate = estimate
+
+@dataclass
+class QueryEstimate:
+    """Estimated size and cost of a statement, and what the guard decided to do with it."""
+    sql: str
+    rows: Optional[int] = None  # Result rows
+    cost: Optional[int] = None  # Rows read
+    cartesian: bool = False
+    limit: Optional[int] = None
+    source: str = "none"  # explain, schema or none
+    scans: List[Dict[str, Any]] = field(default_factory=list)
+    action: str = "allow"  # allow, limit or block
+    reason: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "cost": self.cost,
+            "cartesian": self.cartesian,
+            "limit": self.limit,
+            "source": self.source,
+            "scans": self.scans,
+            "action": self.action,
+            "reason": self.reason,
+            "sql": self.sql
+        }
+
+def _index_columns(index: Any) -> List[str]:
+    if isinstance(index, str):
+        return [index]
+    if isinstance(index, dict):
+        columns = index.get("columns") or index.get("column") or []
+        return [columns] if isinstance(columns, str) else list(columns)
+    if isinstance(index, (list, tuple)):
+        return [column for column in index if isinstance(column, str)]
+    return []
+
+def _base_tables(sql: str):
+    """Tables a statement reads, without the names its CTEs define."""
+    ctes = {name.lower() for name in CTE_NAME_PATTERN.findall(strip_literals_and_comments(sql))}
+    return (referenced_tables(sql) | set(table_aliases(sql).values())) - ctes
+
+class QueryGuard:
+    """Estimates rows and cost of a statement from its plan and the schema's row counts before it runs.
+
+    Statements reading more than guard.max_cost rows, and cartesian joins without a LIMIT, are blocked.
+    Statements expected to return more than guard.max_result_rows rows get a LIMIT of guard.auto_limit.
+    """
+    def __init__(self, config: Dict[str, Any], query_executor, schema_manager=None):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        guard_config = config.get("guard", {})
+        self.enabled = guard_config.get("enabled", True)
+        self.max_result_rows = guard_config.get("max_result_rows", 100000)
+        self.auto_limit = guard_config.get("auto_limit", 1000)
+        self.max_cost = guard_config.get("max_cost", 50000000)
+        self.block_cartesian = guard_config.get("block_cartesian", True)
+        self.query_executor = query_executor
+        self.schema_manager = schema_manager
+        self._stats = {"checked": 0, "limited": 0, "blocked": 0, "unestimated": 0}
+
+    def _tables(self) -> Dict[str, Any]:
+        model = self.schema_manager.schema_model if self.schema_manager is not None else None
+        if model is None:
+            return {}
+        return {name.lower(): table for name, table in model.tables.items()}
+
+    async def estimate(self, sql: str) -> QueryEstimate:
+        """Estimate from the database's EXPLAIN output, falling back to schema row counts and indexes."""
+        estimate = None
+        if self.query_executor is not None and self.query_executor.database_url:
+            try:
+                dialect, plan = await self.query_executor.explain(sql)
+                if dialect == "sqlite":
+                    estimate = self._from_sqlite_plan(sql, plan)
+                elif dialect == "duckdb":
+                    estimate = self._from_duckdb_plan(sql, plan)
+            except QueryExecutionError as e:
+                self.logger.debug(f"EXPLAIN failed, estimating from the schema: {e}")
+        if estimate is None:
+            estimate = self._from_schema(sql)
+        estimate.limit = top_level_limit(sql)
+        if estimate.rows is None:
+            return estimate
+        text = strip_literals_and_comments(sql)
+        aggregate = AGGREGATE_ONLY_PATTERN.match(text) and not re.search(r"\bGROUP\s+BY\b", text, re.IGNORECASE)
+        if estimate.limit is not None and estimate.rows > estimate.limit:
+            if not aggregate and not BLOCKING_CLAUSE_PATTERN.search(text) and estimate.cost is not None:
+                # Rows are produced while scanning, so only a share of the input is read
+                estimate.cost = -(-estimate.cost * estimate.limit // estimate.rows)
+            estimate.rows = estimate.limit
+        if aggregate:
+            estimate.rows = 1
+        return estimate
+
+    async def check(self, sql: str) -> QueryEstimate:
+        """Estimate sql and decide: allow it, add a LIMIT (estimate.sql is the rewritten statement) or block it."""
+        if not self.enabled:
+            return QueryEstimate(sql=sql, reason="guard disabled")
+        estimate = await self.estimate(sql)
+        self._stats["checked"] += 1
+        if estimate.cost is None:
+            self._stats["unestimated"] += 1
+        if estimate.cost is not None and estimate.cost > self.max_cost:
+            estimate.action = "block"
+            estimate.reason = f"estimated {estimate.cost:,} rows read exceeds the limit of {self.max_cost:,}"
+        elif estimate.cartesian and self.block_cartesian and estimate.limit is None:
+            # Detectable from the plan alone, even without row counts
+            estimate.action = "block"
+            estimate.reason = "cartesian join without a LIMIT"
+        elif estimate.cost is None:
+            estimate.reason = "no estimate available"
+        elif estimate.rows is not None and estimate.rows > self.max_result_rows and estimate.limit is None:
+            estimate.action = "limit"
+            estimate.reason = f"estimated {estimate.rows:,} result rows exceeds {self.max_result_rows:,}"
+            estimate.sql = add_limit(sql, self.auto_limit)
+            estimate.limit = estimate.rows = self.auto_limit
+        if estimate.action == "block":
+            self._stats["blocked"] += 1
+            self.logger.warning(f"Query blocked: {estimate.reason}")
+        elif estimate.action == "limit":
+            self._stats["limited"] += 1
+            self.logger.info(f"LIMIT {self.auto_limit} added: {estimate.reason}")
+        return estimate
+
+    async def guard(self, sql: str) -> QueryEstimate:
+        """Like check(), but raise QueryBlockedError for blocked statements."""
+        estimate = await self.check(sql)
+        if estimate.action == "block":
+            raise QueryBlockedError(estimate)
+        return estimate
+
+    def _from_sqlite_plan(self, sql: str, plan: List[tuple]) -> QueryEstimate:
+        # Top-level accesses are nested loops in plan order; accesses inside subqueries run once each
+        tables = self._tables()
+        aliases = table_aliases(sql)
+        referenced = _base_tables(sql)
+        estimate = QueryEstimate(sql=sql, source="explain")
+        rows, cost, loops, unknown = 1, 0, 0, False
+        for row in plan:
+            parent, detail = row[1], str(row[-1])
+            match = SQLITE_ACCESS_PATTERN.match(detail)
+            if match is None:
+                continue
+            kind, name, alias, rest = match.groups()
+            table_name = name.lower() if alias else aliases.get(name.lower(), name.lower())
+            if table_name not in referenced:
+                # A CTE or subquery; the tables inside it appear as accesses of their own
+                continue
+            search = kind.upper() == "SEARCH"
+            if parent == 0:
+                if not search and loops:
+                    estimate.cartesian = True
+                loops += 1
+            table = tables.get(table_name)
+            if table is None:
+                unknown = True
+                continue
+            total = int(table.row_count or 0)
+            access, per_probe = "scan", total
+            if search:
+                access = "index"
+                ranged = re.search(r"[<>]", rest)
+                if "AUTOMATIC" in rest.upper():
+                    cost += total  # building the temporary index reads the table once
+                if "PRIMARY KEY" in rest.upper() and not ranged:
+                    per_probe = 1
+                else:
+                    per_probe = max(1, int(total * (RANGE_SELECTIVITY if ranged else EQUALITY_SELECTIVITY)))
+            estimate.scans.append({"table": table.name, "access": access, "rows": per_probe})
+            if parent == 0:
+                cost += rows * per_probe
+                rows *= per_probe
+            else:
+                cost += per_probe
+        if not unknown:
+            estimate.rows, estimate.cost = rows, cost
+        return estimate
+
+    def _from_duckdb_plan(self, sql: str, plan: List[tuple]) -> QueryEstimate:
+        # duckdb's optimizer annotates operators with their estimated cardinality
+        text = "\n".join(str(row[-1]) for row in plan)
+        counts = [int(count.replace(",", "")) for count in DUCKDB_ROWS_PATTERN.findall(text)]
+        estimate = QueryEstimate(sql=sql, source="explain", cartesian=bool(DUCKDB_CARTESIAN_PATTERN.search(text)))
+        if not counts:
+            return estimate
+        root = text.split("└", 1)[0]
+        estimate.rows, estimate.cost = counts[0], sum(counts)
+        if not DUCKDB_ROWS_PATTERN.search(root):
+            # A root without its own estimate (e.g. CROSS_PRODUCT) combines its inputs, printed side by side
+            first = next(line for line in text.splitlines() if DUCKDB_ROWS_PATTERN.search(line))
+            inputs = [int(count.replace(",", "")) for count in DUCKDB_ROWS_PATTERN.findall(first)]
+            estimate.rows = math.prod(inputs) if "CROSS_PRODUCT" in root else max(inputs)
+            estimate.cost += estimate.rows
+        return estimate
+
+    def _from_schema(self, sql: str) -> QueryEstimate:
+        """Without a plan: each table is scanned in full unless an equality filter hits its primary key or an index."""
+        tables = self._tables()
+        names = _base_tables(sql)
+        estimate = QueryEstimate(sql=sql, source="schema")
+        if not names or not tables or any(name not in tables for name in names):
+            return QueryEstimate(sql=sql)
+        text = strip_literals_and_comments(sql)
+        # CROSS JOIN, or several tables with nothing relating them
+        estimate.cartesian = bool(re.search(r"\bCROSS\s+JOIN\b", text, re.IGNORECASE)) or (
+            len(names) > 1 and not re.search(r"\b(?:ON|USING|WHERE)\b", text, re.IGNORECASE)
+        )
+        per_table = []
+        for name in sorted(names):
+            table = tables[name]
+            total = int(table.row_count or 0)
+            primary_key = table.primary_key if isinstance(table.primary_key, (list, tuple)) else [table.primary_key]
+            indexed = {column for index in table.indexes for column in _index_columns(index)[:1]}
+            filtered = [
+                column for column in set(primary_key) | indexed
+                if column and re.search(rf"\b{re.escape(column)}\s*=\s*(?:'|\d|\?|:)", text, re.IGNORECASE)
+            ]
+            if filtered:
+                rows = 1 if any(column in primary_key for column in filtered) else max(1, int(total * EQUALITY_SELECTIVITY))
+                estimate.scans.append({"table": table.name, "access": "index", "rows": rows})
+            else:
+                rows = total
+                estimate.scans.append({"table": table.name, "access": "scan", "rows": rows})
+            per_table.append(rows)
+        estimate.cost = sum(per_table)
+        if estimate.cartesian:
+            estimate.rows = math.prod(per_table)
+        else:
+            estimate.rows = max(per_table)
+        return estimate
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_result_rows": self.max_result_rows,
+            "max_cost": self.max_cost,
+            **self._stats
+        }
@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional, Set
+from .columnar import ColumnarResult
+from .sql_utils import canonicalize_sql, referenced_tables
+
+class ResultCache:
+    """Size-aware in-process cache of executed query results.
+
+    Entries are keyed on canonical SQL and belong to the schema version they were computed against.
+    Each entry expires after the shortest TTL of the tables it reads. Eviction is GreedyDual-Size:
+    the entry with the least execution time saved per byte goes first, so one large result cannot
+    push out many small, expensive ones.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        cache_config = config.get("result_cache", {})
+        self.enabled = cache_config.get("enabled", True)
+        self.max_bytes = cache_config.get("max_bytes", 64 * 1024 * 1024)
+        self.max_entry_bytes = cache_config.get("max_entry_bytes", self.max_bytes // 8)
+        self.default_ttl = cache_config.get("ttl", 300)
+        self.table_ttls = {name.lower(): ttl for name, ttl in cache_config.get("table_ttls", {}).items()}
+        self.schema_version = ""
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._bytes = 0
+        # GreedyDual-Size inflation: the priority of the last evicted entry
+        self._inflation = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "rejected": 0, "invalidated": 0, "time_saved": 0.0}
+
+    def make_key(self, sql: str, max_rows: Optional[int] = None) -> str:
+        payload = f"{canonicalize_sql(sql)}\x00{max_rows}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, tables: Set[str]) -> float:
+        """Shortest TTL among the tables a statement reads; a TTL of 0 disables caching for that table."""
+        return min((self.table_ttls.get(name, self.default_ttl) for name in tables), default=self.default_ttl)
+
+    def get(self, sql: str, max_rows: Optional[int] = None) -> Optional[ColumnarResult]:
+        if not self.enabled:
+            return None
+        key = self.make_key(sql, max_rows)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry["schema_version"] == self.schema_version and now < entry["expires_at"]:
+                    entry["priority"] = self._inflation + entry["cost"] / entry["nbytes"]
+                    self._stats["hits"] += 1
+                    self._stats["time_saved"] += entry["cost"]
+                    return entry["result"]
+                self._drop(key)
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, sql: str, result: ColumnarResult, cost: float = 0.0, max_rows: Optional[int] = None) -> bool:
+        """Cache a result that took cost seconds to compute. Returns False if it was not admitted."""
+        if not self.enabled:
+            return False
+        tables = referenced_tables(sql)
+        ttl = self.ttl_for(tables)
+        nbytes = max(result.nbytes, 1)
+        if ttl <= 0:
+            return False
+        if nbytes > self.max_entry_bytes:
+            self._stats["rejected"] += 1
+            self.logger.debug(f"Result of {nbytes} bytes exceeds the per-entry limit, not cached")
+            return False
+        key = self.make_key(sql, max_rows)
+        now = time.time()
+        # Cheap queries still carry a small cost so their priority grows with hits
+        cost = max(cost, 0.001)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._make_room(nbytes, now)
+            self._entries[key] = {
+                "result": result,
+                "tables": tables,
+                "nbytes": nbytes,
+                "cost": cost,
+                "priority": self._inflation + cost / nbytes,
+                "schema_version": self.schema_version,
+                "expires_at": now + ttl
+            }
+            self._bytes += nbytes
+        return True
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["nbytes"]
+
+    def _make_room(self, nbytes: int, now: float):
+        if self._bytes + nbytes <= self.max_bytes:
+            return
+        for key in [key for key, entry in self._entries.items() if entry["expires_at"] <= now]:
+            self._drop(key)
+        while self._entries and self._bytes + nbytes > self.max_bytes:
+            key = min(self._entries, key=lambda k: self._entries[k]["priority"])
+            self._inflation = self._entries[key]["priority"]
+            self._drop(key)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, schema_version: str):
+        """Switch to a new schema version, dropping results computed against any other."""
+        with self._lock:
+            self.schema_version = schema_version
+            stale = [key for key, entry in self._entries.items() if entry["schema_version"] != schema_version]
+            for key in stale:
+                self._drop(key)
+            self._stats["invalidated"] += len(stale)
+        if stale:
+            self.logger.info(f"Result cache invalidated {len(stale)} entries for schema version {schema_version}")
+
+    def apply_schema_diff(self, diff):
+        """Drop results reading tables whose structure, joins or row counts changed; keep the rest."""
+        if diff.previous_version != self.schema_version:
+            self.invalidate(diff.version)
+            return
+        changed = {name.lower() for name in diff.affected_tables | diff.stats_changed}
+        with self._lock:
+            self.schema_version = diff.version
+            removed = 0
+            for key in list(self._entries):
+                entry = self._entries[key]
+                if entry["schema_version"] != diff.previous_version or entry["tables"] & changed:
+                    self._drop(key)
+                    removed += 1
+                else:
+                    entry["schema_version"] = diff.version
+            self._stats["invalidated"] += removed
+        if removed:
+            self.logger.info(f"Result cache dropped {removed} entries reading {len(changed)} changed tables")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "enabled": self.enabled,
+            "schema_version": self.schema_version,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._stats["hits"],
+            "misses": self._stats["misses"],
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "evictions": self._stats["evictions"],
+            "rejected": self._stats["rejected"],
+            "invalidated": self._stats["invalidated"],
+            "time_saved_seconds": round(self._stats["time_saved"], 3)
+        }
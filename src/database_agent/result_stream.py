@@ -0,0 +1,100 @@
+import io
+import json
+import logging
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional
+from .columnar import ColumnarResult
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# End-of-stream marker of the Arrow IPC streaming format
+ARROW_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+async def ndjson_stream(batches: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode row batches as newline-delimited JSON objects, one chunk per batch.
+
+    An error after the first row has been sent is reported as a final {"error": ...} line.
+    """
+    try:
+        async for batch in batches:
+            columns = batch["columns"]
+            lines = [json.dumps(dict(zip(columns, row)), default=str) for row in batch["rows"]]
+            if lines:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+    except Exception as e:
+        logger.error(f"Result stream failed: {e}")
+        yield (json.dumps({"error": str(e)}) + "\n").encode("utf-8")
+
+def _column_array(values: List[Any], field_type=None):
+    if field_type is None:
+        return pa.array(values)
+    try:
+        # Infer, then cast safely: a lossy conversion (2.5 into an integer column) raises instead
+        array = pa.array(values)
+        return array if array.type == field_type else array.cast(field_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        if field_type != pa.string():
+            raise
+        return pa.array([None if value is None else str(value) for value in values], type=field_type)
+
+async def arrow_stream(batches: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode row batches as an Arrow IPC stream: schema message, one record batch per batch, EOS.
+
+    Column types are inferred from the first batch; columns that are entirely null there become strings.
+    Later batches are cast to those types. If a batch cannot be cast, or the source fails, the stream
+    ends with an empty record batch whose custom metadata holds {"error": ...}, then EOS; read it with
+    RecordBatchStreamReader.read_next_batch_with_custom_metadata.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required for Arrow output; install it with: pip install pyarrow")
+    sink = io.BytesIO()
+    writer = None
+    schema: Optional["pa.Schema"] = None
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    try:
+        async for batch in batches:
+            columns = batch["columns"]
+            values = [list(column) for column in zip(*batch["rows"])] or [[] for _ in columns]
+            if schema is None:
+                arrays = [_column_array(column) for column in values]
+                fields = [
+                    pa.field(name, pa.string() if pa.types.is_null(array.type) else array.type)
+                    for name, array in zip(columns, arrays)
+                ]
+                schema = pa.schema(fields)
+                arrays = [array.cast(field.type) for array, field in zip(arrays, fields)]
+                writer = pa.ipc.new_stream(sink, schema)
+            else:
+                arrays = [_column_array(column, field.type) for column, field in zip(values, schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield drain()
+    except Exception as e:
+        logger.error(f"Result stream failed: {e}")
+        if writer is None:
+            schema = pa.schema([])
+            writer = pa.ipc.new_stream(sink, schema)
+        empty = pa.RecordBatch.from_arrays([pa.array([], type=field.type) for field in schema], schema=schema)
+        writer.write_batch(empty, custom_metadata={"error": str(e)})
+    if writer is not None:
+        writer.close()
+        yield drain()
+
+def arrow_result_chunks(result: ColumnarResult, chunk_size: int = 65536) -> Iterator[bytes]:
+    """Encode a ColumnarResult as an Arrow IPC stream; numeric columns reach Arrow without a copy."""
+    table = result.to_arrow()
+    yield table.schema.serialize().to_pybytes()
+    for batch in table.to_batches(max_chunksize=chunk_size):
+        yield batch.serialize().to_pybytes()
+    yield ARROW_EOS
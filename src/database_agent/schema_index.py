@@ -0,0 +1,163 @@
+import heapq
+import json
+import math
+import re
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Set
+from .schema_model import SchemaModel, Table
+from .join_paths import JoinPathIndex
+
+WORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+STOPWORDS = {
+    "a", "all", "an", "and", "any", "are", "as", "by", "each", "every", "for", "from", "get", "give",
+    "have", "how", "in", "is", "it", "list", "many", "me", "much", "of", "on", "or", "show", "than",
+    "that", "the", "their", "them", "there", "to", "was", "were", "what", "which", "who", "with"
+}
+
+# Relative weight of a match depending on where the term appears
+TABLE_NAME_WEIGHT = 3.0
+COLUMN_NAME_WEIGHT = 1.0
+COMMENT_WEIGHT = 0.5
+# Tables scoring below this fraction of the best match are treated as noise
+MIN_RELATIVE_SCORE = 0.25
+# Terms found in more than this fraction of tables only re-rank candidates found by rarer terms
+COMMON_TERM_RATIO = 0.1
+
+def singularize(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "shes", "ches", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    """Split identifiers and free text into normalized terms (snake_case and camelCase aware)."""
+    if not text:
+        return []
+    terms = []
+    for word in WORD_PATTERN.findall(str(text)):
+        word = word.lower()
+        if word not in STOPWORDS:
+            terms.append(singularize(word))
+    return terms
+
+def estimate_tokens(table: Dict[str, Any]) -> int:
+    """Rough LLM token cost of including a table in the prompt (~4 characters per token)."""
+    return max(1, len(json.dumps(table, default=str)) // 4)
+
+class SchemaIndex:
+    """Inverted index over table names, column names and comments, built once per schema load."""
+    def __init__(self, tables: List[Dict[str, Any]], relationships: List[Dict[str, Any]],
+                 model: Optional[SchemaModel] = None, join_paths: Optional[JoinPathIndex] = None):
+        if model is None:
+            model = SchemaModel.from_dicts(tables, relationships)
+        self.model = model
+        self.join_paths = join_paths if join_paths is not None else JoinPathIndex(model)
+        self.tables = model.tables
+        # Schema position breaks score ties so results are deterministic
+        self.order = {name: -position for position, name in enumerate(self.tables)}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.token_costs = {name: estimate_tokens(table.to_dict()) for name, table in self.tables.items()}
+        for name, table in self.tables.items():
+            self._index_table(name, table)
+        # Fold IDF into the postings so scoring is a plain sum
+        for term, postings in self.postings.items():
+            idf = math.log(1 + len(self.tables) / len(postings))
+            for name in postings:
+                postings[name] *= idf
+
+    @classmethod
+    def from_model(cls, model: SchemaModel, join_paths: Optional[JoinPathIndex] = None) -> "SchemaIndex":
+        return cls([], [], model=model, join_paths=join_paths)
+
+    def _index_table(self, name: str, table: Table):
+        weights: Dict[str, float] = {}
+
+        def add(text: str, weight: float):
+            for term in tokenize(text):
+                weights[term] = max(weights.get(term, 0.0), weight)
+
+        add(table.comment, COMMENT_WEIGHT)
+        for comment in (table.column_comments or {}).values():
+            add(comment, COMMENT_WEIGHT)
+        for column in table.columns:
+            add(column, COLUMN_NAME_WEIGHT)
+        add(name, TABLE_NAME_WEIGHT)
+        for term, weight in weights.items():
+            self.postings[term][name] = weight
+
+    def score(self, prompt: str) -> Dict[str, float]:
+        terms = [term for term in set(tokenize(prompt)) if term in self.postings]
+        common_limit = max(1, int(len(self.tables) * COMMON_TERM_RATIO))
+        rare = [term for term in terms if len(self.postings[term]) <= common_limit]
+        common = [term for term in terms if len(self.postings[term]) > common_limit]
+        if not rare:
+            rare, common = common, []
+
+        scores: Dict[str, float] = {}
+        for term in rare:
+            for name, weight in self.postings[term].items():
+                scores[name] = scores.get(name, 0.0) + weight
+        for term in common:
+            postings = self.postings[term]
+            for name in scores:
+                weight = postings.get(name)
+                if weight:
+                    scores[name] += weight
+        return scores
+
+    def search(self, prompt: str, top_k: int = 10, token_budget: int = 4000, max_join_depth: int = 3) -> Dict[str, Any]:
+        """Select the most relevant tables plus the tables joining them, within a token budget."""
+        scores = self.score(prompt)
+        order = self.order
+        top = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], order[item[0]]))
+        threshold = top[0][1] * MIN_RELATIVE_SCORE if top else 0.0
+        ranked = [name for name, score in top if score >= threshold]
+        if not ranked:
+            # Nothing in the prompt matched: fall back to schema order
+            ranked = list(self.tables)[:top_k]
+
+        candidates: List[str] = list(ranked)
+        seen = set(ranked)
+        join_paths: List[List[str]] = []
+        for i, source in enumerate(ranked[:-1]):
+            for target in ranked[i + 1:]:
+                path = self.join_paths.path(source, target)
+                if path is None or len(path) - 1 > max_join_depth:
+                    continue
+                join_paths.append(list(path))
+                for name in path[1:-1]:
+                    if name not in seen:
+                        seen.add(name)
+                        candidates.append(name)
+
+        selected: List[str] = []
+        used = 0
+        for name in candidates:
+            cost = self.token_costs[name]
+            if selected and used + cost > token_budget:
+                continue
+            selected.append(name)
+            used += cost
+
+        chosen = set(selected)
+        relationships: List[Dict[str, Any]] = []
+        seen_rels: Set[int] = set()
+        for name in selected:
+            for rel in self.model.relationships_of(name):
+                if id(rel) not in seen_rels and rel.from_table in chosen and rel.to_table in chosen:
+                    seen_rels.add(id(rel))
+                    relationships.append(rel.to_dict())
+
+        return {
+            # Copies, so callers can never mutate the served snapshot
+            "tables": [self.tables[name].to_dict() for name in selected],
+            "relationships": relationships,
+            # Cheapest join chain between each pair of selected relevant tables
+            "join_paths": [path for path in join_paths if chosen.issuperset(path)],
+            "estimated_tokens": used,
+            "total_tables": len(self.tables)
+        }
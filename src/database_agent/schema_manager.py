@@ -1,24 +1,90 @@
 import logging
-from typing import Dict, Any, List, Optional
-from datetime import datetime
+import hashlib
+import inspect
+import json
+from typing import Dict, Any, List, Optional, Callable, Set
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 import asyncio
+from .schema_index import SchemaIndex
+from .schema_model import SchemaModel
+from .join_paths import JoinPathIndex
+from .schema_snapshot import read_snapshot, write_snapshot
+
+@dataclass
+class SchemaDiff:
+    """Changes between two schema snapshots, published to diff listeners after a refresh."""
+    version: str
+    previous_version: str
+    added: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+    changed: Set[str] = field(default_factory=set)
+    stats_changed: Set[str] = field(default_factory=set)
+    relationships_changed: Set[str] = field(default_factory=set)
+
+    @property
+    def affected_tables(self) -> Set[str]:
+        """Tables whose structure or join paths changed; generated SQL touching them may be stale."""
+        return self.added | self.removed | self.changed | self.relationships_changed
+
+    def is_empty(self) -> bool:
+        return not (self.affected_tables or self.stats_changed)
 
 class SchemaManager:
     """Manages database schema information and provides context for SQL generation."""
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.logger = logging.getLogger(__name__)
-        self.schema_cache = {}
+        self.schema_model: Optional[SchemaModel] = None
+        self.schema_metadata: Dict[str, Any] = {}
+        self._schema_view: Optional[Dict[str, Any]] = None
+        self._table_fingerprints: Dict[str, str] = {}
         self.last_refresh = None
         self.refresh_interval = config.get("schema", {}).get("refresh_interval", 3600)  # 1 hour default
         self.schema_enabled = config.get("schema", {}).get("enabled", False)
+        self.context_top_k = config.get("schema", {}).get("context_top_k", 10)
+        self.context_token_budget = config.get("schema", {}).get("context_token_budget", 4000)
+        self.max_join_depth = config.get("schema", {}).get("max_join_depth", 3)
+        self.retry_interval = config.get("schema", {}).get("retry_interval", 60)
+        self.snapshot_path = config.get("schema", {}).get("snapshot_path")
+        self.schema_index: Optional[SchemaIndex] = None
+        self.join_paths: Optional[JoinPathIndex] = None
+        self._next_retry: Optional[datetime] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._pending_refresh: Optional[asyncio.Task] = None
+        self._background_task: Optional[asyncio.Task] = None
         self.graph_builder = None
         self.schema_graph = None
+        self.schema_version = ""
+        self._reload_listeners: List[Callable[[str], None]] = []
+        self._diff_listeners: List[Callable[[SchemaDiff], None]] = []
         if self.schema_enabled:
             self._initialize_schema()
         else:
             self.logger.info("Schema integration disabled in config")
 
+    @property
+    def schema_cache(self) -> Dict[str, Any]:
+        """Plain-dict copy of the current snapshot, materialized on first access after each load."""
+        if self._schema_view is None:
+            if self.schema_model is None:
+                self._schema_view = {}
+            else:
+                self._schema_view = {
+                    "tables": self.schema_model.table_dicts(),
+                    "relationships": self.schema_model.relationship_dicts(),
+                    "metadata": self.schema_metadata
+                }
+        return self._schema_view
+
+    @schema_cache.setter
+    def schema_cache(self, cache: Dict[str, Any]):
+        tables = cache.get("tables", []) if cache else []
+        self.schema_model = SchemaModel.from_dicts(tables, cache.get("relationships", [])) if cache else None
+        self.schema_metadata = cache.get("metadata", {}) if cache else {}
+        self._table_fingerprints = {table["name"]: self._table_fingerprint(table) for table in tables if table.get("name")}
+        self._schema_view = cache
+
     def _initialize_schema(self):
         try:
             from schema_graph_builder import SchemaGraphBuilder
@@ -29,7 +95,8 @@ class SchemaManager:
                 return
             self.graph_builder = SchemaGraphBuilder(database_url)
             self.logger.info("Schema graph builder initialized successfully")
-            self._load_schema()
+            if not self._load_snapshot_from_disk():
+                self._load_schema()
         except ImportError as e:
             self.logger.error(f"Failed to import schema-graph-builder: {e}")
             self.logger.info("Please install with: pip install -e ../schema-graph-builder")
@@ -39,46 +106,246 @@ class SchemaManager:
             self.schema_enabled = False
 
     def _load_schema(self):
+        snapshot = self._build_snapshot()
+        if snapshot is not None:
+            self._install_snapshot(snapshot)
+
+    def _build_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Introspect the database into a new snapshot without touching the one being served."""
         try:
             if not self.graph_builder:
-                return
-            self.schema_graph = self.graph_builder.build_graph()
-            tables = self._extract_tables()
-            relationships = self._extract_relationships()
-            self.schema_cache = {
-                "tables": tables,
-                "relationships": relationships,
-                "metadata": {
-                    "loaded_at": datetime.now().isoformat(),
-                    "table_count": len(tables),
-                    "relationship_count": len(relationships)
-                }
-            }
-            self.last_refresh = datetime.now()
-            self.logger.info(f"Schema loaded: {len(tables)} tables, {len(relationships)} relationships")
+                return None
+            graph = self.schema_graph
+            if self.schema_model is not None and self._supports_incremental_refresh():
+                tables, relationships = self._introspect_changed_tables()
+            else:
+                graph = self.graph_builder.build_graph()
+                tables = self._extract_tables(graph)
+                relationships = self._extract_relationships(graph)
+            snapshot = self._prepare_snapshot(graph, tables, relationships)
+            if self.snapshot_path and not snapshot["diff"].is_empty():
+                self._save_snapshot_to_disk(snapshot)
+            return snapshot
         except Exception as e:
+            # Keep serving the previous snapshot and retry later
             self.logger.error(f"Failed to load schema: {e}")
-            self.schema_cache = {}
+            self._next_retry = datetime.now() + timedelta(seconds=self.retry_interval)
+            return None
+
+    def _load_snapshot_from_disk(self) -> bool:
+        """Serve the last snapshot saved to disk right away; it is revalidated in the background."""
+        if not self.snapshot_path:
+            return False
+        database_url = self.config.get("schema", {}).get("database_url")
+        payload = read_snapshot(self.snapshot_path, database_url)
+        if payload is None:
+            return False
+        snapshot = self._prepare_snapshot(None, payload.get("tables", []), payload.get("relationships", []))
+        self._install_snapshot(snapshot)
+        # Stale until checked against the database
+        self.last_refresh = None
+        self.logger.info(f"Schema snapshot {self.schema_version} loaded from {self.snapshot_path} (saved {payload.get('saved_at')})")
+        return True
 
-    def _extract_tables(self) -> List[Dict[str, Any]]:
+    def _save_snapshot_to_disk(self, snapshot: Dict[str, Any]):
+        model = snapshot["model"]
+        try:
+            write_snapshot(
+                self.snapshot_path,
+                self.config.get("schema", {}).get("database_url"),
+                snapshot["metadata"]["version"],
+                model.table_dicts(),
+                model.relationship_dicts()
+            )
+        except Exception as e:
+            # The snapshot only speeds up the next start; never fail a refresh over it
+            self.logger.warning(f"Failed to write schema snapshot to {self.snapshot_path}: {e}")
+
+    def _supports_incremental_refresh(self) -> bool:
+        """Whether the graph builder can fingerprint the catalog cheaply and introspect single tables."""
+        return all(
+            inspect.ismethod(getattr(self.graph_builder, name, None))
+            for name in ("get_table_fingerprints", "introspect_tables")
+        )
+
+    def _introspect_changed_tables(self):
+        """Re-introspect only the tables whose catalog fingerprint differs from the cached one."""
+        current = self.schema_model.tables
+        catalog = self.graph_builder.get_table_fingerprints()
+        stale = [
+            name for name, info in catalog.items()
+            if name not in current
+            or self._table_fingerprint(current[name].to_dict(), info) != self._table_fingerprints.get(name)
+        ]
+        removed = set(current) - set(catalog)
+        tables = [
+            # Row counts come from the catalog, so unchanged tables never need introspecting for them
+            {**table.to_dict(), "row_count": catalog[name].get("row_count", table.row_count)}
+            for name, table in current.items() if name in catalog and name not in stale
+        ]
+        relationships = [
+            rel.to_dict() for rel in self.schema_model.relationships
+            if rel.from_table not in removed and rel.to_table not in removed
+            and rel.from_table not in stale
+        ]
+        if stale:
+            graph = self.graph_builder.introspect_tables(stale)
+            tables.extend(self._extract_tables(graph))
+            # A refreshed table owns the relationships leaving it; keep any already known elsewhere
+            known = {self._relationship_key(rel) for rel in relationships}
+            relationships.extend(
+                rel for rel in self._extract_relationships(graph)
+                if self._relationship_key(rel) not in known
+            )
+        self.logger.info(f"Incremental schema refresh: {len(stale)} tables re-introspected, {len(removed)} removed")
+        return tables, relationships
+
+    def _prepare_snapshot(self, graph, tables: List[Dict[str, Any]], relationships: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Index a freshly loaded schema and diff it against the one being served."""
+        previous_model = self.schema_model
+        previous_fingerprints = self._table_fingerprints
+        fingerprints = {table["name"]: self._table_fingerprint(table) for table in tables if table.get("name")}
+        version = self._compute_version(fingerprints, relationships)
+        model = SchemaModel.from_dicts(tables, relationships)
+
+        diff = SchemaDiff(version=version, previous_version=self.schema_version)
+        diff.added = set(fingerprints) - set(previous_fingerprints)
+        diff.removed = set(previous_fingerprints) - set(fingerprints)
+        diff.changed = {
+            name for name, fingerprint in fingerprints.items()
+            if name in previous_fingerprints and previous_fingerprints[name] != fingerprint
+        }
+        if previous_model is not None:
+            diff.stats_changed = {
+                name for name, table in previous_model.tables.items()
+                if name in model.tables and name not in diff.changed
+                and table.row_count != model.tables[name].row_count
+            }
+        old_keys = {rel.key for rel in previous_model.relationships} if previous_model is not None else set()
+        new_keys = {rel.key for rel in model.relationships}
+        for key in old_keys ^ new_keys:
+            diff.relationships_changed.update(name for name in (key[0], key[2]) if name)
+
+        # Relationship changes only recompute join paths near the affected tables
+        join_paths = JoinPathIndex(model, self.max_join_depth, previous=self.join_paths)
+        return {
+            "graph": graph,
+            "model": model,
+            "join_paths": join_paths,
+            "fingerprints": fingerprints,
+            "metadata": {
+                "loaded_at": datetime.now().isoformat(),
+                "table_count": len(model.tables),
+                "relationship_count": len(model.relationships),
+                "version": version
+            },
+            "index": SchemaIndex.from_model(model, join_paths),
+            "diff": diff
+        }
+
+    def _install_snapshot(self, snapshot: Dict[str, Any]):
+        """Swap in a prepared snapshot and notify listeners. Must run on the thread serving requests."""
+        self.schema_graph = snapshot["graph"]
+        self.schema_model = snapshot["model"]
+        self.schema_metadata = snapshot["metadata"]
+        self.schema_index = snapshot["index"]
+        self.join_paths = snapshot["join_paths"]
+        self._table_fingerprints = snapshot["fingerprints"]
+        self._schema_view = None
+        self.last_refresh = datetime.now()
+        self._next_retry = None
+        metadata = self.schema_metadata
+        self.logger.info(f"Schema loaded: {metadata['table_count']} tables, {metadata['relationship_count']} relationships")
+        diff = snapshot["diff"]
+        if diff.version != self.schema_version:
+            self.schema_version = diff.version
+            self._notify_reload_listeners()
+        if not diff.is_empty():
+            self.logger.info(
+                f"Schema diff: {len(diff.added)} added, {len(diff.removed)} removed, "
+                f"{len(diff.changed)} changed, {len(diff.stats_changed)} with new row counts"
+            )
+            self._notify_diff_listeners(diff)
+
+    @staticmethod
+    def _table_fingerprint(table: Dict[str, Any], catalog_info: Optional[Dict[str, Any]] = None) -> str:
+        """Structural fingerprint of a table: columns, primary key and indexes (not row counts)."""
+        source = catalog_info if catalog_info is not None else table
+        columns = source.get("columns", [])
+        payload = json.dumps({
+            "columns": sorted(columns.keys() if isinstance(columns, dict) else columns),
+            "primary_key": source.get("primary_key", table.get("primary_key")),
+            "indexes": source.get("indexes", [])
+        }, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _relationship_key(rel: Dict[str, Any]):
+        return (rel.get("from_table"), rel.get("from_column"), rel.get("to_table"), rel.get("to_column"))
+
+    def _build_index(self):
+        model = self.schema_model if self.schema_model is not None else SchemaModel([], [])
+        self.join_paths = JoinPathIndex(model, self.max_join_depth)
+        self.schema_index = SchemaIndex.from_model(model, self.join_paths)
+
+    def _compute_version(self, fingerprints: Dict[str, str], relationships: List[Dict[str, Any]]) -> str:
+        payload = json.dumps({
+            "tables": fingerprints,
+            "relationships": sorted(self._relationship_key(rel) for rel in relationships)
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def add_reload_listener(self, listener: Callable[[str], None]):
+        """Register a callback invoked with the new version whenever the schema changes."""
+        self._reload_listeners.append(listener)
+
+    def _notify_reload_listeners(self):
+        for listener in self._reload_listeners:
+            try:
+                listener(self.schema_version)
+            except Exception as e:
+                self.logger.error(f"Schema reload listener failed: {e}")
+
+    def add_diff_listener(self, listener: Callable[[SchemaDiff], None]):
+        """Register a callback invoked with a SchemaDiff whenever a refresh changes anything."""
+        self._diff_listeners.append(listener)
+
+    def _notify_diff_listeners(self, diff: SchemaDiff):
+        for listener in self._diff_listeners:
+            try:
+                listener(diff)
+            except Exception as e:
+                self.logger.error(f"Schema diff listener failed: {e}")
+
+    def _extract_tables(self, graph=None) -> List[Dict[str, Any]]:
         tables = []
         try:
-            for table_name, table_info in self.schema_graph.get_tables().items():
-                tables.append({
+            for table_name, table_info in (graph or self.schema_graph).get_tables().items():
+                columns = table_info.get("columns", {})
+                table = {
                     "name": table_name,
-                    "columns": list(table_info.get("columns", {}).keys()),
+                    "columns": list(columns.keys()),
                     "primary_key": table_info.get("primary_key"),
                     "indexes": table_info.get("indexes", []),
                     "row_count": table_info.get("row_count", 0)
-                })
+                }
+                if table_info.get("comment"):
+                    table["comment"] = table_info["comment"]
+                column_comments = {
+                    name: info["comment"] for name, info in columns.items()
+                    if isinstance(info, dict) and info.get("comment")
+                }
+                if column_comments:
+                    table["column_comments"] = column_comments
+                tables.append(table)
         except Exception as e:
             self.logger.error(f"Failed to extract tables: {e}")
         return tables
 
-    def _extract_relationships(self) -> List[Dict[str, Any]]:
+    def _extract_relationships(self, graph=None) -> List[Dict[str, Any]]:
         relationships = []
         try:
-            for rel in self.schema_graph.get_relationships():
+            for rel in (graph or self.schema_graph).get_relationships():
                 relationships.append({
                     "from_table": rel.get("from_table"),
                     "to_table": rel.get("to_table"),
@@ -95,31 +362,92 @@ class SchemaManager:
         if not self.schema_enabled:
             return {}
         if self._should_refresh_schema():
-            await self._refresh_schema_async()
-        # For now, just return all tables and relationships
-        return {
-            "tables": self.schema_cache.get("tables", []),
-            "relationships": self.schema_cache.get("relationships", [])
-        }
+            if self.schema_model is not None:
+                # Stale-while-revalidate: serve the current snapshot, refresh in the background
+                self._schedule_refresh()
+            else:
+                await self._refresh_schema_async()
+        if self.schema_index is None or self.schema_index.model is not self.schema_model:
+            self._build_index()
+        return self.schema_index.search(
+            prompt,
+            top_k=self.context_top_k,
+            token_budget=self.context_token_budget,
+            max_join_depth=self.max_join_depth
+        )
+
+    def get_join_path(self, from_table: str, to_table: str) -> Optional[List[Dict[str, Any]]]:
+        """Relationships along the cheapest join chain between two tables, or None if not joinable.
+
+        Precomputed at schema load, so this never searches the relationship graph.
+        """
+        if self.schema_index is None or self.schema_index.model is not self.schema_model:
+            self._build_index()
+        relationships = self.join_paths.relationships(from_table, to_table)
+        return [rel.to_dict() for rel in relationships] if relationships is not None else None
 
     def _should_refresh_schema(self) -> bool:
+        if self._next_retry and datetime.now() < self._next_retry:
+            return False
         if not self.last_refresh:
             return True
         time_since_refresh = datetime.now() - self.last_refresh
         return time_since_refresh.total_seconds() > self.refresh_interval
 
-    async def _refresh_schema_async(self):
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, self._load_schema)
+    def _schedule_refresh(self):
+        if self._pending_refresh is None or self._pending_refresh.done():
+            self._pending_refresh = asyncio.ensure_future(self._refresh_schema_async())
+
+    async def _refresh_schema_async(self, force: bool = False):
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            # Another caller may have finished a refresh while this one waited
+            if not force and not self._should_refresh_schema():
+                return
+            loop = asyncio.get_running_loop()
+            snapshot = await loop.run_in_executor(None, self._build_snapshot)
+            if snapshot is not None:
+                self._install_snapshot(snapshot)
+
+    async def _background_refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self._refresh_schema_async(force=True)
+            except Exception as e:
+                self.logger.error(f"Background schema refresh failed: {e}")
+
+    async def start_background_refresh(self):
+        """Refresh the schema every refresh_interval seconds off the request path."""
+        if not self.schema_enabled or not self.graph_builder:
+            return
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.ensure_future(self._background_refresh_loop())
+            self.logger.info(f"Background schema refresh started (every {self.refresh_interval}s)")
+        if self.schema_model is not None and self._should_refresh_schema():
+            # Revalidate a snapshot loaded from disk without waiting a full interval
+            self._schedule_refresh()
+
+    async def stop_background_refresh(self):
+        for task in (self._background_task, self._pending_refresh):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._background_task = self._pending_refresh = None
 
     def get_schema_summary(self) -> Dict[str, Any]:
         if not self.schema_enabled:
             return {"enabled": False, "message": "Schema integration disabled"}
         return {
             "enabled": True,
-            "tables": len(self.schema_cache.get("tables", [])),
-            "relationships": len(self.schema_cache.get("relationships", [])),
+            "tables": len(self.schema_model.tables) if self.schema_model is not None else 0,
+            "relationships": len(self.schema_model.relationships) if self.schema_model is not None else 0,
             "last_refresh": self.last_refresh.isoformat() if self.last_refresh else None,
+            "version": self.schema_version,
             "cache_valid": not self._should_refresh_schema()
         }
 
@@ -0,0 +1,158 @@
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Any, FrozenSet, List, Optional, Tuple, Iterable
+
+def _intern(name: Any) -> Optional[str]:
+    return sys.intern(str(name)) if name is not None else None
+
+@dataclass
+class Table:
+    """One table of the schema. Names are interned, so common column names are stored once.
+
+    column_set indexes the columns by hash, built once, so membership tests do not scan the tuple.
+    """
+    __slots__ = ("name", "columns", "primary_key", "indexes", "row_count", "comment", "column_comments", "column_set")
+    name: str
+    columns: Tuple[str, ...]
+    primary_key: Any
+    indexes: Tuple[Any, ...]
+    row_count: int
+    comment: Optional[str]
+    column_comments: Optional[Dict[str, str]]
+
+    def __post_init__(self):
+        # A slot but not a field: derived from columns, so it stays out of __init__, repr and ==
+        self.column_set: FrozenSet[str] = frozenset(self.columns)
+
+    @classmethod
+    def from_dict(cls, table: Dict[str, Any]) -> "Table":
+        primary_key = table.get("primary_key")
+        if isinstance(primary_key, list):
+            primary_key = tuple(_intern(column) for column in primary_key)
+        elif isinstance(primary_key, str):
+            primary_key = _intern(primary_key)
+        column_comments = table.get("column_comments") or None
+        if column_comments:
+            column_comments = {_intern(name): comment for name, comment in column_comments.items()}
+        return cls(
+            name=_intern(table["name"]),
+            columns=tuple(_intern(column) for column in table.get("columns", [])),
+            primary_key=primary_key,
+            indexes=tuple(table.get("indexes") or ()),
+            row_count=table.get("row_count", 0),
+            comment=table.get("comment") or None,
+            column_comments=column_comments
+        )
+
+    def has_column(self, name: str) -> bool:
+        return name in self.column_set
+
+    def to_dict(self) -> Dict[str, Any]:
+        """A fresh plain-dict copy in the shape produced by schema extraction."""
+        table = {
+            "name": self.name,
+            "columns": list(self.columns),
+            "primary_key": list(self.primary_key) if isinstance(self.primary_key, tuple) else self.primary_key,
+            "indexes": list(self.indexes),
+            "row_count": self.row_count
+        }
+        if self.comment:
+            table["comment"] = self.comment
+        if self.column_comments:
+            table["column_comments"] = dict(self.column_comments)
+        return table
+
+@dataclass
+class Relationship:
+    """A (possibly inferred) join between two table columns."""
+    __slots__ = ("from_table", "from_column", "to_table", "to_column", "type", "confidence")
+    from_table: str
+    from_column: Optional[str]
+    to_table: str
+    to_column: Optional[str]
+    type: str
+    confidence: float
+
+    @classmethod
+    def from_dict(cls, rel: Dict[str, Any]) -> "Relationship":
+        return cls(
+            from_table=_intern(rel.get("from_table")),
+            from_column=_intern(rel.get("from_column")),
+            to_table=_intern(rel.get("to_table")),
+            to_column=_intern(rel.get("to_column")),
+            type=_intern(rel.get("type", "foreign_key")),
+            confidence=rel.get("confidence", 1.0)
+        )
+
+    @property
+    def key(self) -> Tuple[Optional[str], ...]:
+        return (self.from_table, self.from_column, self.to_table, self.to_column)
+
+    def other(self, table: str) -> str:
+        """The table at the opposite end of the relationship from table."""
+        return self.to_table if table == self.from_table else self.from_table
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "from_table": self.from_table,
+            "to_table": self.to_table,
+            "from_column": self.from_column,
+            "to_column": self.to_column,
+            "type": self.type,
+            "confidence": self.confidence
+        }
+
+class SchemaModel:
+    """Immutable, compact view of a schema snapshot with hash indexes for name lookups."""
+    __slots__ = ("tables", "relationships", "adjacency", "columns_by_name")
+
+    def __init__(self, tables: Iterable[Table], relationships: Iterable[Relationship]):
+        self.tables: Dict[str, Table] = {table.name: table for table in tables if table.name}
+        self.relationships: Tuple[Relationship, ...] = tuple(relationships)
+        adjacency = defaultdict(list)
+        for rel in self.relationships:
+            if rel.from_table in self.tables and rel.to_table in self.tables:
+                adjacency[rel.from_table].append(rel)
+                if rel.to_table != rel.from_table:
+                    adjacency[rel.to_table].append(rel)
+        self.adjacency: Dict[str, Tuple[Relationship, ...]] = {name: tuple(rels) for name, rels in adjacency.items()}
+        columns_by_name = defaultdict(list)
+        for table in self.tables.values():
+            for column in table.columns:
+                columns_by_name[column].append(table.name)
+        self.columns_by_name: Dict[str, Tuple[str, ...]] = {
+            column: tuple(names) for column, names in columns_by_name.items()
+        }
+
+    @classmethod
+    def from_dicts(cls, tables: List[Dict[str, Any]], relationships: List[Dict[str, Any]]) -> "SchemaModel":
+        return cls(
+            (Table.from_dict(table) for table in tables if table.get("name")),
+            (Relationship.from_dict(rel) for rel in relationships)
+        )
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def get_table(self, name: str) -> Optional[Table]:
+        return self.tables.get(name)
+
+    def has_column(self, table: str, column: str) -> bool:
+        found = self.tables.get(table)
+        return found is not None and column in found.column_set
+
+    def tables_with_column(self, column: str) -> Tuple[str, ...]:
+        return self.columns_by_name.get(column, ())
+
+    def relationships_of(self, table: str) -> Tuple[Relationship, ...]:
+        return self.adjacency.get(table, ())
+
+    def neighbours(self, table: str) -> List[str]:
+        return [rel.other(table) for rel in self.adjacency.get(table, ())]
+
+    def table_dicts(self) -> List[Dict[str, Any]]:
+        return [table.to_dict() for table in self.tables.values()]
+
+    def relationship_dicts(self) -> List[Dict[str, Any]]:
+        return [rel.to_dict() for rel in self.relationships]
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - exercised only without msgpack installed
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# File layout: magic, codec byte ("m" msgpack / "j" JSON), encoded payload
+SNAPSHOT_MAGIC = b"DASNAP1"
+SNAPSHOT_FORMAT_VERSION = 1
+
+def source_id(database_url: str) -> str:
+    """Stable identifier for the database a snapshot came from, without storing credentials."""
+    return hashlib.sha256((database_url or "").encode("utf-8")).hexdigest()[:16]
+
+def _encode(payload: Dict[str, Any]) -> bytes:
+    if msgpack is not None:
+        return b"m" + msgpack.packb(payload, use_bin_type=True, default=str)
+    return b"j" + json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+
+def _decode(data: bytes) -> Dict[str, Any]:
+    codec, body = data[:1], data[1:]
+    if codec == b"m":
+        if msgpack is None:
+            raise ValueError("snapshot was written with msgpack, which is not installed")
+        return msgpack.unpackb(body, raw=False)
+    if codec == b"j":
+        return json.loads(body.decode("utf-8"))
+    raise ValueError(f"unknown snapshot codec {codec!r}")
+
+def write_snapshot(path: str, database_url: str, version: str,
+                   tables: List[Dict[str, Any]], relationships: List[Dict[str, Any]]):
+    """Atomically write a schema snapshot so a crash never leaves a truncated file behind."""
+    payload = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "source": source_id(database_url),
+        "version": version,
+        "saved_at": datetime.now().isoformat(),
+        "tables": tables,
+        "relationships": relationships
+    }
+    data = SNAPSHOT_MAGIC + _encode(payload)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".schema-snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def read_snapshot(path: str, database_url: str) -> Optional[Dict[str, Any]]:
+    """Load a snapshot written for database_url, or None if it is missing, corrupt or foreign."""
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"Could not read schema snapshot {path}: {e}")
+        return None
+    if not data.startswith(SNAPSHOT_MAGIC):
+        logger.warning(f"Ignoring schema snapshot {path}: not a snapshot file")
+        return None
+    try:
+        payload = _decode(data[len(SNAPSHOT_MAGIC):])
+    except Exception as e:
+        logger.warning(f"Ignoring schema snapshot {path}: {e}")
+        return None
+    if payload.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        logger.info(f"Ignoring schema snapshot {path}: format version {payload.get('format_version')}")
+        return None
+    if payload.get("source") != source_id(database_url):
+        logger.info(f"Ignoring schema snapshot {path}: written for a different database")
+        return None
+    return payload
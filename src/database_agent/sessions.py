@@ -0,0 +1,94 @@
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from .true_agent import TrueDatabaseAgent, AgentSession
+
+class SessionManager:
+    """Concurrent conversations served by one TrueDatabaseAgent.
+
+    Each session gets its own AgentSession (state, current goal, last validation), while the
+    connection pool, caches, LLM client, schema and memory store are shared through the agent.
+    Requests in different sessions run concurrently; requests within one session run in order.
+
+    Sessions idle for longer than idle_timeout seconds are closed. Sessions are kept in order of
+    last activity, so a sweep only looks at the ones it closes. At most max_sessions are open; the
+    least recently active one is closed first.
+    """
+    def __init__(self, config: Dict[str, Any], agent: Optional[TrueDatabaseAgent] = None):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        sessions_config = config.get("sessions", {})
+        self.idle_timeout = sessions_config.get("idle_timeout", 1800)
+        self.max_sessions = sessions_config.get("max_sessions", 10000)
+        self.agent = agent if agent is not None else TrueDatabaseAgent(config)
+        self._owns_agent = agent is None
+        self._sessions: "OrderedDict[str, AgentSession]" = OrderedDict()
+        self._stats = {"opened": 0, "closed": 0, "evicted_idle": 0, "evicted_full": 0, "requests": 0}
+
+    def open(self, user_id: Optional[str] = None, session_id: Optional[str] = None) -> AgentSession:
+        """Return the session with this id, creating it if needed."""
+        self.evict_idle()
+        session = self._sessions.get(session_id) if session_id is not None else None
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            return session
+        session = AgentSession(session_id or uuid.uuid4().hex, user_id=user_id)
+        self._sessions[session.session_id] = session
+        self._stats["opened"] += 1
+        while len(self._sessions) > self.max_sessions:
+            evicted, _ = self._sessions.popitem(last=False)
+            self._stats["evicted_full"] += 1
+            self.logger.debug(f"Closed least recently active session {evicted}")
+        return session
+
+    def get(self, session_id: str) -> Optional[AgentSession]:
+        return self._sessions.get(session_id)
+
+    async def process_request(self, session_id: str, user_input: str,
+                              user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Run a request in its session, opening the session on first use."""
+        session = self.open(user_id=user_id, session_id=session_id)
+        self._stats["requests"] += 1
+        try:
+            return await self.agent.process_request(user_input, user_id=user_id, session=session)
+        finally:
+            if session.session_id in self._sessions:
+                self._sessions.move_to_end(session.session_id)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Close sessions idle for longer than idle_timeout; returns how many were closed."""
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_active <= self.idle_timeout:
+                break
+            if session.lock.locked():
+                # Still running a long request: not idle
+                session.last_active = now
+                self._sessions.move_to_end(session_id)
+                continue
+            del self._sessions[session_id]
+            evicted += 1
+        self._stats["evicted_idle"] += evicted
+        return evicted
+
+    def close_session(self, session_id: str) -> bool:
+        if self._sessions.pop(session_id, None) is None:
+            return False
+        self._stats["closed"] += 1
+        return True
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"active": len(self._sessions), "max_sessions": self.max_sessions,
+                "idle_timeout": self.idle_timeout, **self._stats}
+
+    async def close(self):
+        self._sessions.clear()
+        if self._owns_agent:
+            await self.agent.close()
@@ -0,0 +1,125 @@
+import re
+from typing import Dict, Optional, Set
+
+TABLE_REFERENCE_PATTERN = re.compile(
+    r"\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+((?:[`\"\[]?[\w$]+[`\"\]]?\.)*[`\"\[]?[\w$]+[`\"\]]?)",
+    re.IGNORECASE
+)
+STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+def referenced_tables(sql: str) -> Set[str]:
+    """Best-effort set of lower-cased table names a SQL statement reads or writes."""
+    if not sql:
+        return set()
+    text = strip_literals_and_comments(sql)
+    tables = set()
+    for match in TABLE_REFERENCE_PATTERN.finditer(text):
+        name = match.group(1).split(".")[-1].strip("`\"[]").lower()
+        if name and name.upper() not in ("SELECT", "LATERAL", "UNNEST"):
+            tables.add(name)
+    return tables
+
+READ_ONLY_KEYWORDS = {"SELECT", "WITH", "EXPLAIN", "VALUES", "SHOW", "DESCRIBE", "DESC", "SUMMARIZE"}
+WRITE_STATEMENT_PATTERN = re.compile(
+    r"\b(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|UPDATE\s+[\w$`\"\[\].]+\s+SET|DELETE\s+FROM|MERGE\s+INTO"
+    r"|CREATE|ALTER|DROP|TRUNCATE|ATTACH|DETACH|COPY|PRAGMA|VACUUM|GRANT|REVOKE)\b",
+    re.IGNORECASE
+)
+
+def strip_literals_and_comments(sql: str) -> str:
+    return COMMENT_PATTERN.sub(" ", STRING_LITERAL_PATTERN.sub("''", sql or ""))
+
+def is_read_only(sql: str) -> bool:
+    """Conservative check that sql is a single statement that cannot modify the database."""
+    text = strip_literals_and_comments(sql).strip().rstrip(";").strip()
+    if not text or ";" in text:
+        return False
+    first = text.split(None, 1)[0].upper().lstrip("(")
+    if first not in READ_ONLY_KEYWORDS:
+        return False
+    # A CTE can wrap a data-modifying statement, and EXPLAIN ANALYZE runs its statement
+    return not WRITE_STATEMENT_PATTERN.search(text)
+
+CANONICAL_TOKEN_PATTERN = re.compile(
+    r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`)|(--[^\n]*|/\*.*?\*/)|([^'\"`\-/]+|.)",
+    re.DOTALL
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+PUNCTUATION_SPACING_PATTERN = re.compile(r"\s*([(),=])\s*")
+
+def _canonical_code(text: str) -> str:
+    return PUNCTUATION_SPACING_PATTERN.sub(r"\1", WHITESPACE_PATTERN.sub(" ", text.lower()))
+
+def canonicalize_sql(sql: str) -> str:
+    """Canonical text of a statement, so formatting-only differences map to the same string.
+
+    Comments are dropped, and whitespace and case are normalized outside string literals and quoted identifiers.
+    """
+    pieces, code = [], []
+    for quoted, comment, other in CANONICAL_TOKEN_PATTERN.findall(sql or ""):
+        if quoted:
+            pieces.append(_canonical_code("".join(code)))
+            pieces.append(quoted)
+            code = []
+        else:
+            code.append(" " if comment else other)
+    pieces.append(_canonical_code("".join(code)))
+    return "".join(pieces).strip().rstrip(";").strip()
+
+LIMIT_PATTERN = re.compile(r"\bLIMIT\s+(\d+)", re.IGNORECASE)
+FROM_ITEM_PATTERN = re.compile(
+    r"\s*((?:[`\"]?[\w$]+[`\"]?\.)*[`\"]?[\w$]+[`\"]?)(?:\s+(?:AS\s+)?([\w$]+))?\s*",
+    re.IGNORECASE
+)
+FROM_KEYWORD_PATTERN = re.compile(r"\b(FROM|JOIN)\b", re.IGNORECASE)
+NOT_ALIASES = {
+    "WHERE", "JOIN", "ON", "USING", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "NATURAL", "OUTER", "GROUP",
+    "ORDER", "LIMIT", "OFFSET", "UNION", "EXCEPT", "INTERSECT", "HAVING", "WINDOW", "QUALIFY", "SET"
+}
+
+def top_level_limit(sql: str) -> Optional[int]:
+    """LIMIT of the outermost query, or None when only subqueries (or nothing) are limited."""
+    text = strip_literals_and_comments(sql)
+    limit = None
+    for match in LIMIT_PATTERN.finditer(text):
+        prefix = text[:match.start()]
+        if prefix.count("(") == prefix.count(")"):
+            limit = int(match.group(1))
+    return limit
+
+def add_limit(sql: str, limit: int) -> str:
+    """Append a LIMIT to a single statement, after dropping its trailing semicolons and comments."""
+    end = 0
+    for match in CANONICAL_TOKEN_PATTERN.finditer(sql or ""):
+        quoted, _, other = match.groups()
+        if quoted:
+            end = match.end()
+        elif other:
+            code = re.sub(r"[\s;]+$", "", other)
+            if code:
+                end = match.start() + len(code)
+    return f"{sql[:end]}\nLIMIT {limit}"
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    """Best-effort map of lower-cased alias (or bare name) to lower-cased table name in FROM and JOIN clauses."""
+    text = strip_literals_and_comments(sql)
+    aliases = {}
+    for keyword in FROM_KEYWORD_PATTERN.finditer(text):
+        position = keyword.end()
+        while True:
+            item = FROM_ITEM_PATTERN.match(text, position)
+            if item is None:
+                break
+            name = item.group(1).split(".")[-1].strip("`\"").lower()
+            if name.upper() in NOT_ALIASES or name.upper() == "SELECT":
+                break
+            aliases[name] = name
+            alias = item.group(2)
+            if alias and alias.upper() not in NOT_ALIASES:
+                aliases[alias.lower()] = name
+            # FROM a x, b y: keep reading the comma-separated list
+            if keyword.group(1).upper() != "FROM" or not text.startswith(",", item.end()):
+                break
+            position = item.end() + 1
+    return aliases
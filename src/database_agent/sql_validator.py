@@ -0,0 +1,239 @@
+import difflib
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Set, Tuple
+from .schema_model import SchemaModel
+from .sql_utils import is_read_only, referenced_tables
+
+try:
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import ParseError, TokenError
+except ImportError:  # pragma: no cover - sqlglot is optional
+    sqlglot = None
+
+if sqlglot is not None:
+    WRITE_NODES = tuple(
+        getattr(exp, name) for name in (
+            "Insert", "Update", "Delete", "Merge", "Create", "Drop", "Alter", "AlterTable", "TruncateTable",
+            "Command", "Copy", "Pragma", "Attach", "Detach", "Grant", "Revoke", "Set", "Use", "Transaction"
+        ) if hasattr(exp, name)
+    )
+
+class SQLValidationError(Exception):
+    """Generated SQL still failed validation after the repair attempt."""
+    def __init__(self, result: "ValidationResult"):
+        super().__init__("; ".join(issue.message for issue in result.issues))
+        self.result = result
+
+@dataclass
+class ValidationIssue:
+    """One problem found in a statement, specific enough to repair without another guess."""
+    code: str  # parse_error, multiple_statements, not_read_only, unknown_table, unknown_column, unknown_qualifier
+    message: str
+    table: Optional[str] = None
+    column: Optional[str] = None
+    suggestions: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "code": self.code,
+            "message": self.message,
+            "table": self.table,
+            "column": self.column,
+            "suggestions": self.suggestions
+        }
+
+@dataclass
+class ValidationResult:
+    sql: str
+    issues: List[ValidationIssue] = field(default_factory=list)
+    tables: Set[str] = field(default_factory=set)
+    parser: str = "sqlglot"
+    # False when no schema was loaded, so only parsing and the read-only check ran
+    schema_checked: bool = False
+
+    @property
+    def valid(self) -> bool:
+        return not self.issues
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "valid": self.valid,
+            "sql": self.sql,
+            "tables": sorted(self.tables),
+            "issues": [issue.to_dict() for issue in self.issues],
+            "parser": self.parser,
+            "schema_checked": self.schema_checked
+        }
+
+class SQLValidator:
+    """Parses generated SQL locally and checks it against the loaded schema before it is executed.
+
+    Without sqlglot installed only the read-only and table-name checks run.
+    """
+    def __init__(self, schema_manager=None, dialect: Optional[str] = None):
+        self.schema_manager = schema_manager
+        self.dialect = dialect
+        self.logger = logging.getLogger(__name__)
+        self._catalog_model: Optional[SchemaModel] = None
+        self._catalog: Dict[str, Tuple[str, Dict[str, str]]] = {}
+
+    def _get_catalog(self) -> Optional[Dict[str, Tuple[str, Dict[str, str]]]]:
+        """Case-insensitive view of the schema: lower table name -> (name, {lower column: column})."""
+        model = self.schema_manager.schema_model if self.schema_manager is not None else None
+        if model is None or not model.tables:
+            return None
+        if model is not self._catalog_model:
+            self._catalog = {
+                name.lower(): (name, {column.lower(): column for column in table.columns})
+                for name, table in model.tables.items()
+            }
+            self._catalog_model = model
+        return self._catalog
+
+    def validate(self, sql: str) -> ValidationResult:
+        if sqlglot is None:
+            return self._validate_without_parser(sql)
+        result = ValidationResult(sql=sql)
+        try:
+            statements = [statement for statement in sqlglot.parse(sql, read=self.dialect) if statement is not None]
+        except (ParseError, TokenError) as e:
+            result.issues.append(ValidationIssue("parse_error", f"SQL does not parse: {self._parse_message(e)}"))
+            return result
+        if len(statements) != 1:
+            result.issues.append(ValidationIssue(
+                "multiple_statements" if statements else "parse_error",
+                f"Expected exactly one statement, found {len(statements)}"
+            ))
+            return result
+        tree = statements[0]
+        # A CTE can wrap a data-modifying statement, so look below the root too
+        write = tree if not isinstance(tree, exp.Query) else tree.find(*WRITE_NODES)
+        if write is not None:
+            result.issues.append(ValidationIssue(
+                "not_read_only", f"Only read-only SELECT queries are allowed, found {write.key.upper()}"
+            ))
+            return result
+        self._check_references(tree, result)
+        return result
+
+    def _parse_message(self, error: Exception) -> str:
+        details = getattr(error, "errors", None)
+        if details:
+            first = details[0]
+            return f"{first.get('description')} (line {first.get('line')}, column {first.get('col')})"
+        return str(error).splitlines()[0]
+
+    def _check_references(self, tree, result: ValidationResult):
+        catalog = self._get_catalog()
+        result.schema_checked = catalog is not None
+        # Names bound to CTEs, subqueries and table functions: their columns are not in the catalog
+        derived = {cte.alias.lower() for cte in tree.find_all(exp.CTE) if cte.alias}
+        derived.update(sub.alias.lower() for sub in tree.find_all(exp.Subquery) if sub.alias)
+        sources: Dict[str, Optional[str]] = {}
+        for table in tree.find_all(exp.Table):
+            if not isinstance(table.this, exp.Identifier):
+                if table.alias:
+                    derived.add(table.alias.lower())
+                continue
+            name = table.name.lower()
+            alias = table.alias_or_name.lower()
+            if name in derived and not table.db:
+                sources[alias] = None
+                continue
+            result.tables.add(table.name)
+            if catalog is None:
+                continue
+            if name not in catalog:
+                result.issues.append(ValidationIssue(
+                    "unknown_table", f"Table '{table.name}' does not exist",
+                    table=table.name, suggestions=difflib.get_close_matches(name, list(catalog), n=3)
+                ))
+                sources[alias] = None
+            else:
+                sources[alias] = name
+        if catalog is None:
+            return
+        output_aliases = {alias.alias.lower() for alias in tree.find_all(exp.Alias) if alias.alias}
+        known = [name for name in sources.values() if name is not None]
+        checkable = all(name is not None for name in sources.values()) and not derived
+        reported = set()
+        for column in tree.find_all(exp.Column):
+            if isinstance(column.this, exp.Star) or not column.name:
+                continue
+            name, qualifier = column.name.lower(), column.table.lower()
+            if qualifier:
+                if qualifier in derived or sources.get(qualifier, "") is None:
+                    continue
+                if qualifier not in sources:
+                    issue = ValidationIssue(
+                        "unknown_qualifier", f"'{column.table}.{column.name}' refers to '{column.table}', "
+                        f"which is not a table or alias in the FROM clause",
+                        table=column.table, column=column.name, suggestions=sorted(sources)
+                    )
+                elif name not in catalog[sources[qualifier]][1]:
+                    table_name, columns = catalog[sources[qualifier]]
+                    issue = ValidationIssue(
+                        "unknown_column", f"Column '{column.name}' does not exist in table '{table_name}'",
+                        table=table_name, column=column.name,
+                        suggestions=[columns[c] for c in difflib.get_close_matches(name, list(columns), n=3)]
+                    )
+                else:
+                    continue
+            else:
+                if not checkable or name in output_aliases or any(name in catalog[t][1] for t in known):
+                    continue
+                candidates = {c: catalog[t][1][c] for t in known for c in catalog[t][1]}
+                issue = ValidationIssue(
+                    "unknown_column",
+                    f"Column '{column.name}' does not exist in {', '.join(dict.fromkeys(catalog[t][0] for t in known)) or 'any table'}",
+                    column=column.name,
+                    suggestions=[candidates[c] for c in difflib.get_close_matches(name, list(candidates), n=3)]
+                )
+            if (issue.code, issue.table, name) not in reported:
+                reported.add((issue.code, issue.table, name))
+                result.issues.append(issue)
+
+    def _validate_without_parser(self, sql: str) -> ValidationResult:
+        result = ValidationResult(sql=sql, tables=referenced_tables(sql), parser="regex")
+        if not is_read_only(sql):
+            result.issues.append(ValidationIssue(
+                "not_read_only", "Only single read-only SELECT statements are allowed"
+            ))
+            return result
+        catalog = self._get_catalog()
+        result.schema_checked = catalog is not None
+        if catalog is not None:
+            for name in sorted(result.tables - set(catalog)):
+                result.issues.append(ValidationIssue(
+                    "unknown_table", f"Table '{name}' does not exist",
+                    table=name, suggestions=difflib.get_close_matches(name, list(catalog), n=3)
+                ))
+        return result
+
+    def build_repair_prompt(self, request: str, result: ValidationResult) -> str:
+        """Single-shot repair prompt: the failed SQL, each issue with suggestions, and the real columns involved."""
+        lines = [
+            f"The SQL below was generated for the request: {request}",
+            "",
+            result.sql.strip(),
+            "",
+            "It failed validation against the database schema:"
+        ]
+        for issue in result.issues:
+            hint = f" Did you mean: {', '.join(issue.suggestions)}?" if issue.suggestions else ""
+            lines.append(f"- {issue.message}.{hint}")
+        catalog = self._get_catalog()
+        if catalog is not None:
+            names = {name.lower() for name in result.tables}
+            names.update(s.lower() for issue in result.issues if issue.code == "unknown_table" for s in issue.suggestions)
+            names.update(issue.table.lower() for issue in result.issues if issue.table)
+            described = [catalog[name] for name in sorted(names) if name in catalog]
+            if described:
+                lines.append("")
+                lines.append("Available columns:")
+                lines.extend(f"- {table}({', '.join(columns.values())})" for table, columns in described)
+        lines.append("")
+        lines.append("Return only the corrected SQL as a single read-only SELECT statement.")
+        return "\n".join(lines)
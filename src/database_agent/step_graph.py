@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple, Type
+
+@dataclass
+class PlanStep:
+    """One step of a plan. depends_on names the steps whose results it needs."""
+    name: str
+    depends_on: List[str] = field(default_factory=list)
+    timeout: Optional[float] = None
+    retries: int = 0
+
+@dataclass
+class StepTrace:
+    """Timing of one step; times are milliseconds since the plan started."""
+    name: str
+    status: str = "pending"
+    attempts: int = 0
+    started_ms: Optional[float] = None
+    duration_ms: Optional[float] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class StepFailedError(Exception):
+    """A step failed after its retries; error is the exception it raised last."""
+    def __init__(self, step: str, error: BaseException, trace: List[StepTrace]):
+        super().__init__(f"Step {step} failed: {error}")
+        self.step = step
+        self.error = error
+        self.trace = trace
+
+class StepGraph:
+    """A plan as a dependency graph of steps, checked for unknown dependencies and cycles."""
+    def __init__(self, steps: List[PlanStep]):
+        self.steps = steps
+        self.by_name = {step.name: step for step in steps}
+        if len(self.by_name) != len(steps):
+            raise ValueError("Plan step names must be unique")
+        for step in steps:
+            for dependency in step.depends_on:
+                if dependency not in self.by_name:
+                    raise ValueError(f"Step {step.name} depends on unknown step {dependency}")
+        self.order = self._topological_order()
+
+    @classmethod
+    def from_names(cls, names: List[str], dependencies: Dict[str, List[str]],
+                   options: Optional[Dict[str, Dict[str, Any]]] = None, timeout: Optional[float] = None,
+                   retries: int = 0) -> "StepGraph":
+        """Build a graph from step names.
+
+        A step listed in dependencies needs each of its dependencies earlier in the plan, or the
+        plan is rejected with ValueError; any other step depends on the step before it, as in a
+        sequential plan. options holds per-step timeout and retries overriding the defaults.
+        """
+        options = options or {}
+        steps = []
+        for i, name in enumerate(names):
+            if name in dependencies:
+                depends_on = list(dependencies[name])
+                for dependency in depends_on:
+                    if dependency not in names[:i]:
+                        raise ValueError(f"Step {name} needs {dependency} earlier in the plan")
+            else:
+                depends_on = names[i - 1:i]
+            step_options = options.get(name, {})
+            steps.append(PlanStep(name, depends_on, timeout=step_options.get("timeout", timeout),
+                                  retries=step_options.get("retries", retries)))
+        return cls(steps)
+
+    def _topological_order(self) -> List[str]:
+        remaining = {step.name: len(step.depends_on) for step in self.steps}
+        dependents: Dict[str, List[str]] = {step.name: [] for step in self.steps}
+        for step in self.steps:
+            for dependency in step.depends_on:
+                dependents[dependency].append(step.name)
+        ready = [name for name, count in remaining.items() if count == 0]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for dependent in dependents[name]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != len(self.steps):
+            cycle = sorted(name for name, count in remaining.items() if count)
+            raise ValueError(f"Plan has a dependency cycle between: {', '.join(cycle)}")
+        return order
+
+class StepScheduler:
+    """Runs a StepGraph on the event loop, starting each step as soon as its dependencies finish.
+
+    Each attempt of a step is bounded by its timeout and a failed attempt is retried up to the
+    step's retry budget, except for exceptions listed in fatal, which fail the step at once. When
+    a step fails for good, the steps still running are cancelled, those not started are skipped,
+    and StepFailedError is raised. Cancelling run() cancels every running step. One scheduler can
+    run many graphs concurrently.
+    """
+    def __init__(self, fatal: Tuple[Type[BaseException], ...] = ()):
+        self.fatal = fatal
+        self.logger = logging.getLogger(__name__)
+
+    async def run(self, graph: StepGraph,
+                  run_step: Callable[[PlanStep, Dict[str, Any]], Awaitable[Any]]
+                  ) -> Tuple[Dict[str, Any], List[StepTrace]]:
+        """Run every step; run_step gets the step and the results so far.
+
+        Returns the results by step name and the trace of every step in topological order.
+        """
+        start = time.perf_counter()
+        traces = {step.name: StepTrace(step.name) for step in graph.steps}
+        trace_list = [traces[name] for name in graph.order]
+        results: Dict[str, Any] = {}
+        running: Dict["asyncio.Task", PlanStep] = {}
+        done = set()
+
+        def launch_ready():
+            for name in graph.order:
+                step = graph.by_name[name]
+                if traces[name].status == "pending" and all(dependency in done for dependency in step.depends_on):
+                    traces[name].status = "running"
+                    traces[name].started_ms = (time.perf_counter() - start) * 1000
+                    running[asyncio.ensure_future(self._attempt(step, results, run_step, traces[name]))] = step
+
+        launch_ready()
+        try:
+            while running:
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    step = running.pop(task)
+                    trace = traces[step.name]
+                    trace.duration_ms = (time.perf_counter() - start) * 1000 - trace.started_ms
+                    error = task.exception()
+                    if error is not None:
+                        trace.status = "timeout" if isinstance(error, asyncio.TimeoutError) else "failed"
+                        trace.error = str(error) or type(error).__name__
+                        raise StepFailedError(step.name, error, trace_list)
+                    trace.status = "completed"
+                    results[step.name] = task.result()
+                    done.add(step.name)
+                launch_ready()
+        finally:
+            for task, step in running.items():
+                task.cancel()
+                traces[step.name].status = "cancelled"
+                traces[step.name].duration_ms = (time.perf_counter() - start) * 1000 - traces[step.name].started_ms
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            for trace in trace_list:
+                if trace.status == "pending":
+                    trace.status = "skipped"
+        return results, trace_list
+
+    async def _attempt(self, step: PlanStep, results: Dict[str, Any],
+                       run_step: Callable[[PlanStep, Dict[str, Any]], Awaitable[Any]], trace: StepTrace) -> Any:
+        while True:
+            trace.attempts += 1
+            try:
+                return await asyncio.wait_for(run_step(step, results), timeout=step.timeout)
+            except self.fatal:
+                raise
+            except Exception as e:
+                if trace.attempts > step.retries:
+                    raise
+                self.logger.warning(f"Step {step.name} attempt {trace.attempts} failed, retrying: {e}")
@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Optional
 from datetime import datetime
 from ..llm_integration import LLMIntegration
 
@@ -10,21 +10,16 @@ class QueryTool:
         self.llm_integration = llm_integration
         self.logger = logging.getLogger(__name__)
     
-    async def generate_query(self, prompt: str) -> Dict[str, Any]:
+    async def generate_query(self, prompt: str, schema_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Generate SQL query from natural language prompt."""
         try:
             self.logger.info(f"Generating SQL for prompt: {prompt[:50]}...")
             
             # Generate SQL using LLM
-            sql_query = await self.llm_integration.generate_sql(prompt)
+            sql_query = await self.llm_integration.generate_sql(prompt, schema_context)
             
             # Format response
-            result = {
-                "sql_query": sql_query,
-                "explanation": f"Generated SQL query for: {prompt}",
-                "prompt": prompt,
-                "timestamp": datetime.now().isoformat()
-            }
+            result = self._format_result(prompt, sql_query)
             
             self.logger.info(f"Query generated successfully: {sql_query[:50]}...")
             return result
@@ -38,6 +33,40 @@ class QueryTool:
                 "timestamp": datetime.now().isoformat()
             }
     
+    async def stream_query(self, prompt: str, schema_context: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Generate SQL query, yielding token events followed by a final result event."""
+        try:
+            self.logger.info(f"Streaming SQL for prompt: {prompt[:50]}...")
+            parts = []
+            async for chunk in self.llm_integration.stream_sql(prompt, schema_context):
+                parts.append(chunk)
+                yield {"event": "token", "data": {"index": len(parts) - 1, "text": chunk}}
+            
+            # Tokens went out as the model wrote them; the final result is in the target dialect
+            sql_query = self.llm_integration.transpile("".join(parts))
+            self.logger.info(f"Query streamed successfully: {sql_query[:50]}...")
+            yield {"event": "result", "data": self._format_result(prompt, sql_query)}
+            
+        except Exception as e:
+            self.logger.error(f"Error in query tool stream: {e}")
+            yield {
+                "event": "error",
+                "data": {
+                    "error": str(e),
+                    "sql_query": None,
+                    "prompt": prompt,
+                    "timestamp": datetime.now().isoformat()
+                }
+            }
+    
+    def _format_result(self, prompt: str, sql_query: str) -> Dict[str, Any]:
+        return {
+            "sql_query": sql_query,
+            "explanation": f"Generated SQL query for: {prompt}",
+            "prompt": prompt,
+            "timestamp": datetime.now().isoformat()
+        }
+    
     def get_tool_schema(self) -> Dict[str, Any]:
         """Get MCP tool schema definition."""
         return {
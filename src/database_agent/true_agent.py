@@ -4,6 +4,18 @@ from datetime import datetime
 from dataclasses import dataclass, field
 from enum import Enum
 import asyncio
+import time
+from .query_executor import QueryExecutor
+from .columnar import ColumnarResult
+from .result_cache import ResultCache
+from .schema_manager import SchemaManager
+from .llm_integration import LLMIntegration
+from .dialects import detect_dialect
+from .sql_validator import SQLValidator, SQLValidationError
+from .query_guard import QueryGuard, QueryBlockedError
+from .agent_memory import AgentMemory, MemoryStore, extract_keywords
+from .step_graph import PlanStep, StepGraph, StepScheduler, StepFailedError
+from .planner import Planner, STEP_DEPENDENCIES
 
 class AgentState(Enum):
     PLANNING = "planning"
@@ -13,28 +25,6 @@ class AgentState(Enum):
     COMPLETED = "completed"
     ERROR = "error"
 
-@dataclass
-class AgentMemory:
-    """Memory system for the agent."""
-    conversation_history: List[Dict[str, Any]] = field(default_factory=list)
-    executed_queries: List[Dict[str, Any]] = field(default_factory=list)
-    learned_patterns: Dict[str, Any] = field(default_factory=dict)
-    user_preferences: Dict[str, Any] = field(default_factory=dict)
-    
-    def add_interaction(self, interaction: Dict[str, Any]):
-        """Add an interaction to memory."""
-        interaction["timestamp"] = datetime.now().isoformat()
-        self.conversation_history.append(interaction)
-    
-    def get_relevant_context(self, current_prompt: str) -> List[Dict[str, Any]]:
-        """Retrieve relevant context from memory."""
-        # Simple relevance scoring - in practice, use embeddings
-        relevant = []
-        for interaction in self.conversation_history[-10:]:  # Last 10 interactions
-            if any(word in current_prompt.lower() for word in interaction.get("keywords", [])):
-                relevant.append(interaction)
-        return relevant
-
 @dataclass
 class AgentGoal:
     """Represents an agent's goal."""
@@ -43,17 +33,77 @@ class AgentGoal:
     current_step: int = 0
     status: str = "pending"
     result: Any = None
+    user_id: Optional[str] = None
+    sql: Optional[str] = None
+    trace: List[Dict[str, Any]] = field(default_factory=list)
+    plan: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class AgentSession:
+    """Mutable state of one conversation with the agent.
+    
+    Everything that changes while a request runs lives here rather than on the agent, so
+    requests in different sessions can share one agent without overwriting each other.
+    """
+    session_id: str
+    user_id: Optional[str] = None
+    state: AgentState = AgentState.PLANNING
+    current_goal: Optional[AgentGoal] = None
+    last_validation: Any = None
+    created_at: float = field(default_factory=time.monotonic)
+    last_active: float = field(default_factory=time.monotonic)
+    requests: int = 0
+    # Requests within one session run in order
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+    
+    def touch(self):
+        self.last_active = time.monotonic()
 
 class TrueDatabaseAgent:
-    """A true AI agent with autonomous capabilities."""
+    """A true AI agent with autonomous capabilities.
+    
+    The agent holds only shared resources (connection pool, caches, LLM client, schema); the
+    state of a request is kept in an AgentSession. Use SessionManager to serve many concurrent
+    conversations from one agent.
+    """
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], schema_manager: Optional[SchemaManager] = None,
+                 llm_integration: Optional[LLMIntegration] = None, memory_store: Optional[MemoryStore] = None):
         self.config = config
-        self.memory = AgentMemory()
-        self.current_goal: Optional[AgentGoal] = None
-        self.state = AgentState.PLANNING
+        # Pass one MemoryStore to several agents to share per-user memory between sessions
+        self.memory_store = memory_store if memory_store is not None else MemoryStore(config)
+        self._owns_memory_store = memory_store is None
+        self.memory = self.memory_store.get()
+        # Session of the most recent request made without one; backs state and current_goal
+        self.default_session = AgentSession("default")
         self.available_tools = self._initialize_tools()
+        self.query_executor = QueryExecutor(config)
+        self.schema_manager = schema_manager
+        self.query_guard = QueryGuard(config, self.query_executor, schema_manager)
+        self.result_cache = ResultCache(config)
+        if schema_manager is not None:
+            # Cached results are only valid for the schema and row counts they were computed against
+            self.result_cache.invalidate(schema_manager.schema_version)
+            schema_manager.add_diff_listener(self.result_cache.apply_schema_diff)
+        self.llm_integration = llm_integration
+        self.planner = Planner(config, llm_integration)
+        self.sql_validator = SQLValidator(schema_manager, dialect=detect_dialect(config))
+        self._validation_stats = {"validated": 0, "rejected": 0, "repaired": 0, "repair_failed": 0}
+        # Blocked or invalid SQL fails the same way on every attempt; retrying it only costs time
+        self.step_scheduler = StepScheduler(fatal=(QueryBlockedError, SQLValidationError))
         self.logger = logging.getLogger(__name__)
+    
+    @property
+    def state(self) -> AgentState:
+        return self.default_session.state
+    
+    @property
+    def current_goal(self) -> Optional[AgentGoal]:
+        return self.default_session.current_goal
+    
+    @property
+    def last_validation(self) -> Any:
+        return self.default_session.last_validation
         
     def _initialize_tools(self) -> Dict[str, Any]:
         """Initialize available tools."""
@@ -65,12 +115,28 @@ class TrueDatabaseAgent:
             "explanation_generator": {"name": "Explanation Generator", "capability": "explain_results"}
         }
     
-    async def process_request(self, user_input: str) -> Dict[str, Any]:
-        """Main entry point - processes user requests autonomously."""
+    async def process_request(self, user_input: str, user_id: Optional[str] = None,
+                              session: Optional[AgentSession] = None) -> Dict[str, Any]:
+        """Main entry point - processes user requests autonomously, remembering them per user.
+        
+        Without a session, the request gets a fresh one of its own.
+        """
+        if session is None:
+            session = self.default_session = AgentSession("default", user_id=user_id)
+        async with session.lock:
+            session.touch()
+            session.requests += 1
+            try:
+                return await self._process(user_input, user_id if user_id is not None else session.user_id, session)
+            finally:
+                session.touch()
+    
+    async def _process(self, user_input: str, user_id: Optional[str], session: AgentSession) -> Dict[str, Any]:
         try:
             # 1. Understand the request
             self.logger.info(f"Processing request: {user_input}")
-            self.memory.add_interaction({
+            memory = await self.memory_store.get_async(user_id)
+            interaction = memory.add_interaction({
                 "type": "user_input",
                 "content": user_input,
                 "keywords": self._extract_keywords(user_input)
@@ -78,134 +144,227 @@ class TrueDatabaseAgent:
             
             # 2. Plan the approach
             goal = await self._create_goal(user_input)
-            self.current_goal = goal
+            goal.user_id = user_id
+            session.current_goal = goal
             
             # 3. Execute the plan
-            result = await self._execute_goal(goal)
+            result = await self._execute_goal(goal, session)
             
             # 4. Learn from the interaction
-            self._learn_from_interaction(user_input, result)
+            if goal.sql is not None:
+                memory.update_interaction(interaction, sql=goal.sql)
+            self._learn_from_interaction(user_input, result, memory)
             
             return result
             
         except Exception as e:
             self.logger.error(f"Error processing request: {e}")
-            return {"error": str(e), "state": self.state.value}
+            return {"error": str(e), "state": session.state.value}
     
     async def _create_goal(self, user_input: str) -> AgentGoal:
         """Create a goal from user input."""
         # Analyze the request and break it into steps
-        steps = await self._plan_steps(user_input)
-        return AgentGoal(description=user_input, steps=steps)
+        decision = await self.planner.plan(user_input)
+        return AgentGoal(description=user_input, steps=decision.steps, plan=decision.to_dict())
     
     async def _plan_steps(self, user_input: str) -> List[str]:
-        """Plan the steps needed to fulfill the request."""
-        # This would use LLM to break down complex requests
-        if "show me" in user_input.lower() or "get" in user_input.lower():
-            return [
-                "analyze_schema",
-                "generate_sql",
-                "execute_query",
-                "format_results"
-            ]
-        elif "explain" in user_input.lower():
-            return [
-                "analyze_schema",
-                "generate_sql",
-                "explain_query"
-            ]
-        else:
-            return ["generate_sql", "execute_query"]
+        """Plan the steps needed to fulfill the request (see Planner)."""
+        return (await self.planner.plan(user_input)).steps
     
-    async def _execute_goal(self, goal: AgentGoal) -> Dict[str, Any]:
-        """Execute the goal step by step."""
-        self.state = AgentState.EXECUTING
+    async def _execute_goal(self, goal: AgentGoal, session: Optional[AgentSession] = None) -> Dict[str, Any]:
+        """Execute the goal's steps, running steps that do not depend on each other concurrently."""
+        session = session if session is not None else self.default_session
+        session.state = AgentState.EXECUTING
+        plan_config = self.config.get("plan", {})
+        try:
+            graph = StepGraph.from_names(
+                goal.steps, STEP_DEPENDENCIES, options=plan_config.get("steps", {}),
+                timeout=plan_config.get("step_timeout"), retries=plan_config.get("step_retries", 0)
+            )
+        except ValueError as e:
+            self.logger.error(f"Invalid plan {goal.steps}: {e}")
+            session.state = AgentState.ERROR
+            return {"error": str(e), "steps": goal.steps}
         
-        for i, step in enumerate(goal.steps):
-            goal.current_step = i
-            self.logger.info(f"Executing step {i+1}/{len(goal.steps)}: {step}")
+        async def run_step(step: PlanStep, results: Dict[str, Any]) -> Any:
+            self.logger.info(f"Executing step {step.name}")
+            # A step works on the results of the steps it depends on
+            inputs = {name: results[name] for name in step.depends_on}
+            step_result = await self._execute_step(step.name, goal, inputs)
             
-            try:
-                # Execute the step
-                step_result = await self._execute_step(step, goal)
-                
-                # Validate the result
-                if not await self._validate_step_result(step, step_result):
-                    self.state = AgentState.REFINING
-                    step_result = await self._refine_step(step, step_result, goal)
-                
-                goal.result = step_result
-                
-            except Exception as e:
-                self.logger.error(f"Error in step {step}: {e}")
-                self.state = AgentState.ERROR
-                return {"error": str(e), "step": step}
+            # Validate the result
+            if not await self._validate_step_result(step.name, step_result, session):
+                session.state = AgentState.REFINING
+                step_result = await self._refine_step(step.name, step_result, goal, session, inputs)
+            
+            if step.name == "generate_sql":
+                goal.sql = step_result
+            elif step.name == "execute_query" and goal.sql is not None:
+                if session.last_validation is not None and session.last_validation.schema_checked:
+                    self._record_example(goal.description, goal.sql)
+                self.memory_store.get(goal.user_id).add_executed_query({
+                    "description": goal.description,
+                    "sql": goal.sql
+                })
+            goal.current_step += 1
+            return step_result
         
-        self.state = AgentState.COMPLETED
+        try:
+            results, trace = await self.step_scheduler.run(graph, run_step)
+        except StepFailedError as failure:
+            goal.trace = [step.to_dict() for step in failure.trace]
+            e, step = failure.error, failure.step
+            session.state = AgentState.ERROR
+            if isinstance(e, QueryBlockedError):
+                self.logger.error(f"Query blocked by the cost guard: {e}")
+                return {"error": str(e), "step": step, "estimate": e.estimate.to_dict()}
+            if isinstance(e, SQLValidationError):
+                self.logger.error(f"Generated SQL failed validation after repair: {e}")
+                return {"error": str(e), "step": step, "validation": e.result.to_dict()}
+            self.logger.error(f"Error in step {step}: {e}")
+            return {"error": str(e) or type(e).__name__, "step": step}
+        
+        goal.trace = [step.to_dict() for step in trace]
+        # The goal's result is that of its last step, as in a sequential plan
+        if goal.steps:
+            goal.result = results[goal.steps[-1]]
+        session.state = AgentState.COMPLETED
         goal.status = "completed"
         return goal.result
     
-    async def _execute_step(self, step: str, goal: AgentGoal) -> Any:
-        """Execute a single step."""
+    async def _execute_step(self, step: str, goal: AgentGoal, inputs: Optional[Dict[str, Any]] = None) -> Any:
+        """Execute a single step on the results of the steps it depends on, keyed by step name."""
+        inputs = inputs or {}
         if step == "analyze_schema":
             return await self._analyze_schema(goal.description)
+        elif step == "retrieve_examples":
+            return await self._retrieve_examples(goal.description)
         elif step == "generate_sql":
-            return await self._generate_sql(goal.description)
+            return await self._generate_sql(
+                goal.description, self.memory_store.get(goal.user_id),
+                inputs.get("analyze_schema"), inputs.get("retrieve_examples")
+            )
         elif step == "execute_query":
-            return await self._execute_query(goal.result)
+            return await self._execute_query(inputs.get("generate_sql"))
         elif step == "format_results":
-            return await self._format_results(goal.result)
+            return await self._format_results(inputs.get("execute_query"))
         elif step == "explain_query":
-            return await self._explain_query(goal.result)
+            return await self._explain_query(inputs.get("generate_sql"))
         else:
             raise ValueError(f"Unknown step: {step}")
     
-    async def _validate_step_result(self, step: str, result: Any) -> bool:
+    async def _validate_step_result(self, step: str, result: Any, session: AgentSession) -> bool:
         """Validate the result of a step."""
         if step == "generate_sql":
-            # Validate SQL syntax
-            return "SELECT" in str(result).upper() and "FROM" in str(result).upper()
+            # Parse locally and check tables and columns against the schema before anything runs
+            session.last_validation = self.sql_validator.validate(str(result))
+            self._validation_stats["validated"] += 1
+            if not session.last_validation.valid:
+                self._validation_stats["rejected"] += 1
+                self.logger.info(f"Generated SQL rejected: {len(session.last_validation.issues)} issues")
+            return session.last_validation.valid
         elif step == "execute_query":
             # Validate query execution
             return result is not None and not isinstance(result, Exception)
         return True
     
-    async def _refine_step(self, step: str, result: Any, goal: AgentGoal) -> Any:
+    async def _refine_step(self, step: str, result: Any, goal: AgentGoal, session: AgentSession,
+                           inputs: Optional[Dict[str, Any]] = None) -> Any:
         """Refine a step if validation fails."""
         self.logger.info(f"Refining step: {step}")
         
         if step == "generate_sql":
-            # Ask for clarification or try alternative approach
-            return await self._generate_sql_with_context(goal.description, result)
+            # The rejected SQL was cached when it was generated; never serve it again
+            if self.llm_integration is not None:
+                self.llm_integration.cache.discard(goal.description)
+            # A single repair attempt, targeted at the reported issues
+            repaired = await self._generate_sql_with_context(
+                goal.description, result, session, (inputs or {}).get("analyze_schema")
+            )
+            session.last_validation = self.sql_validator.validate(repaired)
+            if not session.last_validation.valid:
+                self._validation_stats["repair_failed"] += 1
+                raise SQLValidationError(session.last_validation)
+            self._validation_stats["repaired"] += 1
+            return repaired
         
         return result
     
+    def _record_example(self, description: str, sql: str):
+        """Keep SQL that validated and ran as a few-shot example for similar goals."""
+        if self.llm_integration is not None:
+            self.llm_integration.example_store.add(description, sql)
+    
     async def _analyze_schema(self, description: str) -> Dict[str, Any]:
-        """Analyze database schema for context."""
-        # This would integrate with your schema-graph-builder
-        return {"tables": ["users", "orders"], "relationships": ["user_id"]}
+        """Tables and relationships relevant to the goal, pruned by the schema manager."""
+        return await self._schema_context(description) or {}
+    
+    async def _retrieve_examples(self, description: str) -> List[Dict[str, Any]]:
+        """Validated examples similar to the goal, searched off the event loop."""
+        if self.llm_integration is None:
+            return []
+        search = self.llm_integration.example_store.search
+        return await asyncio.get_running_loop().run_in_executor(None, search, description)
     
-    async def _generate_sql(self, description: str) -> str:
-        """Generate SQL with context from memory."""
-        context = self.memory.get_relevant_context(description)
+    async def _schema_context(self, description: str) -> Optional[Dict[str, Any]]:
+        """Relevant tables for the goal, or None when no schema is available."""
+        if self.schema_manager is None:
+            return None
+        try:
+            return await self.schema_manager.get_schema_context(description)
+        except Exception as e:
+            self.logger.warning(f"Could not load schema context: {e}")
+            return None
+    
+    async def _generate_sql(self, description: str, memory: Optional[AgentMemory] = None,
+                            schema_context: Optional[Dict[str, Any]] = None,
+                            examples: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Generate SQL from the schema context and examples found by the earlier steps, and memory."""
+        memory = memory if memory is not None else self.memory
+        context = memory.get_relevant_context(description, self.memory_store.context_limit)
+        if self.llm_integration is not None:
+            return await self.llm_integration.generate_sql(
+                description, schema_context or None, memory=context, examples=examples
+            )
         # Use context to improve SQL generation
         return f"SELECT * FROM users WHERE {description}"
     
-    async def _generate_sql_with_context(self, description: str, previous_result: Any) -> str:
+    async def _generate_sql_with_context(self, description: str, previous_result: Any,
+                                         session: Optional[AgentSession] = None,
+                                         schema_context: Optional[Dict[str, Any]] = None) -> str:
         """Generate SQL with additional context from previous attempts."""
+        validation = (session if session is not None else self.default_session).last_validation
+        if validation is None or validation.sql != str(previous_result):
+            validation = self.sql_validator.validate(str(previous_result))
+        prompt = self.sql_validator.build_repair_prompt(description, validation)
+        if self.llm_integration is not None:
+            # A repair prompt embeds one failed attempt, so its answer is never worth caching
+            if schema_context is None:
+                schema_context = await self._schema_context(description)
+            return await self.llm_integration.generate_sql(prompt, schema_context or None, cache=False)
         # Learn from previous attempts
         return f"SELECT * FROM users WHERE {description} -- refined query"
     
     async def _execute_query(self, sql: str) -> Any:
-        """Execute the SQL query."""
-        # This would connect to actual database
-        return {"rows": [{"id": 1, "name": "John"}]}
+        """Execute the SQL query on the pooled connection to schema.database_url, reusing cached results."""
+        cached = self.result_cache.get(sql)
+        if cached is not None:
+            self.logger.info("Query result served from cache")
+            return cached
+        # Block expensive plans, or cap large results with a LIMIT, before anything runs
+        estimate = await self.query_guard.guard(sql)
+        start = time.perf_counter()
+        result = await self.query_executor.execute_columnar(estimate.sql)
+        self.result_cache.put(sql, result, cost=time.perf_counter() - start)
+        return result
     
-    async def _format_results(self, results: Any) -> Dict[str, Any]:
+    async def _format_results(self, results: ColumnarResult) -> Dict[str, Any]:
         """Format results for user consumption."""
+        summary = f"Found {results.row_count} records" + (" (truncated)" if results.truncated else "")
         return {
-            "data": results,
-            "summary": f"Found {len(results.get('rows', []))} records",
+            "data": results.to_dict(),
+            "summary": summary,
+            "column_summaries": results.summarize(),
             "formatted_at": datetime.now().isoformat()
         }
     
@@ -215,15 +374,17 @@ class TrueDatabaseAgent:
     
     def _extract_keywords(self, text: str) -> List[str]:
         """Extract keywords from text."""
-        # Simple keyword extraction - in practice, use NLP
-        return [word.lower() for word in text.split() if len(word) > 3]
+        # Same normalization the memory index uses for lookups
+        return extract_keywords(text)
     
-    def _learn_from_interaction(self, user_input: str, result: Dict[str, Any]):
+    def _learn_from_interaction(self, user_input: str, result: Any, memory: Optional[AgentMemory] = None):
         """Learn from the interaction to improve future responses."""
-        if result.get("error"):
-            self.memory.learned_patterns[f"error_{user_input[:20]}"] = result["error"]
+        memory = memory if memory is not None else self.memory
+        # A plan ending in execute_query returns a ColumnarResult; only dicts carry errors
+        if isinstance(result, dict) and result.get("error"):
+            memory.remember_pattern(f"error_{user_input[:20]}", result["error"])
         else:
-            self.memory.learned_patterns[f"success_{user_input[:20]}"] = "successful"
+            memory.remember_pattern(f"success_{user_input[:20]}", "successful")
     
     async def ask_clarifying_question(self, ambiguous_request: str) -> str:
         """Ask clarifying questions when request is ambiguous."""
@@ -234,7 +395,24 @@ class TrueDatabaseAgent:
         return {
             "state": self.state.value,
             "current_goal": self.current_goal.description if self.current_goal else None,
+            "last_trace": self.current_goal.trace if self.current_goal else [],
             "memory_size": len(self.memory.conversation_history),
             "learned_patterns": len(self.memory.learned_patterns),
-            "available_tools": list(self.available_tools.keys())
-        } 
\ No newline at end of file
+            "available_tools": list(self.available_tools.keys()),
+            "query_executor": self.query_executor.get_stats(),
+            "result_cache": self.result_cache.get_stats(),
+            "query_guard": self.query_guard.get_stats(),
+            "sql_validation": dict(self._validation_stats),
+            "planner": self.planner.get_stats(),
+            "memory": self.memory_store.get_stats()
+        }
+    
+    async def close(self):
+        """Release database connections and write out pending memory and plans."""
+        await self.query_executor.close()
+        self.planner.close()
+        # A shared store outlives this agent; only flush it
+        if self._owns_memory_store:
+            self.memory_store.close()
+        else:
+            self.memory_store.flush() 
\ No newline at end of file
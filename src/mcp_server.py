@@ -1,9 +1,15 @@
 import asyncio
+import json
 import logging
-from typing import Dict, Any
-from fastapi import FastAPI, HTTPException
+from typing import Dict, Any, List, Optional, Union
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 from pydantic import BaseModel
 from src.database_agent.agent import DatabaseAgent
+from src.database_agent import result_stream
+from src.database_agent.query_executor import QueryExecutionError, ReadOnlyViolationError
+from src.database_agent.query_guard import QueryBlockedError
 from src.utils.config_loader import ConfigLoader
 from src.utils.logger import setup_logger
 
@@ -17,10 +23,44 @@ class SQLQueryResponse(BaseModel):
     prompt: str
     timestamp: str
     error: str = None
+    estimate: Dict[str, Any] = None
+
+class StreamSQLQueryRequest(BaseModel):
+    prompt: str
+    progress_token: Optional[Union[str, int]] = None
+
+class BatchSQLQueryRequest(BaseModel):
+    prompts: List[str]
+    max_concurrency: Optional[int] = None
+
+class BatchSQLQueryResponse(BaseModel):
+    results: List[Dict[str, Any]]
+    total: int
+    succeeded: int
+    failed: int
+
+class ExecuteRequest(BaseModel):
+    sql: str
+    format: str = "json"  # json or arrow
+    max_rows: Optional[int] = None
+    summarize: bool = True
+
+class ExecuteStreamRequest(BaseModel):
+    sql: str
+    format: str = "ndjson"  # ndjson or arrow
+    batch_size: Optional[int] = None
+    max_rows: Optional[int] = None
+    sample: Optional[int] = None
 
 class HealthResponse(BaseModel):
     status: str
     llm_status: Dict[str, Any]
+    cache: Dict[str, Any] = None
+    coalescing: Dict[str, Any] = None
+    execution: Dict[str, Any] = None
+    guard: Dict[str, Any] = None
+    prompt: Dict[str, Any] = None
+    examples: Dict[str, Any] = None
     timestamp: str
     version: str
 
@@ -68,6 +108,86 @@ class DatabaseAgentMCPServer:
                 self.logger.error(f"Error generating SQL: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
         
+        @self.app.post("/generate-sql/stream")
+        async def stream_sql_query(request: StreamSQLQueryRequest, http_request: Request):
+            """Stream SQL generation as server-sent events."""
+            return StreamingResponse(
+                self._sse_events(request, http_request),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
+        @self.app.post("/generate-sql/batch", response_model=BatchSQLQueryResponse)
+        async def generate_sql_queries(request: BatchSQLQueryRequest):
+            """Generate SQL queries for a batch of prompts."""
+            max_prompts = self.config.get("batch", {}).get("max_prompts", 1000)
+            if not request.prompts:
+                raise HTTPException(status_code=400, detail="No prompts provided")
+            if len(request.prompts) > max_prompts:
+                raise HTTPException(status_code=400, detail=f"Batch exceeds {max_prompts} prompts")
+            try:
+                results = await self.agent.generate_sql_queries(request.prompts, request.max_concurrency)
+                failed = sum(1 for result in results if result.get("error"))
+                return BatchSQLQueryResponse(
+                    results=results,
+                    total=len(results),
+                    succeeded=len(results) - failed,
+                    failed=failed
+                )
+            except Exception as e:
+                self.logger.error(f"Error generating SQL batch: {e}")
+                raise HTTPException(status_code=500, detail=str(e))
+        
+        @self.app.post("/execute")
+        async def execute_query(request: ExecuteRequest):
+            """Execute SQL and return the result column by column, as JSON or an Arrow IPC stream."""
+            if request.format not in ("json", "arrow"):
+                raise HTTPException(status_code=400, detail="format must be 'json' or 'arrow'")
+            if request.format == "arrow" and result_stream.pa is None:
+                raise HTTPException(status_code=400, detail="Arrow output requires pyarrow on the server")
+            try:
+                result = await self.agent.execute_query(request.sql, max_rows=request.max_rows)
+            except ReadOnlyViolationError as e:
+                raise HTTPException(status_code=403, detail=str(e))
+            except QueryBlockedError as e:
+                raise HTTPException(status_code=422, detail={"error": str(e), "estimate": e.estimate.to_dict()})
+            except QueryExecutionError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if request.format == "arrow":
+                return StreamingResponse(
+                    iterate_in_threadpool(result_stream.arrow_result_chunks(result)),
+                    media_type=result_stream.ARROW_STREAM_MEDIA_TYPE
+                )
+            response = result.to_dict()
+            if request.summarize:
+                response["summary"] = result.summarize()
+            return response
+        
+        @self.app.post("/execute/stream")
+        async def stream_query_results(request: ExecuteStreamRequest, http_request: Request):
+            """Execute SQL and stream the rows as NDJSON or an Arrow IPC stream."""
+            if request.format not in ("ndjson", "arrow"):
+                raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'arrow'")
+            if request.format == "arrow" and result_stream.pa is None:
+                raise HTTPException(status_code=400, detail="Arrow output requires pyarrow on the server")
+            batches = self.agent.stream_query_results(
+                request.sql, batch_size=request.batch_size, max_rows=request.max_rows, sample=request.sample
+            )
+            # Run the statement before answering so failures get a proper status code
+            try:
+                first = await self._first_batch(batches)
+            except ReadOnlyViolationError as e:
+                raise HTTPException(status_code=403, detail=str(e))
+            except QueryBlockedError as e:
+                raise HTTPException(status_code=422, detail={"error": str(e), "estimate": e.estimate.to_dict()})
+            except QueryExecutionError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if request.format == "arrow":
+                encoder, media_type = result_stream.arrow_stream, result_stream.ARROW_STREAM_MEDIA_TYPE
+            else:
+                encoder, media_type = result_stream.ndjson_stream, result_stream.NDJSON_MEDIA_TYPE
+            return StreamingResponse(encoder(self._result_batches(first, batches, http_request)), media_type=media_type)
+        
         @self.app.get("/tools")
         async def get_tools():
             """Get available MCP tools."""
@@ -77,6 +197,56 @@ class DatabaseAgentMCPServer:
                 self.logger.error(f"Error getting tools: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
     
+    async def _sse_events(self, request: StreamSQLQueryRequest, http_request: Request):
+        """Format agent stream events as SSE, interleaving MCP progress notifications."""
+        events = self.agent.stream_sql_query(request.prompt)
+        try:
+            async for event in events:
+                if await http_request.is_disconnected():
+                    self.logger.info("Client disconnected, cancelling SQL stream")
+                    break
+                yield self._format_sse(event["event"], event["data"])
+                if request.progress_token is not None and event["event"] == "token":
+                    yield self._format_sse("progress", {
+                        "jsonrpc": "2.0",
+                        "method": "notifications/progress",
+                        "params": {
+                            "progressToken": request.progress_token,
+                            "progress": event["data"]["index"] + 1
+                        }
+                    })
+        finally:
+            await events.aclose()
+    
+    async def _first_batch(self, batches):
+        """First batch of a result stream, or None if it is empty; the stream is closed if fetching it fails."""
+        try:
+            return await batches.__anext__()
+        except StopAsyncIteration:
+            return None
+        except BaseException:
+            # Nothing will read the stream now, so release its pooled connection instead of leaving it to the GC
+            await batches.aclose()
+            raise
+    
+    async def _result_batches(self, first, batches, http_request: Request):
+        """Relay result batches to the encoder; the next batch is fetched only once the client takes this one."""
+        try:
+            if first is None:
+                return
+            yield first
+            async for batch in batches:
+                if await http_request.is_disconnected():
+                    self.logger.info("Client disconnected, cancelling result stream")
+                    break
+                yield batch
+        finally:
+            await batches.aclose()
+    
+    @staticmethod
+    def _format_sse(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
     async def start(self, host: str = None, port: int = None):
         """Start the MCP server."""
         host = host or self.config.get("server", {}).get("host", "localhost")
@@ -92,12 +262,16 @@ class DatabaseAgentMCPServer:
             log_level=self.config.get("logging", {}).get("level", "info").lower()
         )
         server = uvicorn.Server(config)
-        await server.serve()
+        await self.agent.startup()
+        try:
+            await server.serve()
+        finally:
+            await self.stop()
     
     async def stop(self):
         """Stop the MCP server."""
         self.logger.info("Stopping MCP server")
-        # Add any cleanup logic here
+        await self.agent.shutdown()
 
 def main():
     """Main entry point."""
@@ -0,0 +1,88 @@
+import sqlite3
+import pytest
+from unittest.mock import AsyncMock, Mock
+from src.database_agent.agent_memory import AgentMemory, MemoryStore, extract_keywords
+
+def test_extract_keywords_normalizes_terms():
+    assert extract_keywords("Show me the Orders per customer and all orders") == ["order", "per", "customer"]
+
+def test_history_is_a_ring_buffer_and_index_follows_it():
+    memory = AgentMemory(max_interactions=3)
+    regions = ["alpine", "baltic", "coastal", "delta", "eastern"]
+    for region in regions:
+        memory.add_interaction({"type": "user_input", "content": f"revenue report {region}"})
+    assert [item["content"] for item in memory.conversation_history] == [
+        "revenue report coastal", "revenue report delta", "revenue report eastern"
+    ]
+    # Keywords of evicted interactions leave the index with them
+    assert memory.get_relevant_context("alpine baltic") == []
+    assert memory.get_stats()["indexed_keywords"] == 5
+
+def test_relevant_context_ranks_by_shared_keywords_then_recency():
+    memory = AgentMemory()
+    memory.add_interaction({"content": "total revenue by country"})
+    memory.add_interaction({"content": "list customers"})
+    memory.add_interaction({"content": "revenue last month"})
+    memory.add_interaction({"content": "customers by country"})
+    context = memory.get_relevant_context("revenue by country", limit=2)
+    assert [item["content"] for item in context] == ["total revenue by country", "customers by country"]
+    assert [item["content"] for item in memory.get_relevant_context("revenue please")] == [
+        "revenue last month", "total revenue by country"
+    ]
+
+def test_current_request_is_not_its_own_context():
+    memory = AgentMemory()
+    memory.add_interaction({"content": "orders by customer"})
+    assert memory.get_relevant_context("orders by customer") == []
+
+def test_executed_queries_are_bounded():
+    memory = AgentMemory(max_queries=2)
+    for i in range(4):
+        memory.add_executed_query({"sql": f"SELECT {i}"})
+    assert [query["sql"] for query in memory.executed_queries] == ["SELECT 2", "SELECT 3"]
+
+def test_learned_patterns_evict_least_recently_used():
+    memory = AgentMemory(max_patterns=2)
+    memory.remember_pattern("a", 1)
+    memory.remember_pattern("b", 2)
+    assert memory.get_pattern("a") == 1
+    memory.remember_pattern("c", 3)
+    assert list(memory.learned_patterns) == ["a", "c"]
+    assert memory.get_pattern("b", "missing") == "missing"
+
+def test_store_keeps_one_memory_per_user_with_lru_eviction():
+    store = MemoryStore({"memory": {"max_users": 2, "max_interactions": 10}})
+    alice = store.get("alice")
+    assert store.get("alice") is alice
+    assert store.get("bob") is not alice
+    assert store.get() is store.get("default")
+    assert "alice" not in store._memories
+    assert store.get("bob").max_interactions == 10
+    assert store.get_stats()["evicted_users"] == 1
+
+@pytest.mark.asyncio
+async def test_agents_share_per_user_memory(tmp_path):
+    from src.database_agent.true_agent import TrueDatabaseAgent
+    path = tmp_path / "memory.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (id INTEGER, name TEXT)")
+    connection.commit()
+    connection.close()
+    config = {"schema": {"database_url": f"sqlite:///{path}"}}
+    llm = Mock()
+    llm.generate_sql = AsyncMock(return_value="SELECT COUNT(*) FROM users")
+    store = MemoryStore(config)
+    first = TrueDatabaseAgent(config, llm_integration=llm, memory_store=store)
+    second = TrueDatabaseAgent(config, llm_integration=llm, memory_store=store)
+
+    await first.process_request("count users", user_id="alice")
+    await second.process_request("count users named bob", user_id="alice")
+    memory = llm.generate_sql.call_args.kwargs["memory"]
+    assert [(item["content"], item["sql"]) for item in memory] == [("count users", "SELECT COUNT(*) FROM users")]
+
+    await second.process_request("count users named bob", user_id="carol")
+    assert llm.generate_sql.call_args.kwargs["memory"] == []
+    assert len(store.get("alice").executed_queries) == 2
+    assert second.get_agent_status()["memory"]["users"] == 3
+    await first.close()
+    await second.close()
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import Mock, patch
+from src.database_agent.agent import DatabaseAgent
+
+def make_agent(chat, **batch_config):
+    config = {
+        "llm": {"provider": "openai", "model": "gpt-4", "api_key": "test-key"},
+        "batch": batch_config
+    }
+    with patch("src.database_agent.llm_integration.get_llm") as mock_get_llm:
+        mock_llm = Mock()
+        mock_llm.chat.side_effect = chat
+        mock_get_llm.return_value = mock_llm
+        return DatabaseAgent(config)
+
+def echo_chat(messages):
+    prompt = messages[-1]["content"]
+    if prompt == "broken":
+        raise Exception("LLM Error")
+    return f"SELECT '{prompt}';"
+
+@pytest.mark.asyncio
+async def test_batch_results_keep_input_order_and_errors():
+    agent = make_agent(echo_chat)
+    results = await agent.generate_sql_queries(["first", "broken", "third"])
+    assert [r["prompt"] for r in results] == ["first", "broken", "third"]
+    assert results[0]["sql_query"] == "SELECT 'first';"
+    assert results[1]["error"] == "LLM Error"
+    assert results[2]["sql_query"] == "SELECT 'third';"
+
+@pytest.mark.asyncio
+async def test_batch_concurrency_is_bounded():
+    active = 0
+    peak = 0
+
+    async def fake_generate(prompt, schema_context=None):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return {"sql_query": "SELECT 1;", "prompt": prompt}
+
+    agent = make_agent(echo_chat, max_concurrency=3)
+    agent.query_tool.generate_query = fake_generate
+    await agent.generate_sql_queries([f"prompt {i}" for i in range(12)])
+    assert peak == 3
+
+@pytest.mark.asyncio
+async def test_short_prompts_are_packed_into_one_request():
+    def packed_chat(messages):
+        return json.dumps(["SELECT * FROM users;", "SELECT * FROM orders;"])
+
+    agent = make_agent(packed_chat, pack_size=4)
+    results = await agent.generate_sql_queries(["all users", "all orders", "all users"])
+    assert agent.llm_integration.llm.chat.call_count == 1
+    assert [r["sql_query"] for r in results] == ["SELECT * FROM users;", "SELECT * FROM orders;", "SELECT * FROM users;"]
+
+@pytest.mark.asyncio
+async def test_packing_failure_falls_back_to_individual_requests():
+    def chat(messages):
+        prompt = messages[-1]["content"]
+        if "JSON array" in prompt:
+            return "not json"
+        return echo_chat(messages)
+
+    agent = make_agent(chat, pack_size=4)
+    results = await agent.generate_sql_queries(["all users", "all orders"])
+    assert [r["sql_query"] for r in results] == ["SELECT 'all users';", "SELECT 'all orders';"]
+    assert agent.llm_integration.llm.chat.call_count == 3
+
+@pytest.mark.asyncio
+async def test_packed_requests_carry_each_prompts_schema_context():
+    def packed_chat(messages):
+        return json.dumps(["SELECT * FROM users;", "SELECT * FROM orders;"])
+
+    async def schema_context(prompt):
+        table = prompt.split()[-1]
+        return {"tables": [{"name": table, "columns": ["id", f"{table}_name"]}]}
+
+    agent = make_agent(packed_chat, pack_size=4)
+    agent.schema_manager.get_schema_context = schema_context
+    await agent.generate_sql_queries(["all users", "all orders"])
+    packed = agent.llm_integration.llm.chat.call_args.args[0][-1]["content"]
+    first, second = packed.split("### Request 2")
+    assert "users(id, users_name)" in first and "Request: all users" in first
+    assert "orders(id, orders_name)" in second and "Request: all orders" in second
+    assert agent.llm_integration.llm.chat.call_count == 1
@@ -0,0 +1,158 @@
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+from src.database_agent.cache import SQLCache, normalize_prompt
+from src.database_agent.agent import DatabaseAgent
+from src.database_agent.schema_manager import SchemaDiff
+
+@pytest.fixture
+def cache_config(tmp_path):
+    return {
+        "llm": {"provider": "openai", "model": "gpt-4"},
+        "cache": {"memory_size": 2, "persistent_path": str(tmp_path / "sql_cache.db"), "ttl": 60, "max_entries": 10}
+    }
+
+def test_normalize_prompt():
+    assert normalize_prompt("  Show me   all USERS? ") == "show me all users"
+    assert normalize_prompt("Please show me all users.") == "show me all users"
+    assert normalize_prompt("Could you show me all users please") == "show me all users"
+
+def test_memory_hit_after_put(cache_config):
+    cache = SQLCache(cache_config)
+    assert cache.get("Show me all users") is None
+    cache.put("Show me all users", "SELECT * FROM users;", latency=1.5)
+    assert cache.get("show me all users.") == "SELECT * FROM users;"
+    stats = cache.get_stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["latency_saved_seconds"] == 1.5
+
+def test_lru_evicts_least_recently_used(cache_config):
+    cache_config["cache"].pop("persistent_path")
+    cache = SQLCache(cache_config)
+    cache.put("a", "SELECT 1;")
+    cache.put("b", "SELECT 2;")
+    cache.get("a")
+    cache.put("c", "SELECT 3;")
+    assert cache.get("b") is None
+    assert cache.get("a") == "SELECT 1;"
+
+def test_persistent_tier_survives_restart(cache_config):
+    cache = SQLCache(cache_config)
+    cache.put("Show me all users", "SELECT * FROM users;")
+    cache.close()
+    restarted = SQLCache(cache_config)
+    assert restarted.get("Show me all users") == "SELECT * FROM users;"
+    assert restarted.get_stats()["persistent_hits"] == 1
+
+def test_ttl_expiry(cache_config):
+    cache = SQLCache(cache_config)
+    with patch("src.database_agent.cache.time.time", return_value=1000.0):
+        cache.put("Show me all users", "SELECT * FROM users;")
+    with patch("src.database_agent.cache.time.time", return_value=1061.0):
+        assert cache.get("Show me all users") is None
+
+def test_persistent_size_bound(cache_config):
+    cache = SQLCache(cache_config)
+    for i in range(25):
+        cache.put(f"prompt {i}", f"SELECT {i};")
+    cache.flush()
+    assert cache.get_stats()["persistent_entries"] <= 10
+
+def test_replacing_an_entry_does_not_count_as_a_new_one(cache_config):
+    cache = SQLCache(cache_config)
+    for i in range(10):
+        cache.put(f"prompt {i}", f"SELECT {i};")
+    for attempt in range(20):
+        cache.put("prompt 0", f"SELECT {attempt};")
+    cache.flush()
+    assert cache.get_stats()["persistent_entries"] == 10
+    cache.close()
+    # Nothing was evicted early
+    restarted = SQLCache(cache_config)
+    assert restarted.get("prompt 1") == "SELECT 1;"
+    assert restarted.get("prompt 0") == "SELECT 19;"
+
+@pytest.mark.asyncio
+async def test_store_io_stays_off_the_caller(cache_config):
+    import threading
+    cache = SQLCache(cache_config)
+    release = threading.Event()
+    cache._io.submit(release.wait, 5)
+    # put() only queues the write, and the in-process tier answers straight away
+    cache.put("Show me all users", "SELECT * FROM users;")
+    assert await cache.get_async("show me all users") == "SELECT * FROM users;"
+    lookup = asyncio.ensure_future(cache.get_async("all orders"))
+    await asyncio.sleep(0.05)
+    assert not lookup.done()
+    release.set()
+    assert await lookup is None
+    cache.close()
+    assert SQLCache(cache_config).get("Show me all users") == "SELECT * FROM users;"
+
+def test_schema_change_invalidates_entries(cache_config):
+    cache = SQLCache(cache_config)
+    cache.invalidate("v1")
+    cache.put("Show me all users", "SELECT * FROM users;")
+    cache.invalidate("v2")
+    assert cache.get("Show me all users") is None
+    cache.flush()
+    assert cache.get_stats()["persistent_entries"] == 0
+
+@pytest.mark.asyncio
+async def test_agent_serves_repeated_prompt_from_cache():
+    config = {"llm": {"provider": "openai", "model": "gpt-4", "api_key": "test-key"}}
+    with patch("src.database_agent.llm_integration.get_llm") as mock_get_llm:
+        mock_llm = Mock()
+        mock_llm.chat.return_value = "SELECT * FROM users;"
+        mock_get_llm.return_value = mock_llm
+        agent = DatabaseAgent(config)
+
+    await agent.generate_sql_query("Show me all users")
+    result = await agent.generate_sql_query("show me all users")
+    assert result["sql_query"] == "SELECT * FROM users;"
+    assert mock_llm.chat.call_count == 1
+
+    health = await agent.health_check()
+    assert health["cache"]["hits"] == 1
+
+    # Uncached generation neither reads nor fills the cache
+    calls = mock_llm.chat.call_count
+    assert await agent.llm_integration.generate_sql("show me all users", cache=False) == "SELECT * FROM users;"
+    await agent.llm_integration.generate_sql("show me all orders", cache=False)
+    assert mock_llm.chat.call_count == calls + 2
+    assert not agent.llm_integration.cache.contains("show me all orders")
+
+def test_schema_diff_only_drops_entries_touching_affected_tables(cache_config):
+    cache = SQLCache(cache_config)
+    cache.invalidate("v1")
+    cache.put("all users", "SELECT * FROM users;")
+    cache.put("all orders", "SELECT o.* FROM orders o JOIN users u ON u.id = o.user_id;")
+    cache.put("all products", "SELECT * FROM products;")
+    cache.apply_schema_diff(SchemaDiff(version="v2", previous_version="v1", changed={"orders"}))
+    assert cache.get("all users") == "SELECT * FROM users;"
+    assert cache.get("all orders") is None
+    cache.close()
+    restarted = SQLCache(cache_config)
+    restarted.schema_version = "v2"
+    assert restarted.get("all products") == "SELECT * FROM products;"
+    assert restarted.get("all orders") is None
+
+@pytest.mark.asyncio
+async def test_sql_rejected_by_validation_is_not_served_from_cache(cache_config):
+    from src.database_agent.schema_model import SchemaModel
+    with patch("src.database_agent.llm_integration.get_llm") as mock_get_llm:
+        mock_llm = Mock(spec=["chat"])
+        mock_llm.chat.side_effect = ["SELECT emial FROM users", "SELECT email FROM users"]
+        mock_get_llm.return_value = mock_llm
+        agent = DatabaseAgent(cache_config)
+    agent.schema_manager.schema_model = SchemaModel.from_dicts([{"name": "users", "columns": ["id", "email"]}], [])
+    assert (await agent.generate_sql_query("user emails"))["sql_query"] == "SELECT emial FROM users"
+    assert (await agent.generate_sql_query("user emails"))["sql_query"] == "SELECT email FROM users"
+    assert mock_llm.chat.call_count == 2
+    cache = agent.llm_integration.cache
+    cache.close()
+    restarted = SQLCache(cache_config)
+    restarted.schema_version = cache.schema_version
+    assert restarted.get("user emails") == "SELECT email FROM users"
@@ -0,0 +1,60 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import Mock, patch
+from src.database_agent.agent import DatabaseAgent
+from src.database_agent.coalescing import SingleFlight
+
+@pytest.fixture
+def slow_agent():
+    config = {"llm": {"provider": "openai", "model": "gpt-4", "api_key": "test-key"}, "cache": {"enabled": False}}
+    with patch("src.database_agent.llm_integration.get_llm") as mock_get_llm:
+        mock_llm = Mock()
+        mock_llm.chat.side_effect = lambda messages: time.sleep(0.05) or "SELECT * FROM users;"
+        mock_get_llm.return_value = mock_llm
+        return DatabaseAgent(config)
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_prompts_share_one_llm_call(slow_agent):
+    prompts = ["Show me all users"] * 10 + ["show me all users?"] * 5
+    results = await asyncio.gather(*(slow_agent.generate_sql_query(p) for p in prompts))
+    assert slow_agent.llm_integration.llm.chat.call_count == 1
+    assert all(r["sql_query"] == "SELECT * FROM users;" for r in results)
+    assert results[-1]["prompt"] == "show me all users?"
+    stats = slow_agent.single_flight.get_stats()
+    assert stats == {"calls": 15, "executions": 1, "coalesced": 14, "in_flight": 0, "coalesced_ratio": 0.9333}
+
+@pytest.mark.asyncio
+async def test_distinct_prompts_are_not_coalesced(slow_agent):
+    await asyncio.gather(slow_agent.generate_sql_query("Show me all users"),
+                         slow_agent.generate_sql_query("Show me all orders"))
+    assert slow_agent.llm_integration.llm.chat.call_count == 2
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+    started = asyncio.Event()
+
+    async def work():
+        started.set()
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.ensure_future(flight.do("key", work))
+    await started.wait()
+    second = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "done"
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.get_stats()["executions"] == 1
@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+from src.database_agent.columnar import ColumnarResult
+
+ROWS = [
+    (1, "paid", 10.5, True),
+    (2, "paid", None, False),
+    (3, None, 7.0, True),
+    (4, "open", 2, None),
+]
+
+def make_result():
+    return ColumnarResult.from_rows(["id", "status", "total", "flag"], ROWS)
+
+def test_from_rows_types_and_nulls():
+    result = make_result()
+    assert result.row_count == 4
+    assert [array.dtype.kind for array in result.arrays] == ["i", "O", "f", "b"]
+    assert result.masks[0] is None
+    assert result.masks[2].tolist() == [False, True, False, False]
+    assert result.to_rows() == ROWS
+    assert result.column("status") == ["paid", "paid", None, "open"]
+    assert result.to_dict()["data"]["total"] == [10.5, None, 7.0, 2.0]
+
+def test_empty_and_mixed_columns():
+    result = ColumnarResult.from_rows(["a"], [])
+    assert result.row_count == 0 and result.to_dicts() == []
+    assert result.summarize()["a"]["distinct"] == 0
+    mixed = ColumnarResult.from_rows(["v"], [(1,), ("x",), (1,)])
+    summary = mixed.summarize()["v"]
+    assert summary["distinct"] == 2 and summary["top"][0] == {"value": 1, "count": 2}
+
+def test_summarize():
+    summary = make_result().summarize(top_k=1)
+    assert summary["id"]["min"] == 1 and summary["id"]["max"] == 4 and summary["id"]["mean"] == 2.5
+    assert summary["status"]["nulls"] == 1 and summary["status"]["null_ratio"] == 0.25
+    assert summary["status"]["distinct"] == 2
+    assert summary["status"]["top"] == [{"value": "paid", "count": 2}]
+    assert summary["status"]["min"] == "open" and summary["status"]["max"] == "paid"
+    assert summary["total"]["mean"] == pytest.approx((10.5 + 7.0 + 2) / 3, abs=1e-6)
+
+def test_to_arrow_shares_numeric_buffers():
+    pytest.importorskip("pyarrow")
+    result = make_result()
+    table = result.to_arrow()
+    assert table.column("total").null_count == 1
+    assert table.column("status").to_pylist() == ["paid", "paid", None, "open"]
+    ids = table.column("id").chunk(0)
+    assert ids.buffers()[1].address == result.arrays[0].ctypes.data
+    back = ColumnarResult.from_arrow(table)
+    assert back.to_rows() == result.to_rows()
+
+@pytest.mark.asyncio
+async def test_duckdb_execute_columnar(tmp_path):
+    duckdb = pytest.importorskip("duckdb")
+    from src.database_agent.query_executor import QueryExecutor
+    path = tmp_path / "columnar.duckdb"
+    connection = duckdb.connect(str(path))
+    connection.execute("CREATE TABLE t AS SELECT range AS i, range % 3 AS g FROM range(100)")
+    connection.close()
+    executor = QueryExecutor({"schema": {"database_url": f"duckdb:///{path}"}, "execution": {"max_rows": 40}})
+    result = await executor.execute_columnar("SELECT i, g FROM t ORDER BY i")
+    assert result.row_count == 40 and result.truncated
+    assert isinstance(result.arrays[0], np.ndarray)
+    assert result.summarize()["g"]["distinct"] == 3
+    await executor.close()
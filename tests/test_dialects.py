@@ -0,0 +1,87 @@
+import sqlite3
+import pytest
+from unittest.mock import Mock, patch
+from src.database_agent.cache import SQLCache
+from src.database_agent.dialects import detect_dialect, sql_system_prompt, transpile_sql
+from src.database_agent.llm_integration import LLMIntegration
+
+pytest.importorskip("sqlglot")
+
+def test_detects_dialect_from_database_url():
+    assert detect_dialect({"schema": {"database_url": "sqlite:///data/app.db"}}) == "sqlite"
+    assert detect_dialect({"schema": {"database_url": "postgresql+psycopg2://user@host/db"}}) == "postgres"
+    assert detect_dialect({"schema": {"database_url": "mariadb://user@host/db"}}) == "mysql"
+    assert detect_dialect({"schema": {"database_url": "duckdb:///:memory:"}}) == "duckdb"
+    assert detect_dialect({"schema": {"database_url": "unknown://host"}}) is None
+    assert detect_dialect({}) is None
+
+def test_explicit_dialect_overrides_url():
+    config = {"schema": {"database_url": "sqlite:///app.db", "dialect": "PostgreSQL"}}
+    assert detect_dialect(config) == "postgres"
+
+def test_system_prompt_uses_target_idioms():
+    sqlite_prompt = sql_system_prompt("sqlite")
+    assert "SQLite" in sqlite_prompt
+    assert "DATE('now', '-1 month')" in sqlite_prompt
+    assert "DATE_SUB" not in sqlite_prompt.replace("there is no NOW(), DATE_SUB or INTERVAL", "")
+    assert "INTERVAL '1 month'" in sql_system_prompt("postgres")
+    assert "standard SQL" in sql_system_prompt(None)
+
+def test_rewrites_mysql_date_arithmetic_for_sqlite():
+    sql = transpile_sql("SELECT * FROM orders WHERE order_date >= DATE_SUB(NOW(), INTERVAL 1 MONTH);", "sqlite")
+    assert sql == "SELECT * FROM orders WHERE order_date >= DATETIME('now', '-1 months');"
+    sql = transpile_sql("SELECT id FROM orders WHERE created < DATE_ADD(CURDATE(), INTERVAL 2 WEEK)", "sqlite")
+    assert sql == "SELECT id FROM orders WHERE created < DATE('now', '+14 days')"
+    sql = transpile_sql("SELECT * FROM orders WHERE order_date >= NOW() - INTERVAL '3 days'", "sqlite")
+    assert "DATETIME('now', '-3 days')" in sql
+
+def test_sqlite_rewrites_execute():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE orders (id INTEGER, order_date TEXT)")
+    connection.execute("INSERT INTO orders VALUES (1, '2024-03-05'), (2, DATE('now'))")
+    for sql in [
+        "SELECT id FROM orders WHERE order_date >= DATE_SUB(NOW(), INTERVAL 1 MONTH)",
+        "SELECT id FROM orders WHERE YEAR(order_date) = 2024 AND MONTH(order_date) = 3",
+        "SELECT id FROM orders WHERE order_date > CURRENT_DATE - INTERVAL 7 DAY"
+    ]:
+        connection.execute(transpile_sql(sql, "sqlite")).fetchall()
+    rows = connection.execute(transpile_sql("SELECT id FROM orders WHERE YEAR(order_date) = 2024", "sqlite")).fetchall()
+    assert rows == [(1,)]
+
+def test_rewrites_mysql_idioms_for_postgres():
+    sql = transpile_sql("SELECT * FROM orders WHERE order_date >= DATE_SUB(NOW(), INTERVAL 1 MONTH)", "postgres")
+    assert "DATE_SUB" not in sql and "INTERVAL '1 MONTH'" in sql
+    sql = transpile_sql("SELECT IFNULL(name, ''), `email` FROM users WHERE YEAR(created_at) = 2024", "postgres")
+    assert sql == "SELECT COALESCE(name, ''), \"email\" FROM users WHERE EXTRACT(YEAR FROM created_at) = 2024"
+
+def test_sql_already_in_dialect_is_returned_unchanged():
+    for sql, dialect in [
+        ("select u.name, count(*) from users u join orders o on u.id = o.user_id group by 1", "sqlite"),
+        ("SELECT * FROM orders WHERE order_date >= NOW() - INTERVAL '1 month'", "postgres"),
+        ("SELECT YEAR(created_at), CONCAT(name, email) FROM `users` WHERE id = 1", "mysql")
+    ]:
+        assert transpile_sql(sql, dialect) == sql
+
+def test_unparseable_or_untargeted_sql_is_returned_unchanged():
+    assert transpile_sql("this is not sql (", "sqlite") == "this is not sql ("
+    assert transpile_sql("SELECT DATE_SUB(NOW(), INTERVAL 1 DAY)", None) == "SELECT DATE_SUB(NOW(), INTERVAL 1 DAY)"
+
+def make_integration(llm, database_url):
+    config = {"llm": {"provider": "openai", "model": "gpt-4"}, "schema": {"database_url": database_url}}
+    with patch("src.database_agent.llm_integration.get_llm", return_value=llm):
+        return LLMIntegration(config)
+
+@pytest.mark.asyncio
+async def test_generated_sql_is_transpiled_and_cached_per_dialect():
+    llm = Mock()
+    llm.chat = Mock(return_value="SELECT * FROM orders WHERE order_date >= DATE_SUB(NOW(), INTERVAL 1 MONTH);")
+    integration = make_integration(llm, "sqlite:///app.db")
+    assert "SQLite" in integration._build_messages("orders from last month")[0]["content"]
+    sql = await integration.generate_sql("orders from last month")
+    assert sql == "SELECT * FROM orders WHERE order_date >= DATETIME('now', '-1 months');"
+    assert await integration.generate_sql("orders from last month") == sql
+    assert llm.chat.call_count == 1
+
+    sqlite_cache = SQLCache({"schema": {"database_url": "sqlite:///app.db"}})
+    postgres_cache = SQLCache({"schema": {"database_url": "postgresql://host/db"}})
+    assert sqlite_cache.make_key("orders") != postgres_cache.make_key("orders")
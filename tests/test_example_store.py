@@ -0,0 +1,122 @@
+import threading
+import time
+import pytest
+from unittest.mock import Mock, patch
+from src.database_agent.example_store import ExampleStore, embed
+from src.database_agent.llm_integration import LLMIntegration
+
+PAIRS = [
+    ("total revenue per month", "SELECT strftime('%m', paid_at), SUM(amount) FROM payments GROUP BY 1"),
+    ("number of customers by country", "SELECT country, COUNT(*) FROM customers GROUP BY country"),
+    ("top 10 products by sales", "SELECT product_id, SUM(quantity) FROM order_items GROUP BY 1 ORDER BY 2 DESC LIMIT 10"),
+    ("orders placed last week", "SELECT * FROM orders WHERE placed_at >= DATE('now', '-7 days')")
+]
+
+@pytest.fixture
+def store():
+    store = ExampleStore({})
+    for prompt, sql in PAIRS:
+        store.add(prompt, sql)
+    return store
+
+def test_embedding_is_deterministic_and_normalized():
+    vector = embed("Customers by country", 256)
+    assert vector.shape == (256,)
+    assert abs(float((vector ** 2).sum()) - 1.0) < 1e-5
+    assert (vector == embed("customers by country", 256)).all()
+
+def test_retrieves_most_similar_examples_first(store):
+    results = store.search("how many customers in each country", k=2)
+    assert results[0]["prompt"] == "number of customers by country"
+    assert results[0]["sql"] == PAIRS[1][1]
+    assert len(results) <= 2
+    assert all(a["score"] >= b["score"] for a, b in zip(results, results[1:]))
+    assert store.search("orders from the last week")[0]["prompt"] == "orders placed last week"
+
+def test_unrelated_requests_get_no_examples(store):
+    assert store.search("delete everything") == []
+
+def test_repeated_prompt_keeps_latest_sql(store):
+    assert store.add("Number of customers by country?", "SELECT country, COUNT(id) FROM customers GROUP BY 1")
+    assert len(store) == len(PAIRS)
+    assert store.search("customers by country", k=1)[0]["sql"] == "SELECT country, COUNT(id) FROM customers GROUP BY 1"
+    assert not store.add("number of customers by country", "SELECT country, COUNT(id) FROM customers GROUP BY 1")
+
+def test_store_is_bounded():
+    store = ExampleStore({"examples": {"max_examples": 2}})
+    assert store.add("a first prompt", "SELECT 1")
+    assert store.add("a second prompt", "SELECT 2")
+    assert not store.add("a third prompt", "SELECT 3")
+    assert len(store) == 2
+
+def test_grows_past_initial_capacity():
+    store = ExampleStore({})
+    for i in range(200):
+        store.add(f"report number {i} for region {i % 7}", f"SELECT {i}")
+    assert len(store) == 200
+    assert store.search("report number 150 for region 3", k=1)[0]["sql"] == "SELECT 150"
+
+def test_persists_to_disk(tmp_path):
+    path = str(tmp_path / "examples.npz")
+    store = ExampleStore({"examples": {"path": path, "save_every": 3}})
+    for prompt, sql in PAIRS:
+        store.add(prompt, sql)
+    # Saved in the background after the third addition; the fourth is written on close
+    store.flush()
+    assert len(ExampleStore({"examples": {"path": path}})) == 3
+    store.close()
+    reloaded = ExampleStore({"examples": {"path": path}})
+    assert len(reloaded) == len(PAIRS)
+    assert reloaded.search("customers in each country", k=1)[0]["sql"] == PAIRS[1][1]
+
+def test_adding_does_not_wait_for_the_disk(tmp_path):
+    path = str(tmp_path / "examples.npz")
+    store = ExampleStore({"examples": {"path": path, "save_every": 1}})
+    release = threading.Event()
+    save = store.save
+    store.save = lambda: release.wait(5) and save()
+    start = time.monotonic()
+    for prompt, sql in PAIRS:
+        assert store.add(prompt, sql)
+    assert time.monotonic() - start < 1
+    release.set()
+    store.close()
+    assert len(ExampleStore({"examples": {"path": path}})) == len(PAIRS)
+
+def test_ignores_store_built_with_other_dimensions(tmp_path):
+    path = str(tmp_path / "examples.npz")
+    store = ExampleStore({"examples": {"path": path}})
+    store.add("total revenue per month", "SELECT 1")
+    store.save()
+    assert len(ExampleStore({"examples": {"path": path, "dim": 128}})) == 0
+
+@pytest.mark.asyncio
+async def test_examples_are_added_to_generation_prompt():
+    llm = Mock()
+    llm.chat = Mock(return_value="SELECT 1;")
+    with patch("src.database_agent.llm_integration.get_llm", return_value=llm):
+        integration = LLMIntegration({"llm": {"provider": "openai", "model": "gpt-4"}})
+    integration.example_store.add(*PAIRS[1])
+    await integration.generate_sql("customers per country")
+    content = llm.chat.call_args[0][0][1]["content"]
+    assert f"Examples:\nQ: {PAIRS[1][0]}\nSQL: {PAIRS[1][1]}" in content
+    assert content.endswith("Request: customers per country")
+
+@pytest.mark.asyncio
+async def test_only_schema_checked_sql_becomes_an_example():
+    from src.database_agent.agent import DatabaseAgent
+    from src.database_agent.schema_model import SchemaModel
+    llm = Mock(spec=["chat"])
+    llm.chat.return_value = "SELECT country, COUNT(*) FROM customers GROUP BY country"
+    with patch("src.database_agent.llm_integration.get_llm", return_value=llm):
+        agent = DatabaseAgent({"llm": {"provider": "openai", "model": "gpt-4"}, "cache": {"enabled": False}})
+    examples = agent.llm_integration.example_store
+    # Without a schema the SQL only parsed, which says nothing about its tables and columns
+    await agent.generate_sql_query("customers by country")
+    assert len(examples) == 0
+    agent.schema_manager.schema_model = SchemaModel.from_dicts(
+        [{"name": "customers", "columns": ["id", "country"]}], []
+    )
+    await agent.generate_sql_query("customers by country")
+    assert examples.search("customers per country", k=1)[0]["sql"] == llm.chat.return_value
+    await agent.shutdown()
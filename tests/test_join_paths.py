@@ -0,0 +1,32 @@
+from src.database_agent.schema_model import SchemaModel
+from src.database_agent.join_paths import JoinPathIndex
+
+def chain(length, confidence=1.0):
+    tables = [{"name": f"t{i}", "columns": ["id"]} for i in range(length)]
+    relationships = [{"from_table": f"t{i + 1}", "to_table": f"t{i}", "from_column": f"t{i}_id",
+                      "to_column": "id", "confidence": confidence} for i in range(length - 1)]
+    return tables, relationships
+
+def test_paths_are_bounded_by_depth_and_symmetric():
+    index = JoinPathIndex(SchemaModel.from_dicts(*chain(6)), max_depth=3)
+    assert index.path("t0", "t3") == ("t0", "t1", "t2", "t3")
+    assert index.path("t3", "t0") == ("t3", "t2", "t1", "t0")
+    assert index.path("t0", "t4") is None
+    assert [rel.from_table for rel in index.relationships("t0", "t2")] == ["t1", "t2"]
+
+def test_low_confidence_shortcut_loses_to_certain_chain():
+    tables, relationships = chain(3)
+    relationships.append({"from_table": "t2", "to_table": "t0", "confidence": 0.1})
+    index = JoinPathIndex(SchemaModel.from_dicts(tables, relationships))
+    assert index.path("t0", "t2") == ("t0", "t1", "t2")
+    relationships[-1]["confidence"] = 0.9
+    assert JoinPathIndex(SchemaModel.from_dicts(tables, relationships)).path("t0", "t2") == ("t0", "t2")
+
+def test_incremental_update_matches_full_rebuild():
+    tables, relationships = chain(30)
+    previous = JoinPathIndex(SchemaModel.from_dicts(tables, relationships))
+    relationships = relationships[:5] + relationships[6:] + [{"from_table": "t7", "to_table": "t3"}]
+    model = SchemaModel.from_dicts(tables, relationships)
+    updated = JoinPathIndex(model, previous=previous)
+    assert updated.paths == JoinPathIndex(model).paths
+    assert updated.recomputed <= 11
@@ -0,0 +1,77 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import Mock, patch
+from src.database_agent.llm_integration import LLMIntegration
+
+def make_integration(llm, **llm_overrides):
+    config = {"llm": {"provider": "openai", "model": "gpt-4", "api_key": "test-key", **llm_overrides}}
+    with patch("src.database_agent.llm_integration.get_llm", return_value=llm):
+        return LLMIntegration(config)
+
+class SlowLLM:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def chat(self, messages):
+        time.sleep(self.delay)
+        return "SELECT 1;"
+
+class AsyncLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, messages):
+        raise AssertionError("sync chat should not be used")
+
+    async def achat(self, messages):
+        self.calls += 1
+        return "SELECT 2;"
+
+@pytest.mark.asyncio
+async def test_sync_chat_does_not_block_event_loop():
+    integration = make_integration(SlowLLM(0.2))
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    result, _ = await asyncio.gather(integration.generate_sql("Show me all users"), ticker())
+    assert result == "SELECT 1;"
+    assert ticks == 10
+    integration.close()
+
+@pytest.mark.asyncio
+async def test_native_async_client_is_preferred():
+    llm = AsyncLLM()
+    integration = make_integration(llm)
+    assert await integration.generate_sql("Show me all users") == "SELECT 2;"
+    assert llm.calls == 1
+    integration.close()
+
+@pytest.mark.asyncio
+async def test_mock_llm_falls_back_to_thread_pool():
+    llm = Mock()
+    llm.chat.return_value = "SELECT 3;"
+    integration = make_integration(llm)
+    assert integration._async_chat is None
+    assert await integration.generate_sql("Show me all users") == "SELECT 3;"
+    integration.close()
+
+@pytest.mark.asyncio
+async def test_request_timeout_uses_llm_timeout():
+    integration = make_integration(SlowLLM(0.5), timeout=0.05)
+    with pytest.raises(TimeoutError):
+        await integration.generate_sql("Show me all users")
+    integration.close()
+
+@pytest.mark.asyncio
+async def test_thread_pool_is_bounded_by_max_workers():
+    integration = make_integration(SlowLLM(0.1), max_workers=2)
+    start = time.perf_counter()
+    await asyncio.gather(*(integration.generate_sql(f"prompt {i}") for i in range(4)))
+    assert time.perf_counter() - start >= 0.2
+    integration.close()
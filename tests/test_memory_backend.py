@@ -0,0 +1,124 @@
+import threading
+import time
+import pytest
+from src.database_agent.agent_memory import MemoryStore
+from src.database_agent.memory_backend import MemoryBackend, MemoryWriter, SQLiteMemoryBackend, create_memory_backend
+
+def make_store(tmp_path, **overrides):
+    memory_config = {"backend": "sqlite", "path": str(tmp_path / "memory.db"), "flush_interval": 0.01}
+    memory_config.update(overrides)
+    return MemoryStore({"memory": memory_config})
+
+def test_no_backend_by_default():
+    assert create_memory_backend({}) is None
+    assert MemoryStore({}).writer is None
+    with pytest.raises(ValueError):
+        create_memory_backend({"memory": {"backend": "nosuch"}})
+
+def test_memory_survives_a_restart(tmp_path):
+    store = make_store(tmp_path)
+    memory = store.get("alice")
+    interaction = memory.add_interaction({"type": "user_input", "content": "revenue by country"})
+    memory.update_interaction(interaction, sql="SELECT country, SUM(amount) FROM orders GROUP BY country")
+    memory.add_executed_query({"sql": "SELECT 1"})
+    memory.remember_pattern("success_revenue", "successful")
+    store.get("bob").add_interaction({"content": "list customers"})
+    store.close()
+
+    reopened = make_store(tmp_path)
+    restored = reopened.get("alice")
+    assert [item["sql"] for item in restored.conversation_history] == [
+        "SELECT country, SUM(amount) FROM orders GROUP BY country"
+    ]
+    assert restored.get_relevant_context("revenue per country")[0]["content"] == "revenue by country"
+    assert [query["sql"] for query in restored.executed_queries] == ["SELECT 1"]
+    assert restored.get_pattern("success_revenue") == "successful"
+    # Loading does not write anything back
+    assert reopened.writer.get_stats()["submitted"] == 0
+    assert reopened.get_stats()["loaded_users"] == 1
+    reopened.close()
+
+def test_only_the_recent_window_is_loaded(tmp_path):
+    store = make_store(tmp_path, max_interactions=100)
+    memory = store.get("alice")
+    for i in range(100):
+        memory.add_interaction({"content": f"request {i}"})
+    store.close()
+
+    reopened = make_store(tmp_path, max_interactions=3, max_patterns=1)
+    restored = reopened.get("alice")
+    assert [item["content"] for item in restored.conversation_history] == ["request 97", "request 98", "request 99"]
+    # New entries sort after everything already stored
+    added = restored.add_interaction({"content": "request 100"})
+    assert added["_seq"] > restored.conversation_history[-2]["_seq"]
+    reopened.close()
+
+def test_evicted_user_is_reloaded_from_the_backend(tmp_path):
+    store = make_store(tmp_path, max_users=1)
+    store.get("alice").remember_pattern("favourite", "orders")
+    store.get("bob")
+    assert "alice" not in store._memories
+    assert store.get("alice").get_pattern("favourite") == "orders"
+    store.close()
+
+@pytest.mark.asyncio
+async def test_loading_serves_queued_changes_without_waiting_for_the_writer(tmp_path):
+    # The writer holds its batch open for far longer than the test takes
+    store = make_store(tmp_path, max_users=1, flush_interval=30, batch_size=10000)
+    memory = store.get("alice")
+    interaction = memory.add_interaction({"content": "orders by region"})
+    memory.update_interaction(interaction, sql="SELECT region, COUNT(*) FROM orders GROUP BY region")
+    memory.remember_pattern("favourite", "orders")
+    await store.get_async("bob")
+    assert "alice" not in store._memories
+    start = time.monotonic()
+    restored = await store.get_async("alice")
+    assert time.monotonic() - start < 1
+    assert store.writer.get_stats()["written"] == 0
+    assert [item["sql"] for item in restored.conversation_history] == [
+        "SELECT region, COUNT(*) FROM orders GROUP BY region"
+    ]
+    assert restored.get_pattern("favourite") == "orders"
+    assert await store.get_async("alice") is restored
+    store.close()
+    assert make_store(tmp_path).get("alice").get_pattern("favourite") == "orders"
+
+class RecordingBackend(MemoryBackend):
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def write_batch(self, ops):
+        self.release.wait(5)
+        self.batches.append(ops)
+
+def test_writer_batches_and_coalesces_updates():
+    backend = RecordingBackend()
+    writer = MemoryWriter(backend, batch_size=100, flush_interval=0.05)
+    for i in range(10):
+        writer.submit("interaction", "alice", 1, {"content": "same entry", "version": i})
+    writer.submit("pattern", "alice", "key", "value")
+    backend.release.set()
+    writer.flush()
+    ops = [op for batch in backend.batches for op in batch]
+    assert len(ops) == 2
+    assert '"version": 9' in next(op[3] for op in ops if op[0] == "interaction")
+    assert writer.get_stats()["written"] == 2
+    writer.close()
+
+def test_writer_drops_when_storage_falls_behind():
+    backend = RecordingBackend()
+    writer = MemoryWriter(backend, batch_size=1, flush_interval=0, max_pending=2)
+    results = [writer.submit("query", "alice", i, {}) for i in range(10)]
+    assert not all(results)
+    assert writer.get_stats()["dropped"] > 0
+    backend.release.set()
+    writer.close()
+
+def test_sqlite_backend_orders_recent_windows(tmp_path):
+    backend = SQLiteMemoryBackend(str(tmp_path / "nested" / "memory.db"))
+    backend.write_batch([("query", "alice", seq, '{"sql": "SELECT %d"}' % seq, seq) for seq in range(5)])
+    loaded = backend.load_recent("alice", 10, 2, 10)
+    assert [query["sql"] for query in loaded["queries"]] == ["SELECT 3", "SELECT 4"]
+    assert backend.load_recent("bob", 10, 10, 10) == {"interactions": [], "queries": [], "patterns": []}
+    backend.close()
@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+from src.database_agent.llm_integration import LLMIntegration
+from src.database_agent.planner import PLAN_TEMPLATES, Planner, classify, intent_signature
+
+class PlanningLLM:
+    """Returns a fixed plan after a short delay and counts the calls."""
+    def __init__(self, plan=None, error=None):
+        self.plan = plan if plan is not None else PLAN_TEMPLATES["explain"]
+        self.error = error
+        self.calls = 0
+
+    async def plan_steps(self, prompt, steps):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return self.plan
+
+def test_classifier_picks_clear_templates_only():
+    assert classify("Show me all orders")[0] == "query"
+    assert classify("explain how to get active users")[0] == "explain"
+    assert classify("run the nightly report")[0] == "direct"
+    assert classify("compare churn between plans") == (None, 0, 0)
+
+def test_signature_ignores_what_the_request_is_about():
+    assert intent_signature("compare revenue between regions") == intent_signature("Compare signups between plans")
+    assert intent_signature("revenue trend over time") != intent_signature("compare revenue between regions")
+    assert intent_signature("users") == "user"
+
+@pytest.mark.asyncio
+async def test_templates_need_no_llm():
+    llm = PlanningLLM()
+    planner = Planner({}, llm)
+    decision = await planner.plan("show me the top customers")
+    assert (decision.source, decision.steps) == ("template", PLAN_TEMPLATES["query"])
+    assert llm.calls == 0
+
+@pytest.mark.asyncio
+async def test_novel_shapes_are_planned_once_per_signature():
+    llm = PlanningLLM()
+    planner = Planner({}, llm)
+    first = await planner.plan("compare churn between plans")
+    assert (first.source, first.steps) == ("llm", llm.plan)
+    second = await planner.plan("compare revenue between regions")
+    assert (second.source, second.steps) == ("cache", llm.plan)
+    # Concurrent requests of a new shape share one LLM call
+    decisions = await asyncio.gather(*[planner.plan(f"forecast {metric}") for metric in ("sales", "churn", "costs")])
+    assert [decision.source for decision in decisions] == ["llm"] * 3
+    assert llm.calls == 2
+    stats = planner.get_stats()
+    assert (stats["llm_calls"], stats["cached_plans"], stats["requests"]) == (2, 2, 5)
+
+@pytest.mark.asyncio
+async def test_unusable_or_failed_llm_plans_fall_back_to_default():
+    for llm in (PlanningLLM(plan=["generate_sql", "drop_tables"]), PlanningLLM(error=TimeoutError("slow")), None):
+        planner = Planner({"planner": {"default_template": "query"}}, llm)
+        decision = await planner.plan("compare churn between plans")
+        assert (decision.source, decision.steps) == ("default", PLAN_TEMPLATES["query"])
+        assert planner.get_stats()["cached_plans"] == 0
+
+@pytest.mark.asyncio
+async def test_plans_missing_a_dependency_are_never_cached(tmp_path):
+    config = {"planner": {"cache_path": str(tmp_path / "plans.json")}}
+    for plan in (["generate_sql", "execute_query"], PLAN_TEMPLATES["direct"][::-1],
+                 PLAN_TEMPLATES["direct"] + ["generate_sql"]):
+        llm = PlanningLLM(plan=plan)
+        planner = Planner(config, llm)
+        decision = await planner.plan("compare churn between plans")
+        assert (decision.source, decision.steps) == ("default", PLAN_TEMPLATES["direct"])
+        assert planner.get_stats()["invalid_plans"] == 1
+        # Asked again, not served a bad plan from the cache
+        assert (await planner.plan("compare costs between teams")).source == "default"
+        assert llm.calls == 2
+    assert not (tmp_path / "plans.json").exists()
+
+@pytest.mark.asyncio
+async def test_plan_cache_persists(tmp_path):
+    config = {"planner": {"cache_path": str(tmp_path / "plans.json")}}
+    llm = PlanningLLM()
+    planner = Planner(config, llm)
+    await planner.plan("compare churn between plans")
+    planner.close()
+    reloaded = Planner(config, PlanningLLM())
+    decision = await reloaded.plan("compare costs between teams")
+    assert (decision.source, decision.steps) == ("cache", llm.plan)
+
+@pytest.mark.asyncio
+async def test_plan_cache_is_saved_off_the_request_path(tmp_path):
+    import threading
+    config = {"planner": {"cache_path": str(tmp_path / "plans.json")}}
+    planner = Planner(config, PlanningLLM())
+    release = threading.Event()
+    planner._saver.submit(release.wait, 5)
+    # Planning returns while the disk is still busy
+    assert (await planner.plan("compare churn between plans")).source == "llm"
+    assert not (tmp_path / "plans.json").exists()
+    release.set()
+    planner.flush()
+    assert (tmp_path / "plans.json").exists()
+
+@pytest.mark.asyncio
+async def test_llm_integration_plans_steps_as_json():
+    llm = Mock()
+    llm.chat = Mock(return_value='```json\n["generate_sql", "execute_query"]\n```')
+    llm.achat = None
+    config = {"llm": {"provider": "openai", "model": "gpt-4", "api_key": "test-key"}, "cache": {"enabled": False}}
+    with patch("src.database_agent.llm_integration.get_llm", return_value=llm):
+        integration = LLMIntegration(config)
+    steps = await integration.plan_steps("compare churn", {"generate_sql": "write SQL", "execute_query": "run it"})
+    assert steps == ["generate_sql", "execute_query"]
+    assert "- generate_sql: write SQL" in llm.chat.call_args.args[0][0]["content"]
+    integration.close()
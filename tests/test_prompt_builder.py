@@ -0,0 +1,87 @@
+import pytest
+from unittest.mock import Mock, patch
+from src.database_agent.llm_integration import LLMIntegration
+from src.database_agent.prompt_builder import PromptBuilder, TokenCounter
+
+def make_context(count, columns=8):
+    return {
+        "tables": [
+            {"name": f"table_{i}", "columns": [f"column_{j}" for j in range(columns)], "primary_key": "column_0",
+             "row_count": 1000 * (i + 1)}
+            for i in range(count)
+        ],
+        "relationships": [
+            {"from_table": f"table_{i}", "from_column": "column_1", "to_table": f"table_{i + 1}", "to_column": "column_0"}
+            for i in range(count - 1)
+        ]
+    }
+
+def test_system_prefix_is_byte_stable():
+    builder = PromptBuilder({"schema": {"database_url": "sqlite:///app.db"}}, "sqlite")
+    first = builder.build("all users", schema_context=make_context(2))
+    second = builder.build("orders per day", memory=[{"prompt": "all users", "sql": "SELECT * FROM users"}])
+    third = builder.build("count products")
+    assert first[0] == second[0] == third[0]
+    assert first[0]["content"].encode("utf-8") == builder.system_prompt.encode("utf-8")
+    assert "SQLite" in builder.system_prompt
+    assert first[1]["content"] != second[1]["content"]
+
+def test_plain_request_is_sent_as_is():
+    builder = PromptBuilder({})
+    assert builder.build("Show me all users")[1] == {"role": "user", "content": "Show me all users"}
+
+def test_schema_context_is_rendered_compactly():
+    builder = PromptBuilder({})
+    content = builder.build("users with orders", schema_context=make_context(2, columns=2))[1]["content"]
+    assert "Schema:\ntable_0(column_0, column_1) -- pk column_0; ~1000 rows" in content
+    assert "Joins:\ntable_0.column_1 = table_1.column_0" in content
+    assert content.endswith("Request: users with orders")
+
+def test_context_is_trimmed_to_budget_in_priority_order():
+    builder = PromptBuilder({"prompt": {"max_tokens": 600}})
+    memory = [{"prompt": f"question {i}", "sql": f"SELECT {i}"} for i in range(5)]
+    content = builder.build("total revenue", schema_context=make_context(40), memory=memory)[1]["content"]
+    stats = builder.last_stats
+    assert stats["tokens"] <= 600
+    assert 0 < stats["sections"]["schema"] < 40
+    # Schema fills the budget first, so lower-priority memory is dropped
+    assert stats["sections"].get("memory", 0) == 0
+    assert stats["dropped"] > 0
+    assert "table_0(" in content and "table_39(" not in content
+    assert content.endswith("Request: total revenue")
+    assert builder.get_stats()["dropped_items"] == stats["dropped"]
+
+def test_memory_keeps_most_recent_items():
+    builder = PromptBuilder({"prompt": {"max_memory": 2}})
+    memory = [{"prompt": f"question {i}", "sql": f"SELECT {i}"} for i in range(5)]
+    content = builder.build("and the next one", memory=memory)[1]["content"]
+    assert "- question 3 -> SELECT 3\n- question 4 -> SELECT 4" in content
+    assert "question 2" not in content
+
+def test_token_counter_estimates_without_tiktoken():
+    counter = TokenCounter()
+    assert counter.count("") == 0
+    if not counter.exact:
+        assert counter.count("abcdefgh") == 2
+        assert counter.count("abcdefghi") == 3
+
+def make_integration(llm):
+    config = {"llm": {"provider": "openai", "model": "gpt-4"}}
+    with patch("src.database_agent.llm_integration.get_llm", return_value=llm):
+        return LLMIntegration(config)
+
+@pytest.mark.asyncio
+async def test_generate_sql_sends_schema_context_and_skips_cache_with_memory():
+    llm = Mock()
+    llm.chat = Mock(return_value="SELECT 1;")
+    integration = make_integration(llm)
+    await integration.generate_sql("first", make_context(1))
+    messages = llm.chat.call_args[0][0]
+    assert messages[0]["content"] == integration._get_sql_system_prompt()
+    assert "table_0(" in messages[1]["content"]
+
+    memory = [{"prompt": "first", "sql": "SELECT 1;"}]
+    await integration.generate_sql("and again", memory=memory)
+    await integration.generate_sql("and again", memory=memory)
+    assert llm.chat.call_count == 3
+    assert not integration.cache.contains("and again")
@@ -0,0 +1,164 @@
+import asyncio
+import sqlite3
+import pytest
+from src.database_agent.query_executor import (
+    QueryExecutor, QueryExecutionError, QueryTimeoutError, ReadOnlyViolationError, parse_database_url
+)
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    path = tmp_path / "app.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+    connection.executemany("INSERT INTO users (name) VALUES (?)", [(f"user{i}",) for i in range(20)])
+    connection.commit()
+    connection.close()
+    return f"sqlite:///{path}"
+
+def make_executor(database_url, **execution):
+    return QueryExecutor({"schema": {"database_url": database_url}, "execution": execution})
+
+def test_parse_database_url():
+    assert parse_database_url("sqlite:///data/app.db") == ("sqlite", "data/app.db")
+    assert parse_database_url("sqlite:////abs/app.db") == ("sqlite", "/abs/app.db")
+    assert parse_database_url("duckdb:///:memory:") == ("duckdb", ":memory:")
+    with pytest.raises(QueryExecutionError):
+        parse_database_url("not a url")
+
+@pytest.mark.asyncio
+async def test_executes_against_sqlite_and_reuses_statements(sqlite_url):
+    executor = make_executor(sqlite_url, max_rows=5, pool_size=1)
+    result = await executor.execute("SELECT id, name FROM users WHERE id <= ?", (3,))
+    assert result["columns"] == ["id", "name"]
+    assert result["rows"][0] == {"id": 1, "name": "user0"}
+    assert result["row_count"] == 3 and not result["truncated"]
+
+    result = await executor.execute("SELECT id, name FROM users WHERE id <= ?", (10,))
+    assert result["row_count"] == 5 and result["truncated"]
+
+    stats = executor.get_stats()
+    assert stats["queries"] == 2
+    assert stats["statement_cache_hits"] == 1
+    assert stats["connections_open"] == 1
+    assert stats["query_time"]["count"] == 2
+    await executor.close()
+
+@pytest.mark.asyncio
+async def test_read_only_enforced(sqlite_url):
+    executor = make_executor(sqlite_url)
+    with pytest.raises(ReadOnlyViolationError):
+        await executor.execute("DELETE FROM users")
+    assert executor.get_stats()["rejected"] == 1
+    # The connection itself refuses writes too
+    with pytest.raises(sqlite3.OperationalError):
+        executor._run(await executor._acquire(), "DELETE FROM users", None, 10)
+    await executor.close()
+
+@pytest.mark.asyncio
+async def test_statement_timeout_interrupts_query(sqlite_url):
+    executor = make_executor(sqlite_url, statement_timeout=0.2, pool_size=1)
+    endless = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+    with pytest.raises(QueryTimeoutError):
+        await executor.execute(endless)
+    # The interrupted connection went back to the pool and still works
+    result = await executor.execute("SELECT count(*) AS n FROM users")
+    assert result["rows"] == [{"n": 20}]
+    assert executor.get_stats()["timeouts"] == 1
+    await executor.close()
+
+@pytest.mark.asyncio
+async def test_pool_bounds_concurrency_and_records_wait(sqlite_url):
+    executor = make_executor(sqlite_url, pool_size=2)
+    results = await asyncio.gather(*(executor.execute(f"SELECT {i} AS i") for i in range(10)))
+    assert [r["rows"][0]["i"] for r in results] == list(range(10))
+    stats = executor.get_stats()
+    assert stats["connections_open"] == 2
+    assert stats["in_use"] == 0
+    assert stats["pool_wait"]["count"] == 10
+    await executor.close()
+
+@pytest.mark.asyncio
+async def test_duckdb_in_memory():
+    pytest.importorskip("duckdb")
+    executor = make_executor("duckdb:///:memory:", read_only=False, pool_size=2)
+    await executor.execute("CREATE TABLE t AS SELECT range AS i FROM range(5)")
+    result = await executor.execute("SELECT sum(i) AS total FROM t")
+    assert result["rows"] == [{"total": 10}]
+    await executor.close()
+
+@pytest.mark.asyncio
+async def test_true_agent_executes_queries(sqlite_url):
+    from src.database_agent.true_agent import TrueDatabaseAgent
+    agent = TrueDatabaseAgent({"schema": {"database_url": sqlite_url}})
+    result = await agent._execute_query("SELECT name FROM users ORDER BY id LIMIT 2")
+    assert result.to_dicts() == [{"name": "user0"}, {"name": "user1"}]
+    formatted = await agent._format_results(result)
+    assert formatted["summary"] == "Found 2 records"
+    assert formatted["data"]["data"] == {"name": ["user0", "user1"]}
+    assert formatted["column_summaries"]["name"]["distinct"] == 2
+    assert agent.get_agent_status()["query_executor"]["queries"] == 1
+    await agent.close()
+
+async def collect(batches):
+    return [batch async for batch in batches]
+
+@pytest.mark.asyncio
+async def test_stream_yields_bounded_batches(sqlite_url):
+    executor = make_executor(sqlite_url, pool_size=1)
+    batches = await collect(executor.stream("SELECT id FROM users ORDER BY id", batch_size=8))
+    assert [len(batch["rows"]) for batch in batches] == [8, 8, 4]
+    assert batches[0]["columns"] == ["id"] and batches[0]["rows"][0] == (1,)
+
+    batches = await collect(executor.stream("SELECT id FROM users", batch_size=8, max_rows=10))
+    assert [len(batch["rows"]) for batch in batches] == [8, 2]
+
+    batches = await collect(executor.stream("SELECT id FROM users WHERE id < 0"))
+    assert batches == [{"columns": ["id"], "rows": []}]
+    assert executor.get_stats()["rows_streamed"] == 30
+    await executor.close()
+
+@pytest.mark.asyncio
+async def test_stream_sample_draws_from_whole_result(sqlite_url):
+    executor = make_executor(sqlite_url)
+    batches = await collect(executor.stream("SELECT id FROM users", batch_size=3, sample=5))
+    rows = [row for batch in batches for row in batch["rows"]]
+    assert len(rows) == 5 and len(set(rows)) == 5
+    assert all(1 <= row[0] <= 20 for row in rows)
+    await executor.close()
+
+@pytest.mark.asyncio
+async def test_abandoned_stream_returns_connection(sqlite_url):
+    executor = make_executor(sqlite_url, pool_size=1)
+    batches = executor.stream("SELECT id FROM users", batch_size=2)
+    assert len((await batches.__anext__())["rows"]) == 2
+    assert executor.get_stats()["in_use"] == 1
+    await batches.aclose()
+    assert executor.get_stats()["in_use"] == 0
+    result = await executor.execute("SELECT count(*) AS n FROM users")
+    assert result["rows"] == [{"n": 20}]
+    await executor.close()
+
+@pytest.mark.asyncio
+async def test_true_agent_direct_plan_returns_the_result(sqlite_url):
+    from unittest.mock import AsyncMock, Mock
+    from src.database_agent.true_agent import TrueDatabaseAgent
+    llm = Mock()
+    llm.generate_sql = AsyncMock(return_value="SELECT COUNT(*) AS n FROM users")
+    agent = TrueDatabaseAgent({"schema": {"database_url": sqlite_url}}, llm_integration=llm)
+    result = await agent.process_request("run the user count query")
+    assert agent.current_goal.steps == ["analyze_schema", "retrieve_examples", "generate_sql", "execute_query"]
+    assert result.to_dicts() == [{"n": 20}]
+    assert agent.memory.get_pattern("success_run the user count q") == "successful"
+    await agent.close()
+
+@pytest.mark.asyncio
+async def test_dialects_without_an_executor_are_rejected_at_startup():
+    for url in ("postgresql://user@host/db", "mysql+pymysql://user@host/db"):
+        with pytest.raises(QueryExecutionError, match="No executor for dialect"):
+            make_executor(url)
+    # SQL generation can still target them with execution switched off
+    executor = make_executor("postgresql://user@host/db", enabled=False)
+    assert not executor.get_stats()["enabled"]
+    with pytest.raises(QueryExecutionError, match="disabled"):
+        await executor.execute("SELECT 1")
+    assert executor.get_stats()["connections_open"] == 0
@@ -0,0 +1,144 @@
+import sqlite3
+import pytest
+from unittest.mock import Mock
+from src.database_agent.query_executor import QueryExecutor
+from src.database_agent.query_guard import QueryGuard, QueryBlockedError
+from src.database_agent.schema_model import SchemaModel
+
+TABLES = [
+    {"name": "users", "columns": ["id", "name"], "primary_key": "id", "indexes": [], "row_count": 200000},
+    {"name": "orders", "columns": ["id", "user_id", "total"], "primary_key": "id",
+     "indexes": [{"name": "idx_orders_user", "columns": ["user_id"]}], "row_count": 3000000}
+]
+
+@pytest.fixture
+def schema_manager():
+    manager = Mock()
+    manager.schema_model = SchemaModel.from_dicts(TABLES, [])
+    manager.schema_version = "v1"
+    manager.add_diff_listener = Mock()
+    return manager
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    path = tmp_path / "guard.db"
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);"
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER, total REAL);"
+        "CREATE INDEX idx_orders_user ON orders (user_id);"
+        "INSERT INTO users VALUES (1, 'a'), (2, 'b');"
+    )
+    connection.close()
+    return f"sqlite:///{path}"
+
+def make_guard(url, schema_manager, **settings):
+    config = {"schema": {"database_url": url}, "guard": settings}
+    return QueryGuard(config, QueryExecutor(config), schema_manager)
+
+@pytest.mark.asyncio
+async def test_sqlite_plan_estimates(sqlite_url, schema_manager):
+    guard = make_guard(sqlite_url, schema_manager)
+    point = await guard.check("SELECT * FROM users WHERE id = 1")
+    assert (point.source, point.rows, point.action) == ("explain", 1, "allow")
+    assert point.scans == [{"table": "users", "access": "index", "rows": 1}]
+    joined = await guard.estimate("SELECT u.name FROM users u JOIN orders o ON o.user_id = u.id")
+    assert not joined.cartesian and joined.cost == 6000000
+    assert (await guard.estimate("SELECT COUNT(*) FROM orders")).rows == 1
+    assert (await guard.estimate("WITH t AS (SELECT * FROM users) SELECT * FROM t")).rows == 200000
+    assert guard.query_executor.get_stats()["queries"] == 0
+    await guard.query_executor.close()
+
+@pytest.mark.asyncio
+async def test_large_results_get_a_limit(sqlite_url, schema_manager):
+    guard = make_guard(sqlite_url, schema_manager, max_result_rows=1000, auto_limit=50)
+    estimate = await guard.check("SELECT * FROM users;")
+    assert estimate.action == "limit"
+    assert estimate.sql == "SELECT * FROM users\nLIMIT 50"
+    assert (await guard.check("SELECT * FROM users LIMIT 10")).action == "allow"
+    assert guard.get_stats()["limited"] == 1
+    await guard.query_executor.close()
+
+@pytest.mark.asyncio
+async def test_cartesian_and_costly_queries_are_blocked(sqlite_url, schema_manager):
+    guard = make_guard(sqlite_url, schema_manager, max_cost=10000000)
+    with pytest.raises(QueryBlockedError) as error:
+        await guard.guard("SELECT * FROM users u, orders o")
+    assert error.value.estimate.cartesian and error.value.estimate.action == "block"
+    # A LIMIT without sorting stops the scan early
+    assert (await guard.check("SELECT * FROM users u CROSS JOIN orders o LIMIT 5")).action == "allow"
+    assert (await guard.check("SELECT * FROM users u CROSS JOIN orders o ORDER BY o.total LIMIT 5")).action == "block"
+    await guard.query_executor.close()
+
+@pytest.mark.asyncio
+async def test_schema_estimate_without_database(schema_manager):
+    guard = QueryGuard({}, None, schema_manager)
+    indexed = await guard.estimate("SELECT * FROM orders WHERE user_id = 7")
+    assert indexed.source == "schema"
+    assert indexed.scans == [{"table": "orders", "access": "index", "rows": 30000}]
+    assert (await guard.estimate("SELECT * FROM users, orders")).cartesian
+    unknown = await guard.check("SELECT * FROM missing")
+    assert unknown.cost is None and unknown.action == "allow"
+
+@pytest.mark.asyncio
+async def test_duckdb_plan_estimates(tmp_path):
+    duckdb = pytest.importorskip("duckdb")
+    path = tmp_path / "guard.duckdb"
+    connection = duckdb.connect(str(path))
+    connection.execute("CREATE TABLE a AS SELECT range AS id FROM range(5000)")
+    connection.execute("CREATE TABLE b AS SELECT range AS id FROM range(5000)")
+    connection.close()
+    guard = make_guard(f"duckdb:///{path}", None, max_result_rows=1000000, max_cost=10 ** 12)
+    estimate = await guard.check("SELECT * FROM a, b")
+    assert estimate.source == "explain" and estimate.cartesian
+    assert estimate.rows >= 1000000 and estimate.action == "block"
+    await guard.query_executor.close()
+
+@pytest.mark.asyncio
+async def test_true_agent_runs_guarded_sql(sqlite_url, schema_manager):
+    from unittest.mock import AsyncMock, Mock
+    from src.database_agent.planner import PLAN_TEMPLATES
+    from src.database_agent.true_agent import TrueDatabaseAgent, AgentGoal
+    config = {"schema": {"database_url": sqlite_url}, "guard": {"max_result_rows": 1000, "auto_limit": 1}}
+    llm = Mock()
+    llm.generate_sql = AsyncMock(return_value="SELECT * FROM users, orders")
+    agent = TrueDatabaseAgent(config, schema_manager=schema_manager, llm_integration=llm)
+    result = await agent._execute_query("SELECT name FROM users ORDER BY id")
+    assert result.to_dicts() == [{"name": "a"}]
+    goal = AgentGoal(description="everything", steps=PLAN_TEMPLATES["direct"])
+    outcome = await agent._execute_goal(goal)
+    assert outcome["estimate"]["action"] == "block"
+    assert agent.get_agent_status()["query_guard"]["blocked"] == 1
+    await agent.close()
+
+@pytest.mark.asyncio
+async def test_generated_sql_reports_estimate(sqlite_url):
+    from unittest.mock import patch
+    from src.database_agent.agent import DatabaseAgent
+    config = {"llm": {"provider": "openai", "model": "gpt-4"}, "cache": {"enabled": False},
+              "schema": {"database_url": sqlite_url}}
+    with patch("src.database_agent.llm_integration.get_llm") as mock_get_llm:
+        mock_llm = Mock(spec=["chat"])
+        mock_llm.chat.return_value = "SELECT * FROM users WHERE id = 1"
+        mock_get_llm.return_value = mock_llm
+        agent = DatabaseAgent(config)
+    result = await agent.generate_sql_query("user one")
+    assert result["estimate"]["source"] == "explain"
+    assert result["estimate"]["action"] == "allow"
+    assert result["estimate"]["scans"] == []  # No schema loaded, so no row counts
+    await agent.shutdown()
+
+@pytest.mark.asyncio
+async def test_streamed_results_are_guarded(sqlite_url):
+    from unittest.mock import patch
+    from src.database_agent.agent import DatabaseAgent
+    config = {"llm": {"provider": "openai", "model": "gpt-4"}, "cache": {"enabled": False},
+              "schema": {"database_url": sqlite_url}}
+    with patch("src.database_agent.llm_integration.get_llm"):
+        agent = DatabaseAgent(config)
+    with pytest.raises(QueryBlockedError):
+        await agent.stream_query_results("SELECT * FROM users u, orders o").__anext__()
+    batches = [batch async for batch in agent.stream_query_results("SELECT name FROM users ORDER BY id")]
+    assert [row for batch in batches for row in batch["rows"]] == [("a",), ("b",)]
+    assert agent.query_guard.get_stats()["blocked"] == 1
+    await agent.shutdown()
@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import patch
+from src.database_agent.columnar import ColumnarResult
+from src.database_agent.result_cache import ResultCache
+from src.database_agent.schema_manager import SchemaDiff
+
+def make_result(rows):
+    return ColumnarResult.from_rows(["id"], [(i,) for i in range(rows)])
+
+def make_cache(**settings):
+    return ResultCache({"result_cache": settings})
+
+def test_hit_on_reformatted_sql():
+    cache = make_cache()
+    result = make_result(3)
+    assert cache.get("SELECT id FROM users") is None
+    assert cache.put("SELECT id FROM users", result, cost=0.5)
+    assert cache.get("select id\n  from USERS; -- again") is result
+    assert cache.get("SELECT id FROM users", max_rows=10) is None
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["time_saved_seconds"] == 0.5
+    assert stats["bytes"] == result.nbytes
+
+def test_per_table_ttl():
+    cache = make_cache(ttl=300, table_ttls={"Orders": 10, "audit_log": 0})
+    with patch("src.database_agent.result_cache.time.time", return_value=1000.0):
+        cache.put("SELECT id FROM users", make_result(1))
+        cache.put("SELECT o.id FROM orders o JOIN users u ON u.id = o.user_id", make_result(1))
+        assert not cache.put("SELECT id FROM audit_log", make_result(1))
+    with patch("src.database_agent.result_cache.time.time", return_value=1011.0):
+        assert cache.get("SELECT id FROM users") is not None
+        assert cache.get("SELECT o.id FROM orders o JOIN users u ON u.id = o.user_id") is None
+
+def test_schema_diff_drops_results_reading_changed_tables():
+    cache = make_cache()
+    cache.invalidate("v1")
+    cache.put("SELECT id FROM users", make_result(1))
+    cache.put("SELECT id FROM orders", make_result(1))
+    cache.put("SELECT id FROM products", make_result(1))
+    cache.apply_schema_diff(SchemaDiff(version="v2", previous_version="v1", changed={"Orders"}))
+    assert cache.get("SELECT id FROM orders") is None
+    assert cache.get("SELECT id FROM users") is not None
+    # Row-count changes keep the schema version but still make results stale
+    cache.apply_schema_diff(SchemaDiff(version="v2", previous_version="v2", stats_changed={"users"}))
+    assert cache.get("SELECT id FROM users") is None
+    assert cache.get("SELECT id FROM products") is not None
+    # A diff from an unknown version drops everything
+    cache.apply_schema_diff(SchemaDiff(version="v4", previous_version="v3"))
+    assert cache.get_stats()["entries"] == 0
+
+def test_size_aware_eviction_keeps_small_expensive_results():
+    small, large = make_result(10), make_result(1000)
+    cache = make_cache(max_bytes=large.nbytes + 2 * small.nbytes, max_entry_bytes=large.nbytes)
+    cache.put("SELECT id FROM a", small, cost=1.0)
+    cache.put("SELECT id FROM b", small, cost=1.0)
+    cache.put("SELECT id FROM big", large, cost=1.0)
+    # The new small result displaces the large one, whose cost per byte is lowest
+    cache.put("SELECT id FROM c", small, cost=1.0)
+    assert cache.get("SELECT id FROM big") is None
+    assert all(cache.get(f"SELECT id FROM {name}") is not None for name in "abc")
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get_stats()["bytes"] <= cache.max_bytes
+
+def test_oversized_results_are_not_admitted():
+    cache = make_cache(max_entry_bytes=100)
+    assert not cache.put("SELECT id FROM t", make_result(1000))
+    assert cache.get_stats()["rejected"] == 1
+
+@pytest.mark.asyncio
+async def test_true_agent_serves_repeated_queries_from_cache(tmp_path):
+    import sqlite3
+    from src.database_agent.true_agent import TrueDatabaseAgent
+    from src.database_agent.schema_manager import SchemaManager
+    path = tmp_path / "cache.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (id INTEGER, name TEXT)")
+    connection.executemany("INSERT INTO users VALUES (?, ?)", [(i, f"user{i}") for i in range(5)])
+    connection.commit()
+    connection.close()
+    config = {"schema": {"database_url": f"sqlite:///{path}"}}
+    schema_manager = SchemaManager(config)
+    agent = TrueDatabaseAgent(config, schema_manager=schema_manager)
+    first = await agent._execute_query("SELECT count(*) AS n FROM users")
+    second = await agent._execute_query("select count(*) as n from users")
+    assert second is first
+    status = agent.get_agent_status()
+    assert status["query_executor"]["queries"] == 1
+    assert status["result_cache"]["hits"] == 1
+    schema_manager._notify_diff_listeners(
+        SchemaDiff(version=schema_manager.schema_version, previous_version=schema_manager.schema_version,
+                   stats_changed={"users"})
+    )
+    await agent._execute_query("SELECT count(*) AS n FROM users")
+    assert agent.get_agent_status()["query_executor"]["queries"] == 2
+    await agent.close()
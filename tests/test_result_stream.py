@@ -0,0 +1,59 @@
+import json
+import pytest
+from src.database_agent.result_stream import ndjson_stream, arrow_stream
+
+async def batches(*items, fail=False):
+    for item in items:
+        yield item
+    if fail:
+        raise RuntimeError("connection lost")
+
+async def encode(encoder, source):
+    return b"".join([chunk async for chunk in encoder(source)])
+
+@pytest.mark.asyncio
+async def test_ndjson_one_object_per_row():
+    body = await encode(ndjson_stream, batches(
+        {"columns": ["id", "name"], "rows": [(1, "a"), (2, "b")]},
+        {"columns": ["id", "name"], "rows": [(3, None)]},
+        fail=True
+    ))
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert lines[:3] == [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}, {"id": 3, "name": None}]
+    assert lines[3] == {"error": "connection lost"}
+
+@pytest.mark.asyncio
+async def test_arrow_ipc_stream_round_trips():
+    pa = pytest.importorskip("pyarrow")
+    body = await encode(arrow_stream, batches(
+        {"columns": ["id", "note"], "rows": [(1, None), (2, None)]},
+        {"columns": ["id", "note"], "rows": [(3, "late value")]}
+    ))
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.column_names == ["id", "note"]
+    assert table.column("id").to_pylist() == [1, 2, 3]
+    assert table.column("note").to_pylist() == [None, None, "late value"]
+
+@pytest.mark.asyncio
+async def test_arrow_later_batches_are_cast_to_the_first_schema():
+    pa = pytest.importorskip("pyarrow")
+    body = await encode(arrow_stream, batches(
+        {"columns": ["amount", "label"], "rows": [(1.5, "a")]},
+        {"columns": ["amount", "label"], "rows": [(2, 7)]}
+    ))
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.schema.types == [pa.float64(), pa.string()]
+    assert table.to_pylist() == [{"amount": 1.5, "label": "a"}, {"amount": 2.0, "label": "7"}]
+
+@pytest.mark.asyncio
+async def test_arrow_stream_ends_with_an_error_marker():
+    pa = pytest.importorskip("pyarrow")
+    for tail, error in (({"columns": ["id"], "rows": [(2.5,)]}, "2.5"), (None, "connection lost")):
+        items = [{"columns": ["id"], "rows": [(1,)]}] + ([tail] if tail else [])
+        reader = pa.ipc.open_stream(await encode(arrow_stream, batches(*items, fail=tail is None)))
+        first, metadata = reader.read_next_batch_with_custom_metadata()
+        assert first.column(0).to_pylist() == [1] and metadata is None
+        last, metadata = reader.read_next_batch_with_custom_metadata()
+        assert last.num_rows == 0 and error in metadata[b"error"].decode()
+        with pytest.raises(StopIteration):
+            reader.read_next_batch()
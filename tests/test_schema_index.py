@@ -0,0 +1,48 @@
+import pytest
+from src.database_agent.schema_index import SchemaIndex, tokenize
+
+@pytest.fixture
+def index():
+    tables = [
+        {"name": "users", "columns": ["id", "name", "email"], "row_count": 10},
+        {"name": "orders", "columns": ["id", "user_id", "order_date", "total"], "row_count": 50},
+        {"name": "order_items", "columns": ["id", "order_id", "product_id", "quantity"], "row_count": 200},
+        {"name": "products", "columns": ["id", "title", "price"], "comment": "Catalog of items for sale"},
+        {"name": "audit_log", "columns": ["id", "event", "created_at"]}
+    ]
+    relationships = [
+        {"from_table": "orders", "to_table": "users", "from_column": "user_id", "to_column": "id"},
+        {"from_table": "order_items", "to_table": "orders", "from_column": "order_id", "to_column": "id"},
+        {"from_table": "order_items", "to_table": "products", "from_column": "product_id", "to_column": "id"}
+    ]
+    return SchemaIndex(tables, relationships)
+
+def test_tokenize_splits_identifiers_and_singularizes():
+    assert tokenize("OrderItems") == ["order", "item"]
+    assert tokenize("user_id") == ["user", "id"]
+    assert tokenize("Show me all categories") == ["category"]
+
+def test_most_relevant_table_ranks_first(index):
+    context = index.search("Show me all users and their email")
+    assert context["tables"][0]["name"] == "users"
+    assert "audit_log" not in [t["name"] for t in context["tables"]]
+
+def test_comments_are_indexed(index):
+    context = index.search("what is in the catalog", top_k=1)
+    assert [t["name"] for t in context["tables"]] == ["products"]
+
+def test_join_path_tables_are_included(index):
+    context = index.search("which users bought which products", top_k=2)
+    names = [t["name"] for t in context["tables"]]
+    assert names[:2] == ["users", "products"]
+    assert {"orders", "order_items"} <= set(names)
+    assert len(context["relationships"]) == 3
+
+def test_token_budget_is_respected(index):
+    context = index.search("users orders products order items", token_budget=40)
+    assert context["estimated_tokens"] <= 40
+    assert len(context["tables"]) >= 1
+
+def test_unmatched_prompt_falls_back_to_schema_order(index):
+    context = index.search("zzz", top_k=2)
+    assert [t["name"] for t in context["tables"]] == ["users", "orders"]
@@ -75,4 +75,196 @@ def test_schema_manager_health_check(mock_load, mock_config):
     sm.last_refresh = None
     result = asyncio.run(sm.health_check())
     assert "status" in result
-    assert "schema_summary" in result 
\ No newline at end of file
+    assert "schema_summary" in result 
+
+@patch("src.database_agent.schema_manager.SchemaManager._initialize_schema")
+def test_reload_listener_notified_on_schema_change(mock_init, mock_config, mock_schema_graph):
+    sm = SchemaManager(mock_config)
+    sm.graph_builder = MagicMock()
+    sm.graph_builder.build_graph.return_value = mock_schema_graph
+    versions = []
+    sm.add_reload_listener(versions.append)
+    sm._load_schema()
+    sm._load_schema()
+    assert versions == [sm.schema_version]
+    mock_schema_graph.get_tables.return_value["payments"] = {"columns": {"id": {}}, "primary_key": "id"}
+    sm._load_schema()
+    assert len(versions) == 2
+    assert versions[-1] != versions[0]
+
+@patch("src.database_agent.schema_manager.SchemaManager._initialize_schema")
+def test_get_schema_context_ranks_tables_by_prompt(mock_init, mock_config, mock_schema_graph):
+    mock_config["schema"]["context_top_k"] = 1
+    sm = SchemaManager(mock_config)
+    sm.graph_builder = MagicMock()
+    sm.graph_builder.build_graph.return_value = mock_schema_graph
+    sm._load_schema()
+    ctx = asyncio.run(sm.get_schema_context("How many orders are there?"))
+    assert [t["name"] for t in ctx["tables"]] == ["orders"]
+    assert ctx["total_tables"] == 2
+
+@patch("src.database_agent.schema_manager.SchemaManager._initialize_schema")
+def test_refresh_emits_diff_and_ignores_row_count_in_version(mock_init, mock_config, mock_schema_graph):
+    sm = SchemaManager(mock_config)
+    sm.graph_builder = MagicMock()
+    sm.graph_builder.build_graph.return_value = mock_schema_graph
+    sm._load_schema()
+    diffs = []
+    sm.add_diff_listener(diffs.append)
+    version = sm.schema_version
+
+    tables = mock_schema_graph.get_tables.return_value
+    tables["users"]["row_count"] = 20
+    sm._load_schema()
+    assert sm.schema_version == version
+    assert diffs[-1].stats_changed == {"users"}
+    assert diffs[-1].affected_tables == set()
+
+    tables["orders"]["columns"]["total"] = {}
+    tables["payments"] = {"columns": {"id": {}}, "primary_key": "id"}
+    del tables["users"]
+    sm._load_schema()
+    diff = diffs[-1]
+    assert diff.previous_version == version and diff.version == sm.schema_version != version
+    assert diff.changed == {"orders"}
+    assert diff.added == {"payments"}
+    assert diff.removed == {"users"}
+
+class IncrementalBuilder:
+    """Builder exposing the optional catalog fingerprint / per-table introspection hooks."""
+    def __init__(self, tables, relationships):
+        self.tables = tables
+        self.relationships = relationships
+        self.introspected = []
+
+    def build_graph(self):
+        return self._graph(list(self.tables))
+
+    def get_table_fingerprints(self):
+        return {name: {"columns": list(info["columns"]), "primary_key": info["primary_key"],
+                       "indexes": info.get("indexes", []), "row_count": info.get("row_count", 0)}
+                for name, info in self.tables.items()}
+
+    def introspect_tables(self, names):
+        self.introspected.append(sorted(names))
+        return self._graph(names)
+
+    def _graph(self, names):
+        graph = MagicMock()
+        graph.get_tables.return_value = {name: self.tables[name] for name in names}
+        graph.get_relationships.return_value = [r for r in self.relationships if r["from_table"] in names]
+        return graph
+
+@patch("src.database_agent.schema_manager.SchemaManager._initialize_schema")
+def test_incremental_refresh_introspects_only_changed_tables(mock_init, mock_config, mock_schema_graph):
+    builder = IncrementalBuilder(dict(mock_schema_graph.get_tables.return_value),
+                                 mock_schema_graph.get_relationships.return_value)
+    sm = SchemaManager(mock_config)
+    sm.graph_builder = builder
+    sm._load_schema()
+    assert builder.introspected == []
+
+    builder.tables["users"] = {**builder.tables["users"], "row_count": 99}
+    sm._load_schema()
+    assert builder.introspected == []
+    assert {t["name"]: t["row_count"] for t in sm.schema_cache["tables"]}["users"] == 99
+
+    builder.tables["orders"] = {**builder.tables["orders"], "columns": {"id": {}, "user_id": {}, "total": {}}}
+    sm._load_schema()
+    assert builder.introspected == [["orders"]]
+    assert len(sm.schema_cache["relationships"]) == 1
+    orders = next(t for t in sm.schema_cache["tables"] if t["name"] == "orders")
+    assert orders["columns"] == ["id", "user_id", "total"]
+
+@pytest.mark.asyncio
+@patch("src.database_agent.schema_manager.SchemaManager._initialize_schema")
+async def test_stale_schema_is_served_while_refreshing(mock_init, mock_config, mock_schema_graph):
+    sm = SchemaManager(mock_config)
+    sm.graph_builder = MagicMock()
+    sm.graph_builder.build_graph.return_value = mock_schema_graph
+    sm._load_schema()
+    old_cache = sm.schema_cache
+    sm.last_refresh = sm.last_refresh.replace(year=2000)
+
+    release = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    sm.graph_builder.build_graph.side_effect = lambda: asyncio.run_coroutine_threadsafe(
+        release.wait(), loop).result() and mock_schema_graph
+
+    contexts = await asyncio.gather(*(sm.get_schema_context("users") for _ in range(5)))
+    assert all(ctx["tables"] for ctx in contexts)
+    assert sm.schema_cache is old_cache
+    release.set()
+    await sm._pending_refresh
+    assert sm.schema_cache is not old_cache
+    assert len(sm.schema_cache["tables"]) == 2
+    assert sm.graph_builder.build_graph.call_count == 2
+
+@pytest.mark.asyncio
+@patch("src.database_agent.schema_manager.SchemaManager._initialize_schema")
+async def test_background_refresh_lifecycle(mock_init, mock_config, mock_schema_graph):
+    mock_config["schema"]["refresh_interval"] = 0.01
+    sm = SchemaManager(mock_config)
+    sm.graph_builder = MagicMock()
+    sm.graph_builder.build_graph.return_value = mock_schema_graph
+    await sm.start_background_refresh()
+    await asyncio.sleep(0.1)
+    await sm.stop_background_refresh()
+    calls = sm.graph_builder.build_graph.call_count
+    assert calls >= 2
+    await asyncio.sleep(0.05)
+    assert sm.graph_builder.build_graph.call_count == calls
+
+@patch("src.database_agent.schema_manager.SchemaManager._initialize_schema")
+def test_failed_refresh_keeps_previous_snapshot(mock_init, mock_config, mock_schema_graph):
+    sm = SchemaManager(mock_config)
+    sm.graph_builder = MagicMock()
+    sm.graph_builder.build_graph.return_value = mock_schema_graph
+    sm._load_schema()
+    cache = sm.schema_cache
+    sm.graph_builder.build_graph.side_effect = Exception("database unavailable")
+    sm._load_schema()
+    assert sm.schema_cache is cache
+    assert not sm._should_refresh_schema()
+
+@pytest.mark.asyncio
+@patch("schema_graph_builder.SchemaGraphBuilder")
+async def test_cold_start_serves_disk_snapshot_then_revalidates(mock_builder, mock_config, mock_schema_graph, tmp_path):
+    mock_config["schema"]["snapshot_path"] = str(tmp_path / "schema.snapshot")
+    mock_builder.return_value.build_graph.return_value = mock_schema_graph
+    first = SchemaManager(mock_config)
+    assert mock_builder.return_value.build_graph.call_count == 1
+
+    mock_builder.return_value.build_graph.reset_mock()
+    second = SchemaManager(mock_config)
+    assert mock_builder.return_value.build_graph.call_count == 0
+    assert second.schema_version == first.schema_version
+    assert second.schema_cache["tables"] == first.schema_cache["tables"]
+    assert second._should_refresh_schema()
+
+    await second.start_background_refresh()
+    await second._pending_refresh
+    await second.stop_background_refresh()
+    assert mock_builder.return_value.build_graph.call_count == 1
+    assert not second._should_refresh_schema()
+
+@patch("src.database_agent.schema_manager.SchemaManager._initialize_schema")
+def test_join_paths_follow_confidence_and_track_relationship_changes(mock_init, mock_config, mock_schema_graph):
+    tables = mock_schema_graph.get_tables.return_value
+    tables["payments"] = {"columns": {"id": {}, "order_id": {}, "user_id": {}}, "primary_key": "id"}
+    relationships = mock_schema_graph.get_relationships.return_value
+    relationships.append({"from_table": "payments", "to_table": "orders", "from_column": "order_id", "to_column": "id"})
+    relationships.append({"from_table": "payments", "to_table": "users", "from_column": "user_id",
+                          "to_column": "id", "type": "inferred", "confidence": 0.2})
+    sm = SchemaManager(mock_config)
+    sm.graph_builder = MagicMock()
+    sm.graph_builder.build_graph.return_value = mock_schema_graph
+    sm._load_schema()
+    path = sm.get_join_path("payments", "users")
+    assert [(rel["from_table"], rel["to_table"]) for rel in path] == [("payments", "orders"), ("orders", "users")]
+    assert sm.get_join_path("users", "missing") is None
+
+    relationships[-1]["confidence"] = 1.0
+    sm._load_schema()
+    assert [rel["from_column"] for rel in sm.get_join_path("payments", "users")] == ["user_id"]
+    assert sm.join_paths.get_stats()["recomputed_sources"] == 3
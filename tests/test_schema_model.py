@@ -0,0 +1,37 @@
+from src.database_agent.schema_model import SchemaModel
+
+TABLES = [
+    {"name": "users", "columns": ["id", "name"], "primary_key": "id", "indexes": [], "row_count": 10},
+    {"name": "orders", "columns": ["id", "user_id"], "primary_key": ["id"], "indexes": [], "row_count": 5,
+     "comment": "Customer orders", "column_comments": {"user_id": "Buyer"}}
+]
+RELATIONSHIPS = [
+    {"from_table": "orders", "to_table": "users", "from_column": "user_id", "to_column": "id",
+     "type": "foreign_key", "confidence": 1.0}
+]
+
+def test_round_trips_extracted_dicts():
+    model = SchemaModel.from_dicts(TABLES, RELATIONSHIPS)
+    assert model.table_dicts() == TABLES
+    assert model.relationship_dicts() == RELATIONSHIPS
+
+def test_lookups_and_adjacency():
+    model = SchemaModel.from_dicts(TABLES, RELATIONSHIPS)
+    assert model.get_table("orders").comment == "Customer orders"
+    assert model.get_table("missing") is None
+    assert model.has_column("orders", "user_id")
+    assert not model.has_column("users", "user_id")
+    # Column membership is a hashed lookup, built once per table
+    assert model.get_table("orders").column_set == frozenset({"id", "user_id"})
+    assert model.get_table("orders").has_column("user_id") and not model.get_table("orders").has_column("name")
+    assert model.tables_with_column("id") == ("users", "orders")
+    assert model.neighbours("users") == ["orders"]
+    assert model.neighbours("orders") == ["users"]
+
+def test_names_are_interned_and_copies_are_independent():
+    model = SchemaModel.from_dicts(TABLES, RELATIONSHIPS)
+    users, orders = model.get_table("users"), model.get_table("orders")
+    assert users.columns[0] is orders.columns[0]
+    copy = users.to_dict()
+    copy["columns"].append("email")
+    assert users.columns == ("id", "name")
@@ -0,0 +1,31 @@
+from unittest.mock import patch
+from src.database_agent import schema_snapshot
+from src.database_agent.schema_snapshot import read_snapshot, write_snapshot
+
+TABLES = [{"name": "users", "columns": ["id", "name"], "primary_key": "id", "indexes": [], "row_count": 10}]
+RELATIONSHIPS = [{"from_table": "orders", "to_table": "users", "from_column": "user_id", "to_column": "id"}]
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "nested" / "schema.snapshot")
+    write_snapshot(path, "sqlite:///app.db", "abc123", TABLES, RELATIONSHIPS)
+    payload = read_snapshot(path, "sqlite:///app.db")
+    assert payload["version"] == "abc123"
+    assert payload["tables"] == TABLES
+    assert payload["relationships"] == RELATIONSHIPS
+
+def test_json_fallback_without_msgpack(tmp_path):
+    path = str(tmp_path / "schema.snapshot")
+    with patch.object(schema_snapshot, "msgpack", None):
+        write_snapshot(path, "sqlite:///app.db", "abc123", TABLES, RELATIONSHIPS)
+        assert read_snapshot(path, "sqlite:///app.db")["tables"] == TABLES
+
+def test_snapshot_for_other_database_is_ignored(tmp_path):
+    path = str(tmp_path / "schema.snapshot")
+    write_snapshot(path, "sqlite:///app.db", "abc123", TABLES, RELATIONSHIPS)
+    assert read_snapshot(path, "sqlite:///other.db") is None
+
+def test_missing_or_corrupt_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "schema.snapshot"
+    assert read_snapshot(str(path), "sqlite:///app.db") is None
+    path.write_bytes(b"DASNAP1m\xc1garbage")
+    assert read_snapshot(str(path), "sqlite:///app.db") is None
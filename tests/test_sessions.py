@@ -0,0 +1,86 @@
+import asyncio
+import sqlite3
+import pytest
+from src.database_agent.cache import SQLCache
+from src.database_agent.example_store import ExampleStore
+from src.database_agent.sessions import SessionManager
+from src.database_agent.true_agent import TrueDatabaseAgent, AgentState
+
+class SlowLLM:
+    """Answers each prompt with SQL naming it, after a delay that makes requests interleave."""
+    def __init__(self):
+        self.example_store = ExampleStore({"examples": {"enabled": False}})
+        self.cache = SQLCache({"cache": {"enabled": False}})
+
+    async def generate_sql(self, prompt, schema_context=None, memory=None, cache=True, examples=None):
+        await asyncio.sleep(0.001 * (hash(prompt) % 5))
+        return f"SELECT '{prompt.split()[-1]}' AS tag"
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / "sessions.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (id INTEGER)")
+    connection.commit()
+    connection.close()
+    return {"schema": {"database_url": f"sqlite:///{path}"}}
+
+@pytest.mark.asyncio
+async def test_concurrent_sessions_do_not_share_state(config):
+    agent = TrueDatabaseAgent(config, llm_integration=SlowLLM())
+    manager = SessionManager(config, agent)
+    tags = [f"tag{i}" for i in range(20)]
+    results = await asyncio.gather(*[
+        manager.process_request(f"session-{tag}", f"show me {tag}", user_id=tag) for tag in tags
+    ])
+    assert [result["data"]["data"]["tag"] for result in results] == [[tag] for tag in tags]
+    for tag in tags:
+        session = manager.get(f"session-{tag}")
+        assert session.current_goal.description == f"show me {tag}"
+        assert session.current_goal.sql == f"SELECT '{tag}' AS tag"
+        assert session.state == AgentState.COMPLETED
+    assert manager.get_stats()["requests"] == 20
+    await agent.close()
+
+@pytest.mark.asyncio
+async def test_requests_within_a_session_run_in_order(config):
+    agent = TrueDatabaseAgent(config, llm_integration=SlowLLM())
+    manager = SessionManager(config, agent)
+    prompts = [f"show me step{i}" for i in range(5)]
+    await asyncio.gather(*[manager.process_request("one", prompt) for prompt in prompts])
+    session = manager.get("one")
+    assert session.requests == 5
+    assert session.current_goal.description == prompts[-1]
+    await agent.close()
+
+@pytest.mark.asyncio
+async def test_requests_without_a_session_get_their_own(config):
+    agent = TrueDatabaseAgent(config, llm_integration=SlowLLM())
+    results = await asyncio.gather(agent.process_request("show me a"), agent.process_request("show me b"))
+    assert [result["data"]["data"]["tag"] for result in results] == [["a"], ["b"]]
+    assert agent.state == AgentState.COMPLETED
+    assert agent.get_agent_status()["current_goal"] == "show me b"
+    await agent.close()
+
+def test_idle_and_excess_sessions_are_evicted(config):
+    manager = SessionManager({**config, "sessions": {"idle_timeout": 60, "max_sessions": 3}})
+    first = manager.open(session_id="a")
+    manager.open(session_id="b")
+    first.last_active -= 120
+    assert manager.evict_idle() == 1
+    assert manager.get("a") is None and len(manager) == 1
+    for session_id in "cde":
+        manager.open(session_id=session_id)
+    assert list(manager._sessions) == ["c", "d", "e"]
+    assert manager.open(session_id="d") is manager.get("d")
+    stats = manager.get_stats()
+    assert (stats["evicted_idle"], stats["evicted_full"], stats["opened"]) == (1, 1, 5)
+
+@pytest.mark.asyncio
+async def test_busy_sessions_are_not_evicted(config):
+    manager = SessionManager(config)
+    session = manager.open(session_id="busy")
+    async with session.lock:
+        assert manager.evict_idle(now=session.last_active + 10 ** 6) == 0
+    assert manager.evict_idle(now=session.last_active + 10 ** 6) == 1
+    await manager.close()
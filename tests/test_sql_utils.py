@@ -0,0 +1,39 @@
+from src.database_agent.sql_utils import referenced_tables, is_read_only, canonicalize_sql, top_level_limit, add_limit, table_aliases
+
+def test_referenced_tables():
+    sql = """
+        SELECT u.name, COUNT(o.id) FROM public.users u
+        LEFT JOIN "Orders" o ON o.user_id = u.id  -- FROM comments
+        WHERE u.note = 'from audit_log' AND u.id IN (SELECT user_id FROM refunds)
+    """
+    assert referenced_tables(sql) == {"users", "orders", "refunds"}
+    assert referenced_tables("") == set()
+
+def test_is_read_only():
+    assert is_read_only("SELECT * FROM users;")
+    assert is_read_only("WITH t AS (SELECT 1) SELECT * FROM t")
+    assert is_read_only("SELECT 'drop table users; --' AS note")
+    assert not is_read_only("DELETE FROM users")
+    assert not is_read_only("WITH t AS (SELECT 1) INSERT INTO users SELECT * FROM t")
+    assert not is_read_only("SELECT 1; DROP TABLE users")
+    assert not is_read_only("")
+    assert is_read_only("SELECT REPLACE(name, 'a', 'b') FROM users")
+
+def test_canonicalize_sql():
+    assert canonicalize_sql("SELECT  a , b\nFROM Users -- all\nWHERE x = 1;") == "select a,b from users where x=1"
+    assert canonicalize_sql("select a,b from users where x=1") == "select a,b from users where x=1"
+    # Literals and quoted identifiers keep their case and spacing
+    assert canonicalize_sql("SELECT \"Name\" FROM t WHERE s = 'A  b'") == "select \"Name\" from t where s='A  b'"
+    assert canonicalize_sql("SELECT 'a -- b' /* c */ FROM t") == "select 'a -- b' from t"
+
+def test_limit_helpers():
+    assert top_level_limit("SELECT * FROM t LIMIT 10;") == 10
+    assert top_level_limit("SELECT * FROM (SELECT * FROM t LIMIT 5) s") is None
+    assert top_level_limit("SELECT 'LIMIT 3' FROM t") is None
+    assert add_limit("SELECT * FROM t; -- all rows\n", 50) == "SELECT * FROM t\nLIMIT 50"
+    assert add_limit("SELECT 'a;--' FROM t", 5) == "SELECT 'a;--' FROM t\nLIMIT 5"
+
+def test_table_aliases():
+    aliases = table_aliases("SELECT * FROM users u, main.orders AS o JOIN items i ON i.order_id = o.id WHERE 1")
+    assert aliases == {"users": "users", "u": "users", "orders": "orders", "o": "orders", "items": "items", "i": "items"}
+    assert table_aliases("SELECT * FROM (SELECT 1) s") == {}
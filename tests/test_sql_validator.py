@@ -0,0 +1,98 @@
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from src.database_agent.schema_model import SchemaModel
+from src.database_agent.sql_validator import SQLValidator
+
+pytest.importorskip("sqlglot")
+
+TABLES = [
+    {"name": "users", "columns": ["id", "name", "email"]},
+    {"name": "orders", "columns": ["id", "user_id", "total", "created_at"]}
+]
+
+@pytest.fixture
+def schema_manager():
+    manager = Mock()
+    manager.schema_model = SchemaModel.from_dicts(TABLES, [])
+    manager.schema_version = "v1"
+    manager.get_schema_context = AsyncMock(return_value={"tables": TABLES, "relationships": []})
+    return manager
+
+@pytest.fixture
+def validator(schema_manager):
+    return SQLValidator(schema_manager)
+
+def codes(result):
+    return [issue.code for issue in result.issues]
+
+def test_accepts_valid_queries(validator):
+    for sql in [
+        "SELECT u.name, SUM(o.total) AS spent FROM users u JOIN orders o ON o.user_id = u.id GROUP BY u.name ORDER BY spent",
+        "SELECT COUNT(*) FROM (SELECT id FROM users) s WHERE s.id > 1",
+        "WITH recent AS (SELECT * FROM orders) SELECT user_id FROM recent",
+        "SELECT Name FROM Users",
+        "SELECT 1"
+    ]:
+        result = validator.validate(sql)
+        assert result.valid, (sql, result.to_dict())
+    assert validator.validate("SELECT name FROM users").tables == {"users"}
+
+def test_unknown_tables_and_columns_carry_suggestions(validator):
+    result = validator.validate("SELECT u.emial, o.totl FROM users u JOIN order o ON o.user_id = u.id")
+    assert codes(result) == ["unknown_table", "unknown_column"]
+    assert result.issues[0].table == "order" and result.issues[0].suggestions == ["orders"]
+    assert result.issues[1].column == "emial" and result.issues[1].suggestions == ["email"]
+    unqualified = validator.validate("SELECT nme FROM users")
+    assert codes(unqualified) == ["unknown_column"] and unqualified.issues[0].suggestions == ["name"]
+    assert codes(validator.validate("SELECT x.id FROM users u")) == ["unknown_qualifier"]
+
+def test_rejects_writes_ddl_and_garbage(validator):
+    assert codes(validator.validate("DELETE FROM users")) == ["not_read_only"]
+    assert codes(validator.validate("DROP TABLE users")) == ["not_read_only"]
+    assert codes(validator.validate("WITH d AS (DELETE FROM users RETURNING id) SELECT * FROM d")) == ["not_read_only"]
+    assert codes(validator.validate("SELECT 1; SELECT 2")) == ["multiple_statements"]
+    assert codes(validator.validate("SELECT * FROM users WHERE show me all users")) == ["parse_error"]
+
+def test_without_schema_only_structure_is_checked():
+    validator = SQLValidator()
+    result = validator.validate("SELECT anything FROM anywhere")
+    assert result.valid and not result.schema_checked
+    assert not validator.validate("UPDATE users SET name = 'x'").valid
+
+def test_regex_fallback_without_sqlglot(validator):
+    with patch("src.database_agent.sql_validator.sqlglot", None):
+        result = validator.validate("SELECT * FROM user")
+        assert result.parser == "regex" and result.schema_checked
+        assert codes(result) == ["unknown_table"]
+        assert codes(validator.validate("DELETE FROM users")) == ["not_read_only"]
+
+def test_repair_prompt_lists_issues_and_real_columns(validator):
+    result = validator.validate("SELECT emial FROM users")
+    prompt = validator.build_repair_prompt("emails of all users", result)
+    assert "emails of all users" in prompt
+    assert "Column 'emial' does not exist in users. Did you mean: email?" in prompt
+    assert "users(id, name, email)" in prompt
+    assert "orders(" not in prompt
+
+@pytest.mark.asyncio
+async def test_true_agent_repairs_once_then_gives_up(schema_manager):
+    from src.database_agent.planner import PLAN_TEMPLATES
+    from src.database_agent.true_agent import TrueDatabaseAgent, AgentGoal
+    llm = Mock()
+    llm.generate_sql = AsyncMock(side_effect=["SELECT emial FROM users", "SELECT email FROM users"])
+    agent = TrueDatabaseAgent({}, schema_manager=schema_manager, llm_integration=llm)
+    result = await agent._execute_goal(AgentGoal(description="emails", steps=["analyze_schema", "retrieve_examples", "generate_sql"]))
+    assert result == "SELECT email FROM users"
+    assert llm.generate_sql.await_count == 2
+    assert "Did you mean: email?" in llm.generate_sql.await_args.args[0]
+    # The repair sees the same pruned schema as the first attempt and bypasses the SQL cache
+    assert llm.generate_sql.await_args.args[1] == await schema_manager.get_schema_context("emails")
+    assert llm.generate_sql.await_args.kwargs == {"cache": False}
+
+    llm.generate_sql = AsyncMock(side_effect=["SELECT emial FROM users", "SELECT mail FROM users"])
+    result = await agent._execute_goal(AgentGoal(description="emails", steps=PLAN_TEMPLATES["direct"]))
+    assert result["step"] == "generate_sql"
+    assert result["validation"]["issues"][0]["column"] == "mail"
+    assert llm.generate_sql.await_count == 2
+    assert agent.get_agent_status()["sql_validation"] == {"validated": 2, "rejected": 2, "repaired": 1, "repair_failed": 1}
+    await agent.close()
@@ -0,0 +1,170 @@
+import asyncio
+import sqlite3
+import pytest
+from src.database_agent.step_graph import PlanStep, StepGraph, StepScheduler, StepFailedError
+
+def test_graph_from_names_follows_dependencies():
+    dependencies = {"fetch": [], "parse": ["fetch"], "lookup": []}
+    graph = StepGraph.from_names(["lookup", "fetch", "parse", "report"], dependencies,
+                                 options={"fetch": {"timeout": 2, "retries": 1}}, timeout=5)
+    assert [step.depends_on for step in graph.steps] == [[], [], ["fetch"], ["parse"]]
+    assert (graph.by_name["fetch"].timeout, graph.by_name["fetch"].retries) == (2, 1)
+    assert (graph.by_name["parse"].timeout, graph.by_name["parse"].retries) == (5, 0)
+    # A dependency missing from the plan, or listed after its dependent, is an invalid plan
+    with pytest.raises(ValueError, match="needs fetch"):
+        StepGraph.from_names(["parse"], dependencies)
+    with pytest.raises(ValueError, match="needs fetch"):
+        StepGraph.from_names(["parse", "fetch"], dependencies)
+
+def test_graph_rejects_cycles_and_unknown_steps():
+    with pytest.raises(ValueError, match="cycle"):
+        StepGraph([PlanStep("a", ["b"]), PlanStep("b", ["a"])])
+    with pytest.raises(ValueError, match="unknown step"):
+        StepGraph([PlanStep("a", ["missing"])])
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently():
+    graph = StepGraph([PlanStep("a"), PlanStep("b"), PlanStep("c", ["a", "b"])])
+    running, peak = set(), []
+
+    async def run_step(step, results):
+        running.add(step.name)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.discard(step.name)
+        return [results.get(name) for name in step.depends_on] or step.name
+
+    results, trace = await StepScheduler().run(graph, run_step)
+    assert results["c"] == ["a", "b"]
+    assert max(peak) == 2
+    assert [(item.name, item.status, item.attempts) for item in trace] == [
+        ("a", "completed", 1), ("b", "completed", 1), ("c", "completed", 1)
+    ]
+    by_name = {item.name: item for item in trace}
+    assert by_name["c"].started_ms >= by_name["a"].started_ms + by_name["a"].duration_ms
+    assert by_name["a"].started_ms < by_name["b"].started_ms + by_name["b"].duration_ms
+
+@pytest.mark.asyncio
+async def test_timeouts_are_retried_within_budget():
+    attempts = []
+
+    async def run_step(step, results):
+        attempts.append(step.name)
+        if len(attempts) == 1:
+            await asyncio.sleep(1)
+        return "done"
+
+    graph = StepGraph([PlanStep("slow", timeout=0.02, retries=1)])
+    results, trace = await StepScheduler().run(graph, run_step)
+    assert results == {"slow": "done"} and trace[0].attempts == 2
+
+    attempts.clear()
+    graph = StepGraph([PlanStep("slow", timeout=0.02)])
+    with pytest.raises(StepFailedError) as failure:
+        await StepScheduler().run(graph, run_step)
+    assert failure.value.trace[0].status == "timeout"
+
+@pytest.mark.asyncio
+async def test_failure_cancels_running_steps_and_skips_the_rest():
+    cancelled = asyncio.Event()
+
+    async def run_step(step, results):
+        if step.name == "bad":
+            raise KeyError("boom")
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    graph = StepGraph([PlanStep("bad", retries=3), PlanStep("slow"), PlanStep("after", ["bad"])])
+    with pytest.raises(StepFailedError) as failure:
+        await StepScheduler(fatal=(KeyError,)).run(graph, run_step)
+    assert failure.value.step == "bad" and isinstance(failure.value.error, KeyError)
+    # Fatal errors are not retried
+    assert {item.name: (item.status, item.attempts) for item in failure.value.trace} == {
+        "bad": ("failed", 1), "slow": ("cancelled", 1), "after": ("skipped", 0)
+    }
+    assert cancelled.is_set()
+
+@pytest.mark.asyncio
+async def test_cancelling_a_run_cancels_its_steps():
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def run_step(step, results):
+        started.set()
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    task = asyncio.ensure_future(StepScheduler().run(StepGraph([PlanStep("slow")]), run_step))
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert cancelled.is_set()
+
+@pytest.mark.asyncio
+async def test_true_agent_records_a_step_trace(tmp_path):
+    from unittest.mock import AsyncMock, Mock
+    from src.database_agent.true_agent import TrueDatabaseAgent
+    path = tmp_path / "trace.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (id INTEGER)")
+    connection.commit()
+    connection.close()
+    llm = Mock()
+    llm.generate_sql = AsyncMock(return_value="SELECT COUNT(*) AS n FROM users")
+    agent = TrueDatabaseAgent({"schema": {"database_url": f"sqlite:///{path}"}}, llm_integration=llm)
+    result = await agent.process_request("show me the user count")
+    assert result["data"]["data"] == {"n": [0]}
+    trace = agent.get_agent_status()["last_trace"]
+    assert [(step["name"], step["status"]) for step in trace] == [
+        (name, "completed") for name in ("analyze_schema", "retrieve_examples", "generate_sql", "execute_query", "format_results")
+    ]
+    await agent.close()
+
+@pytest.mark.asyncio
+async def test_true_agent_rejects_plans_missing_a_dependency():
+    from src.database_agent.true_agent import TrueDatabaseAgent, AgentGoal, AgentState
+    agent = TrueDatabaseAgent({})
+    result = await agent._execute_goal(AgentGoal(description="orders", steps=["analyze_schema", "retrieve_examples", "generate_sql", "format_results"]))
+    assert result["error"] == "Step format_results needs execute_query earlier in the plan"
+    assert agent.state == AgentState.ERROR
+    await agent.close()
+
+@pytest.mark.asyncio
+async def test_true_agent_looks_up_schema_and_examples_concurrently():
+    import time
+    from unittest.mock import AsyncMock, Mock
+    from src.database_agent.planner import PLAN_TEMPLATES
+    from src.database_agent.true_agent import TrueDatabaseAgent, AgentGoal
+    context = {"tables": [{"name": "orders", "columns": ["id"]}], "relationships": []}
+    examples = [{"prompt": "all orders", "sql": "SELECT * FROM orders"}]
+
+    async def schema_context(description):
+        await asyncio.sleep(0.1)
+        return context
+
+    def search(description):
+        time.sleep(0.1)
+        return examples
+
+    schema_manager = Mock()
+    schema_manager.get_schema_context = schema_context
+    llm = Mock()
+    llm.example_store.search = search
+    llm.generate_sql = AsyncMock(return_value="SELECT 1")
+    agent = TrueDatabaseAgent({}, schema_manager=schema_manager, llm_integration=llm)
+    goal = AgentGoal(description="orders", steps=PLAN_TEMPLATES["explain"])
+    await agent._execute_goal(goal)
+    by_name = {step["name"]: step for step in goal.trace}
+    schema, retrieval = by_name["analyze_schema"], by_name["retrieve_examples"]
+    assert schema["started_ms"] < retrieval["started_ms"] + retrieval["duration_ms"]
+    assert retrieval["started_ms"] < schema["started_ms"] + schema["duration_ms"]
+    # generate_sql is built from the results of both, not from lookups of its own
+    assert llm.generate_sql.await_args.args[1] == context
+    assert llm.generate_sql.await_args.kwargs["examples"] == examples
+    await agent.close()
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import Mock, patch
+from src.database_agent.agent import DatabaseAgent
+
+CHUNKS = ["SELECT ", "* ", "FROM ", "users;"]
+
+class SyncStreamingLLM:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.emitted = 0
+        self.stopped = threading.Event()
+
+    def chat(self, messages):
+        return "".join(CHUNKS)
+
+    def stream(self, messages):
+        try:
+            for chunk in CHUNKS:
+                time.sleep(self.delay)
+                self.emitted += 1
+                yield chunk
+        finally:
+            self.stopped.set()
+
+class AsyncStreamingLLM:
+    def chat(self, messages):
+        raise AssertionError("chat should not be used when streaming")
+
+    async def astream(self, messages):
+        for chunk in CHUNKS:
+            yield chunk
+
+def make_agent(llm):
+    config = {"llm": {"provider": "openai", "model": "gpt-4", "api_key": "test-key"}}
+    with patch("src.database_agent.llm_integration.get_llm", return_value=llm):
+        return DatabaseAgent(config)
+
+async def collect(agent, prompt):
+    return [event async for event in agent.stream_sql_query(prompt)]
+
+@pytest.mark.asyncio
+async def test_sync_stream_emits_tokens_then_result():
+    agent = make_agent(SyncStreamingLLM())
+    events = await collect(agent, "Show me all users")
+    assert [e["data"]["text"] for e in events[:-1]] == CHUNKS
+    assert events[-1]["event"] == "result"
+    assert events[-1]["data"]["sql_query"] == "SELECT * FROM users;"
+
+@pytest.mark.asyncio
+async def test_native_async_stream_is_used():
+    agent = make_agent(AsyncStreamingLLM())
+    events = await collect(agent, "Show me all users")
+    assert len([e for e in events if e["event"] == "token"]) == len(CHUNKS)
+
+@pytest.mark.asyncio
+async def test_non_streaming_provider_yields_single_chunk_and_fills_cache():
+    llm = Mock()
+    llm.chat.return_value = "SELECT * FROM users;"
+    agent = make_agent(llm)
+    events = await collect(agent, "Show me all users")
+    assert [e["event"] for e in events] == ["token", "result"]
+    result = await agent.generate_sql_query("Show me all users")
+    assert result["sql_query"] == "SELECT * FROM users;"
+    assert llm.chat.call_count == 1
+
+@pytest.mark.asyncio
+async def test_stream_errors_become_error_event():
+    llm = Mock()
+    llm.chat.side_effect = Exception("LLM Error")
+    agent = make_agent(llm)
+    events = await collect(agent, "Show me all users")
+    assert events[-1]["event"] == "error"
+    assert events[-1]["data"]["error"] == "LLM Error"
+
+@pytest.mark.asyncio
+async def test_closing_stream_early_stops_provider():
+    llm = SyncStreamingLLM(delay=0.02)
+    agent = make_agent(llm)
+    events = agent.stream_sql_query("Show me all users")
+    first = await events.__anext__()
+    assert first["event"] == "token"
+    await events.aclose()
+    await asyncio.get_running_loop().run_in_executor(None, llm.stopped.wait, 1)
+    assert llm.emitted < len(CHUNKS)
+    assert not agent.llm_integration.cache.contains("Show me all users")
+
+@pytest.mark.asyncio
+async def test_streamed_result_is_validated_and_estimated(tmp_path):
+    import sqlite3
+    from src.database_agent.schema_model import SchemaModel
+    path = tmp_path / "stream.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (id INTEGER, email TEXT)")
+    connection.close()
+    config = {"llm": {"provider": "openai", "model": "gpt-4", "api_key": "test-key"},
+              "schema": {"database_url": f"sqlite:///{path}"}}
+    with patch("src.database_agent.llm_integration.get_llm", return_value=SyncStreamingLLM()):
+        agent = DatabaseAgent(config)
+    agent.schema_manager.schema_model = SchemaModel.from_dicts([{"name": "users", "columns": ["id", "email"]}], [])
+    result = (await collect(agent, "Show me all users"))[-1]["data"]
+    assert result["estimate"]["source"] == "explain"
+    assert agent.llm_integration.example_store.search("show me all users")[0]["sql"] == result["sql_query"]
+
+    agent.schema_manager.schema_model = SchemaModel.from_dicts([{"name": "accounts", "columns": ["id"]}], [])
+    await collect(agent, "Show me every user")
+    # SQL that no longer validates is not left in the cache
+    assert not agent.llm_integration.cache.contains("Show me every user")
+    await agent.shutdown()